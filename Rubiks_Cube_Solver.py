@@ -2,9 +2,19 @@ import pygame
 import sys
 import random
 import math
-import cv2
-import numpy as np
-import kociemba
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from functools import lru_cache
+from camera_capture import CameraStream
+from camera_preview import PreviewRenderer
+from cube_state import CubeState
+import cube_solver
+from cube_solver import CUBIE_IDS, get_cubie_group
+from solution_cache import SolutionCache
+from sticker_classifier import CentroidClassifier, ReadingAccumulator, StickerClassifier, cell_colors
+
+# OpenCV is slow to import, so it is loaded by load_opencv() when the camera is first needed
+cv2 = None
 
 # Initialize pygame
 pygame.init()
@@ -36,6 +46,12 @@ camera_border = 10
 camera_feed_rect = pygame.Rect(camera_x + camera_border, camera_y + camera_border, camera_width - 2 * camera_border, camera_height - 2 * camera_border)
 button_y = camera_y + camera_height + 100
 
+# Search the moves allowed by the water drop directly, for shorter solutions than rewriting Kociemba's
+SOLVE_METHOD = 'native'
+
+# Seconds the native search keeps shortening the solution while the first one is already playing
+SOLVE_BUDGET = cube_solver.ANYTIME_SEARCH_BUDGET if SOLVE_METHOD == 'native' else 0
+
 # Load waterdrop image and define highlight color
 waterdrop_image = pygame.image.load('drop.png')
 droplet_highlight = (0, 255, 255)
@@ -62,6 +78,9 @@ hsvColors = {
     'Yellow': [0, [75, 100, 100], [100, 255, 255]]
 }
 
+# Colour profile learned from the centre stickers of the last scan (see calibrate_scanned_faces())
+COLOR_PROFILE_PATH = 'color_profile.json'
+
 # RGB color mapping for visualisation in the interface
 rgbColors = {
     'Blue': (255, 0, 0), 'Green': (0, 255, 0), 'Red': (0, 0, 255),
@@ -76,38 +95,9 @@ face_to_color = {v: k for k, v in faces.items()}
 moves_list = []
 solution_length = 0
 
-# Representation of the Rubik's Cube as a 2D array for each face
-# Each face is a 3x3 grid of color codes
-a = [
-    [['G', 'G', 'G'], ['G', 'G', 'G'], ['G', 'G', 'G']],  # Front face (Green)
-    [['R', 'R', 'R'], ['R', 'R', 'R'], ['R', 'R', 'R']],  # Right face (Red)
-    [['B', 'B', 'B'], ['B', 'B', 'B'], ['B', 'B', 'B']],  # Back face (Blue)
-    [['O', 'O', 'O'], ['O', 'O', 'O'], ['O', 'O', 'O']],  # Left face (Orange)
-    [['W', 'W', 'W'], ['W', 'W', 'W'], ['W', 'W', 'W']],  # Up face (White)
-    [['Y', 'Y', 'Y'], ['Y', 'Y', 'Y'], ['Y', 'Y', 'Y']]   # Down face (Yellow)
-]
-
-# Unique IDs for each cubie on the cube for tracking during rotations
-CUBIE_IDS = {
-    'U': [37, 38, 39, 40, 41, 42, 43, 44, 45],
-    'L': [28, 29, 30, 31, 32, 33, 34, 35, 36],
-    'F': [1, 2, 3, 4, 5, 6, 7, 8, 9],
-    'R': [10, 11, 12, 13, 14, 15, 16, 17, 18],
-    'B': [19, 20, 21, 22, 23, 24, 25, 26, 27],
-    'D': [46, 47, 48, 49, 50, 51, 52, 53, 54]
-}
-
-# Pairs of cubie positions used for rotation calculations
-CUBIE_PAIRS = {
-    2: 44, 44: 2, 4: 33, 33: 4, 6: 13, 13: 6, 8: 47, 47: 8,
-    38: 20, 20: 38, 40: 29, 29: 40, 42: 11, 11: 42, 22: 15, 15: 22,
-    24: 31, 31: 24, 26: 53, 53: 26, 35: 49, 49: 35, 17: 51, 51: 17,
-    1: (30, 43), 30: (1, 43), 43: (1, 30), 3: (45, 10), 45: (3, 10), 10: (3, 45),
-    7: (36, 46), 36: (7, 46), 46: (7, 36), 9: (16, 48), 16: (9, 48), 48: (9, 16),
-    12: (19, 39), 19: (12, 39), 39: (12, 19), 18: (25, 54), 25: (18, 54), 54: (18, 25),
-    28: (21, 37), 21: (28, 37), 37: (28, 21), 34: (27, 52), 27: (34, 52), 52: (34, 27),
-    5: 5, 14: 14, 23: 23, 32: 32, 41: 41, 50: 50
-}
+# Representation of the Rubik's Cube as a flat array of 54 facelets
+# Faces are stored in the order Front, Right, Back, Left, Up, Down
+cube = CubeState()
 
 # Set the title of the window
 pygame.display.set_caption("Rubik's Cube Solver")
@@ -120,8 +110,8 @@ instructions_text = [
     "Scanning Process:",
     "1. Press 'Start Game' then 'Scan Cube' and follow the on-screen grid guide.",
     "2. Hold each face as instructed '(Watch the top colour!)'.",
-    "3. Press 'Spacebar' to capture each face.",
-    "4. Cube Displayed? Click the 'Waterdrop Button' to fix a cubie.",
+    "3. Press 'Spacebar' to capture each face ('C' if the middle colour is misread).",
+    "4. Cube Displayed? Click the 'Waterdrop Button' to fix one or more cubies.",
     "",
     "Solving Process:",
     "Keep 'Green Middle' facing you with 'white middle' facing up.",
@@ -186,8 +176,116 @@ About_Algorithm_text = "\n".join([
     "This incredible algorithm is known for its speed and efficiency, solving any cube configuration in 20 moves or fewer! Mastering the Kociemba Algorithm opens the door to advanced solving techniques and a smoother cubing experience."
 ])
 
-# Define font path
-font_path = pygame.font.match_font('arial')
+@lru_cache(maxsize=None)
+def get_font_path():
+    """
+    Finds the Arial font file on first use, since font matching can take a long time at startup.
+
+    Returns:
+        str: The path of the font file, or None to use pygame's default font.
+    """
+    return pygame.font.match_font('arial')
+
+@lru_cache(maxsize=None)
+def get_font(font_size):
+    """
+    Returns the Arial font in the given size, loading each size only once.
+
+    Args:
+        font_size (int): The font size.
+
+    Returns:
+        pygame.font.Font: The font.
+    """
+    return pygame.font.Font(get_font_path(), font_size)
+
+@lru_cache(maxsize=None)
+def get_solution_cache():
+    """
+    Opens the solution cache on first use, so solved states are remembered across restarts.
+
+    Returns:
+        SolutionCache: The cache backed by solution_cache.sqlite3.
+    """
+    return SolutionCache(path='solution_cache.sqlite3')
+
+@lru_cache(maxsize=None)
+def get_solve_executor():
+    """
+    Creates the worker thread that solves cubes, so the game loop keeps rendering meanwhile.
+
+    Returns:
+        ThreadPoolExecutor: An executor with a single worker.
+    """
+    return ThreadPoolExecutor(max_workers=1, thread_name_prefix='solver')
+
+@lru_cache(maxsize=None)
+def get_sticker_classifier():
+    """
+    Loads the learned colour profile, or builds the lookup tables of the fixed colour ranges if there is none.
+
+    Returns:
+        CentroidClassifier or StickerClassifier: The classifier the scanner uses.
+    """
+    return CentroidClassifier.load(COLOR_PROFILE_PATH) or StickerClassifier(hsvColors)
+
+@lru_cache(maxsize=None)
+def get_preview_renderer():
+    """
+    Allocates the buffers the camera preview is drawn into, once for the whole session.
+
+    Returns:
+        PreviewRenderer: The renderer sized to the camera feed area.
+    """
+    return PreviewRenderer(camera_feed_rect.size)
+
+def calibrate_scanned_faces(face_configs, face_cell_colors):
+    """
+    Learns the colours from the centre stickers of a scan and relabels every sticker with them.
+
+    The centre of every face has a known colour, so the six centres give one centroid per
+    colour in the lighting of this scan. The centroids are saved as the colour profile
+    that later scans start from.
+
+    Args:
+        face_configs (list): The face name, middle colour and top colour of every scanned face.
+        face_cell_colors (list): The mean Lab colours of the nine cells of every face (see cell_colors()).
+
+    Returns:
+        list: The relabelled colour data of every face.
+    """
+    classifier = CentroidClassifier({middle_color: cells[4] for (_, middle_color, _), cells
+                                     in zip(face_configs, face_cell_colors)})
+    try:
+        classifier.save(COLOR_PROFILE_PATH)
+    except OSError as e:
+        print("Could not save the colour profile:", e)
+    get_sticker_classifier.cache_clear()  # The next scan previews with the new profile
+    return [[faces[color] for color in classifier.classify_cells(cells).colors] for cells in face_cell_colors]
+
+def load_opencv():
+    """
+    Imports OpenCV the first time the camera is needed.
+
+    Returns:
+        module: The cv2 module.
+    """
+    global cv2
+    if cv2 is None:
+        import cv2 as opencv
+        cv2 = opencv
+    return cv2
+
+def open_camera():
+    """
+    Opens the webcam and starts reading it on a background thread.
+
+    Returns:
+        CameraStream: The camera; read() returns the newest frame without waiting.
+    """
+    capture = load_opencv().VideoCapture(0)
+    capture.set(cv2.CAP_PROP_BUFFERSIZE, 1)  # The stream keeps the newest frames itself
+    return CameraStream(capture)
 
 # Rotating cube function that renders a rotating cube on the screen
 def cube_animation(surface, size, rotation_angle_x, rotation_angle_y, vertical_offset=50):
@@ -402,7 +500,7 @@ class Button:
             image_rect = scaled_image.get_rect(center=self.rect.center)
             surface.blit(scaled_image, image_rect)
         elif self.text:
-            font = pygame.font.Font(font_path, 24)
+            font = get_font(24)
             text_color = BLACK if self.is_hovered else WHITE
             text_surface = font.render(self.text, True, text_color)
             text_rect = text_surface.get_rect(center=self.rect.center)
@@ -439,6 +537,27 @@ def create_control_buttons():
     next_move_button = Button(control_x + 2 * (button_width + button_spacing), control_y, button_width, button_height, "NEXT", YELLOW)
     return pause_button, resume_button, next_move_button
 
+# Function to draw a rotating progress spinner
+def draw_spinner(surface, center, radius, color, ticks):
+    """
+    Draws a spinner made of fading dots that turns with time.
+
+    Args:
+        surface (pygame.Surface): The surface on which the spinner is drawn.
+        center (tuple): The (x, y) position of the spinner's center.
+        radius (int): The radius of the circle the dots sit on.
+        color (tuple): RGB color of the brightest dot.
+        ticks (int): The current time in milliseconds (from pygame.time.get_ticks()).
+    """
+    dots = 12
+    head = (ticks // 80) % dots  # Advance one dot every 80 ms
+    for i in range(dots):
+        angle = 2 * math.pi * i / dots
+        fade = ((i - head) % dots + 1) / dots  # The dot at the head is the brightest
+        dot_color = tuple(int(channel * fade) for channel in color)
+        position = (int(center[0] + radius * math.cos(angle)), int(center[1] + radius * math.sin(angle)))
+        pygame.draw.circle(surface, dot_color, position, max(2, radius // 6))
+
 # Function to draw centered text on a given surface
 def draw_text(surface, text, font_size, color, y_position):
     """
@@ -453,7 +572,7 @@ def draw_text(surface, text, font_size, color, y_position):
 
     The text is automatically centered horizontally.
     """
-    font = pygame.font.Font(font_path, font_size)
+    font = get_font(font_size)
     text_surface = font.render(text, True, color)
     text_rect = text_surface.get_rect(center=(surface.get_width() // 2, y_position))
     surface.blit(text_surface, text_rect)
@@ -558,7 +677,7 @@ def draw_move_guide(surface, rect):
     table_width = (rect.width - 40) // 3    
     cell_height = 50    
     padding = 20    
-    font = pygame.font.Font(font_path, 22)    
+    font = get_font(22)    
     y_offset = 80    
     spacing = 60
     total_width = 3 * table_width + 2 * spacing
@@ -620,7 +739,7 @@ def show_popup_message(surface, message, buttons=None, is_congratulations=False)
     if is_congratulations:
         total_text_height = 56 + 40  # Main text + subtitle font sizes
         start_y = popup_y + (popup_height - total_text_height - 60) // 2
-        font = pygame.font.Font(font_path, 56)
+        font = get_font(56)
 
         text = font.render("CONGRATULATIONS!", True, BLACK)
         shadow = font.render("CONGRATULATIONS!", True, ORANGE)
@@ -629,7 +748,7 @@ def show_popup_message(surface, message, buttons=None, is_congratulations=False)
         surface.blit(shadow, shadow_rect)
         surface.blit(text, text_rect)
         # Render subtitle
-        sub_font = pygame.font.Font(font_path, 40)
+        sub_font = get_font(40)
         sub_text = sub_font.render(message, True, BLACK)
         sub_text_rect = sub_text.get_rect(center=(width // 2, start_y + 70))
         surface.blit(sub_text, sub_text_rect)
@@ -679,7 +798,8 @@ def show_popup_message(surface, message, buttons=None, is_congratulations=False)
 
 def camera_permissions():
     """
-    Displays a permission prompt asking the user to agree to allow camera access. If accepted, the camera is initialized.
+    Displays a permission prompt asking the user to agree to allow camera access.
+    The camera itself is opened when the game starts, so OpenCV is not loaded before then.
 
     Returns:
         bool: True if the user agrees to allow camera access, False if the user disagrees.
@@ -689,7 +809,7 @@ def camera_permissions():
     disagree_button = Button(width // 2 - 100, height // 2 + 130, 250, 60, "Disagree", RED)
     buttons = [agree_button, disagree_button]
 
-    title_font = pygame.font.Font(font_path, 72)
+    title_font = get_font(72)
     title_shadow = title_font.render("Rubik's Cube Adventure", True, BLACK)
     title = title_font.render("Rubik's Cube Adventure", True, PINK)
     shadow_rect = title_shadow.get_rect(center=(width // 2 + 3, 103))
@@ -703,8 +823,6 @@ def camera_permissions():
                 sys.exit()
             elif event.type == pygame.MOUSEBUTTONDOWN:
                 if agree_button.is_clicked(mouse_pos):
-                    global camera
-                    camera = cv2.VideoCapture(0)
                     return True
                 elif disagree_button.is_clicked(mouse_pos):
                     pygame.quit()
@@ -870,14 +988,14 @@ def scan_cube(surface):
         None: If the scanning process is cancelled.
     """
     global camera
-    if camera.isOpened():
-        camera.release()
-    camera = cv2.VideoCapture(0)
+    camera.release()
+    camera = open_camera()
 
     # Rectangle to indicate the camera view area
     pygame.draw.rect(surface, droplet_highlight, (camera_x, camera_y, camera_width, camera_height), camera_border)
 
     scanned_faces = []  # List to hold the colors of the scanned faces
+    scanned_cell_colors = []  # The mean colour of every cell, for the calibration
 
     # Define the configuration for the faces to be scanned
     # Face name, middle color, top color
@@ -893,25 +1011,32 @@ def scan_cube(surface):
     # Iterate over each face configuration to scan the face
     for face_name, middle_color, top_color in face_configs:
         # Call the scan_face function to capture the colors of the current face
-        face_colors = scan_face(surface, face_name, middle_color, top_color)
+        scanned_face = scan_face(surface, face_name, middle_color, top_color)
 
         # Check if the scanning was cancelled
-        if face_colors is None:
+        if scanned_face is None:
             print("Scanning cancelled.")
             return None  # Exit the function and return None
         
         # Append the scanned colors to the list of scanned faces
+        face_colors, cell_colors_of_face = scanned_face
         scanned_faces.append(face_colors)
+        scanned_cell_colors.append(cell_colors_of_face)
 
     camera.release()
     cv2.destroyAllWindows()
 
-    return scanned_faces  # Return the list of scanned face colors
+    # Relabel every sticker with the colours of this scan's centres
+    return calibrate_scanned_faces(face_configs, scanned_cell_colors)
 
 def scan_face(surface, face_name, middle_color, top_color):
     """
     Scans a single face of the Rubik's Cube and returns the color data.
 
+    The colours are voted on over the last few frames. The face is captured on its own
+    once all nine stickers have kept a confident colour for a moment and the middle one
+    is the expected colour, or when the user presses Space.
+
     Args:
         surface (pygame.Surface): The surface to display the camera feed on.
         face_name (str): The name of the face being scanned (e.g., "Front").
@@ -919,59 +1044,54 @@ def scan_face(surface, face_name, middle_color, top_color):
         top_color (str): The color on top of the cube during scanning.
 
     Returns:
-        list: A list of 9 color values representing the cubies of the face.
+        tuple: A list of 9 color values representing the cubies of the face, and the mean
+        Lab colour of every cubie (see cell_colors()).
         None: If the scanning process is cancelled.
     """
     # Initialize a list to hold the detected colors for the 9 cubies
     data = ['' for _ in range(9)]
     error_message = ""  # Initialize an empty error message
 
+    clock = pygame.time.Clock()
+    last_frame_number = None
+    classifier = get_sticker_classifier()
+    accumulator = ReadingAccumulator(classifier.colors)
+
     # Loop to read frames from the camera
     while True:
-        ret, img = camera.read()  # Capture a frame from the camera
+        ret, img = camera.read()  # The newest frame, without waiting for the camera
         if not ret:
-            print("Failed to grab frame")
-            continue  # Skip to the next iteration if capture fails
+            camera.wait_for_frame(0.1)  # No frame has arrived yet
+            continue
 
-        hsv = cv2.cvtColor(img, cv2.COLOR_RGB2HSV)  # Convert the image to HSV
-        middle_cubie_color = None
+        # Only a new frame is classified; a frame shown again already has the rectangles drawn on it
+        if camera.frame_number != last_frame_number:
+            last_frame_number = camera.frame_number
+            # Classify all 9 cubies in one pass over the scan grid and vote with the previous frames
+            reading = accumulator.add(classifier.classify(img))
+            middle_cubie_color = reading.colors[4]  # Stored for the verification when capturing
+            cubie_colors = cell_colors(img)  # Measured before the rectangles are drawn on the image
 
         # Loop over each cubie position in the 3x3 grid
         for i in range(3):
             for j in range(3):
                 x, y = 500 + 120 * j, 240 + 120 * i  # Calculate the center position of the cubie
-                bestColor, bestValue = 'White', 0  # Initialize best color and value
-
-                # Check against all predefined HSV colors
-                for key, color in hsvColors.items():
-                    # Create a mask to isolate colors in the specified area
-                    mask = cv2.inRange(hsv[y-60:y+60, x-60:x+60], 
-                                       np.array(color[1]), 
-                                       np.array(color[2]))
-                    avg = np.average(mask)  # Calculate the average value of the mask
-                    # Update the best color if the average exceeds the previous best
-                    if avg > bestValue:
-                        bestValue, bestColor = avg, key
-                
+                bestColor = reading.colors[3 * i + j]
+
                 # Assign the detected color to the data list
                 data[3 * i + j] = faces[bestColor]
-                # If it's the middle cubie, store its color for later verification
-                if i == j == 1:
-                    middle_cubie_color = bestColor
 
-                # Draw a rectangle around the detected color on the image
+                # Draw a rectangle around the detected color on the image, thin while the colour is uncertain
+                confident = reading.confidences[3 * i + j] >= accumulator.threshold
                 cv2.rectangle(img, (x-60, y-60), (x+60, y+60), 
-                              rgbColors[bestColor], 3)
-
-        # Convert the image back to RGB for rendering with Pygame
-        img = cv2.cvtColor(img, cv2.COLOR_BGR2RGB)
-        # Create a Pygame surface from the image array
-        img_surface = pygame.surfarray.make_surface(img).convert()
-        # Rotate and flip the surface for correct orientation
-        img_surface = pygame.transform.rotate(img_surface, -90)
-        img_surface = pygame.transform.flip(img_surface, True, False)
-        # Scale the surface to fit the camera feed area
-        img_surface = pygame.transform.scale(img_surface, (camera_feed_rect.width, camera_feed_rect.height))
+                              rgbColors[bestColor], 3 if confident else 1)
+
+        # Capture the face once it has been held still long enough
+        if accumulator.is_stable() and middle_cubie_color == face_to_color[faces[middle_color]]:
+            return data, cubie_colors
+
+        # Scale the image to the camera feed area and convert it to RGB in the reused preview surface
+        img_surface = get_preview_renderer().render(img)
 
         # Instruction text for the user
         instruction = f"Scan {middle_color} middle cubie keeping {top_color} on top."
@@ -980,6 +1100,10 @@ def scan_face(surface, face_name, middle_color, top_color):
         instruction_bg.fill((128, 128, 128, 128))
         instruction_bg_y = 0
         img_surface.blit(instruction_bg, (0, instruction_bg_y))
+        # Fill a bar under the instruction while the face is held still
+        stable_progress = min(accumulator.stable_count / accumulator.stable_frames, 1)
+        pygame.draw.rect(img_surface, droplet_highlight,
+                         (0, instruction_bg_y + instruction_bg_height - 4, int(camera_feed_rect.width * stable_progress), 4))
         
         # Draw the instruction text on the image surface
         draw_text(surface=img_surface, text=instruction, font_size=40, color=WHITE, y_position=instruction_bg_y + instruction_bg_height//2)
@@ -1005,13 +1129,19 @@ def scan_face(surface, face_name, middle_color, top_color):
                 if event.key == pygame.K_SPACE:
                     # Check if the detected middle cubie color matches the expected middle color
                     if middle_cubie_color == face_to_color[faces[middle_color]]:
-                        return data  # Return the detected colors if correct
+                        return data, cubie_colors  # Return the detected colors if correct
                     else:
                         # Set an error message if the middle color is incorrect
-                        error_message = f"Error: The middle cubie should be {middle_color}."
+                        error_message = f"Error: The middle cubie should be {middle_color}. Press C to capture anyway."
+                elif event.key == pygame.K_c:
+                    # The user vouches for the middle cubie, e.g. when the lighting fools the colour ranges;
+                    # the calibration at the end of the scan relabels the face
+                    return data, cubie_colors
                 elif event.key == pygame.K_ESCAPE:
                     return None
 
+        clock.tick(60)
+
 # Constants for cube dimensions and positions
 CUBE_SIZE = 200  # Size of each face of the cube
 CUBE_SPACING = 1  # Spacing between the cube faces
@@ -1126,14 +1256,8 @@ def get_clicked_cubie(mouse_pos):
     cubie_index = cell_y * 3 + cell_x  # Convert 2D coordinates to a 1D index
     cubie_id = CUBIE_IDS[face][cubie_index]  # Get the ID of the clicked cubie
 
-    # Check if the cubie has paired cubies
-    if cubie_id in CUBIE_PAIRS:
-        paired_cubies = CUBIE_PAIRS[cubie_id]  # Get the paired cubies
-        if isinstance(paired_cubies, tuple):
-            return [cubie_id] + list(paired_cubies)
-        else:
-            return [cubie_id, paired_cubies]
-    return [cubie_id]  # Return the ID of the single clicked cubie if no pairs exist
+    # Expand the clicked sticker into every sticker of its piece
+    return get_cubie_group(cubie_id)
 
 def m(s):
     """
@@ -1153,13 +1277,12 @@ def m(s):
     k = s.split(' ')
 
     # Update global variables that track the moves and solution length
-    global moves_list, solution_length, a
+    global moves_list, solution_length
     solution_length += len(k)  # Increase solution length by the number of new moves
 
-    # Loop through each move in the parsed list
-    for word in k:
-        moves_list.append(word)  # Add the move to the global moves list
-        move(word)  # Execute the move
+    # Record the moves, then apply the whole sequence as one compiled permutation
+    moves_list.extend(k)
+    cube.apply_sequence(k)
 
     # Update the current state of the cube after performing the moves
     global scanned_faces
@@ -1179,47 +1302,11 @@ def rotate(axis):
         Exception: If the axis provided is not valid.
     """
     axis = str.lower(axis)  # Convert the axis to lowercase for standardization
-    if axis == 'x':
-        # Perform an X-axis rotation by reassigning the values in array 'a'
-        temp = a[0]
-        a[0] = a[1]  # Rotate the top face positions
-        a[1] = a[4]
-        a[4] = a[5]
-        a[5] = temp
-        # Rotate the adjacent faces accordingly
-        rotate_face_counterclockwise("L")
-        rotate_face_clockwise("R")
-    elif axis == 'y':
-        # Perform a Y-axis rotation by reassigning the values in array 'a'
-        temp = a[1]
-        a[1] = a[2]  # Rotate the left and right face positions
-        a[2] = a[5]
-        a[5] = a[3]
-        a[3] = temp
-        # Rotate all visible faces accordingly
-        rotate_face_clockwise("L")
-        rotate_face_clockwise("F")
-        rotate_face_clockwise("R")
-        rotate_face_clockwise("B")
-        rotate_face_clockwise("U")
-        rotate_face_counterclockwise("D")
-    elif axis == 'z':
-        # Perform a Z-axis rotation by reassigning the values in array 'a'
-        temp = a[0]
-        a[0] = a[3]  # Rotate the front and back face positions
-        a[3] = a[4]
-        a[4] = a[2]
-        a[2] = temp
-        # Rotate the faces that correspond to the Z rotation
-        rotate_face_clockwise("L")
-        rotate_face_clockwise("L")  # Two counterclockwise for L
-        rotate_face_clockwise("D")
-        rotate_face_clockwise("D")  # Two counterclockwise for D
-        rotate_face_clockwise("F")
-        rotate_face_counterclockwise("B")
-    else:
+    if axis not in ('x', 'y', 'z'):
         # Raise an exception if the axis provided is invalid
         raise Exception("Invalid rotation: " + axis)
+    # Whole-cube rotations use the same precomputed permutations as layer turns
+    cube.apply_move(axis)
     
 def move(mv):
     """
@@ -1232,456 +1319,10 @@ def move(mv):
         None: Applies the move to the cube.
     
     Raises:
-        Exception: If the move is invalid.
-    """
-    mv = str.upper(mv)  # Convert the move string to uppercase for standardization
-
-    # Execute the corresponding rotation based on the move notation
-    if mv == "U":
-        up_rot()
-    elif mv == "U2":
-        up_rot(); up_rot()
-    elif mv == "UI":
-        up_rot(); up_rot(); up_rot()
-    elif mv == "D":
-        down_rot()
-    elif mv == "D2":
-        down_rot(); down_rot()
-    elif mv == "DI":
-        down_rot(); down_rot(); down_rot()
-    elif mv == "F":
-        front_rot()
-    elif mv == "F2":         # Front face 180 degrees
-        front_rot(); front_rot()
-    elif mv == "FI":         # Front face counterclockwise
-        front_rot(); front_rot(); front_rot()
-    elif mv == "B":          # Back face clockwise
-        back_rot()
-    elif mv == "B2":         # Back face 180 degrees
-        back_rot(); back_rot()
-    elif mv == "BI":         # Back face counterclockwise
-        back_rot(); back_rot(); back_rot()
-    elif mv == "L":          # Left face clockwise
-        left_rot()
-    elif mv == "L2":         # Left face 180 degrees
-        left_rot(); left_rot()
-    elif mv == "LI":         # Left face counterclockwise
-        left_rot(); left_rot(); left_rot()
-    elif mv == "R":          # Right face clockwise
-        right_rot()
-    elif mv == "R2":         # Right face 180 degrees
-        right_rot(); right_rot()
-    elif mv == "RI":         # Right face counterclockwise
-        right_rot(); right_rot(); right_rot()
-    elif mv == "M":          # Middle slice clockwise
-        middle_slice()
-    elif mv == "M2":         # Middle slice 180 degrees
-        middle_slice(); middle_slice()
-    elif mv == "MI":         # Middle slice counterclockwise
-        middle_slice(); middle_slice(); middle_slice()
-    elif mv == "E":          # Equatorial slice clockwise
-        equator_slice()
-    elif mv == "E2":         # Equatorial slice 180 degrees
-        equator_slice(); equator_slice()
-    elif mv == "EI":         # Equatorial slice counterclockwise
-        equator_slice(); equator_slice(); equator_slice()
-    elif mv == "S":          # Standing slice clockwise
-        standing_slice()
-    elif mv == "S2":         # Standing slice 180 degrees
-        standing_slice(); standing_slice()
-    elif mv == "SI":         # Standing slice counterclockwise
-        standing_slice(); standing_slice(); standing_slice()
-    elif mv == "X":          # Rotate the cube around the x-axis
-        rotate('x')
-    elif mv == "Y":          # Rotate the cube around the y-axis
-        rotate('y')
-    elif mv == "Z":          # Rotate the cube around the z-axis
-        rotate('z')
-    else:
-        # Raise an exception if the move is not recognized
-        raise Exception("Invalid Move: " + str(mv))
-
-def up_rot():
-    """
-    Rotates the top layer (U) of the Rubik's Cube clockwise.
-    It rotates the four corner pieces and the four edge pieces of the top face.
-    """
-    temp = a[4][0][0]
-    a[4][0][0] = a[4][2][0]
-    a[4][2][0] = a[4][2][2]
-    a[4][2][2] = a[4][0][2]
-    a[4][0][2] = temp
-
-    temp = a[4][0][1]
-    a[4][0][1] = a[4][1][0]
-    a[4][1][0] = a[4][2][1]
-    a[4][2][1] = a[4][1][2]
-    a[4][1][2] = temp
-
-    temp = a[0][0][0]
-    a[0][0][0] = a[1][0][0]
-    a[1][0][0] = a[2][0][0]
-    a[2][0][0] = a[3][0][0]
-    a[3][0][0] = temp
-
-    temp = a[0][0][1]
-    a[0][0][1] = a[1][0][1]
-    a[1][0][1] = a[2][0][1]
-    a[2][0][1] = a[3][0][1]
-    a[3][0][1] = temp
-
-    temp = a[0][0][2]
-    a[0][0][2] = a[1][0][2]
-    a[1][0][2] = a[2][0][2]
-    a[2][0][2] = a[3][0][2]
-    a[3][0][2] = temp
-
-def down_rot():
-    """
-    Rotates the bottom layer (D) of the Rubik's Cube clockwise.
-    It rotates the four corner pieces and the four edge pieces of the bottom face.
-    """
-    temp = a[5][0][0]
-    a[5][0][0] = a[5][2][0]
-    a[5][2][0] = a[5][2][2]
-    a[5][2][2] = a[5][0][2]
-    a[5][0][2] = temp
-
-    temp = a[5][0][1]
-    a[5][0][1] = a[5][1][0]
-    a[5][1][0] = a[5][2][1]
-    a[5][2][1] = a[5][1][2]
-    a[5][1][2] = temp
-
-    temp = a[0][2][0]
-    a[0][2][0] = a[3][2][0]
-    a[3][2][0] = a[2][2][0]
-    a[2][2][0] = a[1][2][0]
-    a[1][2][0] = temp
-
-    temp = a[0][2][1]
-    a[0][2][1] = a[3][2][1]
-    a[3][2][1] = a[2][2][1]
-    a[2][2][1] = a[1][2][1]
-    a[1][2][1] = temp
-
-    temp = a[0][2][2]
-    a[0][2][2] = a[3][2][2]
-    a[3][2][2] = a[2][2][2]
-    a[2][2][2] = a[1][2][2]
-    a[1][2][2] = temp
-
-def front_rot():
-    """
-    Rotates the front face (F) of the Rubik's Cube clockwise.
-    It rotates the four corner pieces and the four edge pieces of the front face.
-    """
-    temp = a[0][0][0]
-    a[0][0][0] = a[0][2][0]
-    a[0][2][0] = a[0][2][2]
-    a[0][2][2] = a[0][0][2]
-    a[0][0][2] = temp
-
-    temp = a[0][0][1]
-    a[0][0][1] = a[0][1][0]
-    a[0][1][0] = a[0][2][1]
-    a[0][2][1] = a[0][1][2]
-    a[0][1][2] = temp
-
-    temp = a[4][2][0]
-    a[4][2][0] = a[3][2][2]
-    a[3][2][2] = a[5][0][2]
-    a[5][0][2] = a[1][0][0]
-    a[1][0][0] = temp
-
-    temp = a[4][2][1]
-    a[4][2][1] = a[3][1][2]
-    a[3][1][2] = a[5][0][1]
-    a[5][0][1] = a[1][1][0]
-    a[1][1][0] = temp
-
-    temp = a[4][2][2]
-    a[4][2][2] = a[3][0][2]
-    a[3][0][2] = a[5][0][0]
-    a[5][0][0] = a[1][2][0]
-    a[1][2][0] = temp
-
-def back_rot():
-    """
-    Rotates the back face (B) of the Rubik's Cube clockwise.
-    It rotates the four corner pieces and the four edge pieces of the back face.
-    """
-    temp = a[2][0][0]
-    a[2][0][0] = a[2][2][0]
-    a[2][2][0] = a[2][2][2]
-    a[2][2][2] = a[2][0][2]
-    a[2][0][2] = temp
-
-    temp = a[2][0][1]
-    a[2][0][1] = a[2][1][0]
-    a[2][1][0] = a[2][2][1]
-    a[2][2][1] = a[2][1][2]
-    a[2][1][2] = temp
-    temp = a[4][0][2]
-    a[4][0][2] = a[1][2][2]
-    a[1][2][2] = a[5][2][0]
-    a[5][2][0] = a[3][0][0]
-    a[3][0][0] = temp
-
-    temp = a[4][0][1]
-    a[4][0][1] = a[1][1][2]
-    a[1][1][2] = a[5][2][1]
-    a[5][2][1] = a[3][1][0]
-    a[3][1][0] = temp
-
-    temp = a[4][0][0]
-    a[4][0][0] = a[1][0][2]
-    a[1][0][2] = a[5][2][2]
-    a[5][2][2] = a[3][2][0]
-    a[3][2][0] = temp
-
-def left_rot():
-    """
-    Rotates the left face (L) of the Rubik's Cube clockwise.
-    It rotates the four corner pieces and the four edge pieces of the left face.
-    """
-    temp = a[3][0][0]
-    a[3][0][0] = a[3][2][0]
-    a[3][2][0] = a[3][2][2]
-    a[3][2][2] = a[3][0][2]
-    a[3][0][2] = temp
-
-    temp = a[3][0][1]
-    a[3][0][1] = a[3][1][0]
-    a[3][1][0] = a[3][2][1]
-    a[3][2][1] = a[3][1][2]
-    a[3][1][2] = temp
-    temp = a[0][0][0]
-    a[0][0][0] = a[4][0][0]
-    a[4][0][0] = a[2][2][2]
-    a[2][2][2] = a[5][0][0]
-    a[5][0][0] = temp
-
-    temp = a[0][1][0]
-    a[0][1][0] = a[4][1][0]
-    a[4][1][0] = a[2][1][2]
-    a[2][1][2] = a[5][1][0]
-    a[5][1][0] = temp
-
-    temp = a[0][2][0]
-    a[0][2][0] = a[4][2][0]
-    a[4][2][0] = a[2][0][2]
-    a[2][0][2] = a[5][2][0]
-    a[5][2][0] = temp
-
-def right_rot():
-    """
-    Rotates the right face (R) of the Rubik's Cube clockwise.
-    It rotates the four corner pieces and the four edge pieces of the right face.
-    """
-    temp = a[1][0][0]
-    a[1][0][0] = a[1][2][0]
-    a[1][2][0] = a[1][2][2]
-    a[1][2][2] = a[1][0][2]
-    a[1][0][2] = temp
-
-    temp = a[1][0][1]
-    a[1][0][1] = a[1][1][0]
-    a[1][1][0] = a[1][2][1]
-    a[1][2][1] = a[1][1][2]
-    a[1][1][2] = temp
-    temp = a[0][2][2]
-    a[0][2][2] = a[5][2][2]
-    a[5][2][2] = a[2][0][0]
-    a[2][0][0] = a[4][2][2]
-    a[4][2][2] = temp
-
-    temp = a[0][1][2]
-    a[0][1][2] = a[5][1][2]
-    a[5][1][2] = a[2][1][0]
-    a[2][1][0] = a[4][1][2]
-    a[4][1][2] = temp
-
-    temp = a[0][0][2]
-    a[0][0][2] = a[5][0][2]
-    a[5][0][2] = a[2][2][0]
-    a[2][2][0] = a[4][0][2]
-    a[4][0][2] = temp
-
-def middle_slice():
-    """
-    Performs a middle slice rotation (M) on the Rubik's Cube.
-    This rotates the middle layer of the cube, affecting both the edge and corner pieces.
-    """
-    temp = a[0][0][1]
-    a[0][0][1] = a[4][0][1]
-    a[4][0][1] = a[2][2][1]
-    a[2][2][1] = a[5][0][1]
-    a[5][0][1] = temp
-
-    temp = a[0][1][1]
-    a[0][1][1] = a[4][1][1]
-    a[4][1][1] = a[2][1][1]
-    a[2][1][1] = a[5][1][1]
-    a[5][1][1] = temp
-
-    temp = a[0][2][1]
-    a[0][2][1] = a[4][2][1]
-    a[4][2][1] = a[2][0][1]
-    a[2][0][1] = a[5][2][1]
-    a[5][2][1] = temp
-
-def equator_slice():
-    """
-    Performs an equator slice rotation (E) on the Rubik's Cube.
-    This rotates the middle layer of the cube horizontally, affecting the edge pieces on the top, bottom, front, and back faces.
-    """
-    temp = a[0][1][0]
-    a[0][1][0] = a[3][1][0]
-    a[3][1][0] = a[2][1][0]
-    a[2][1][0] = a[1][1][0]
-    a[1][1][0] = temp
-
-    temp = a[0][1][1]
-    a[0][1][1] = a[3][1][1]
-    a[3][1][1] = a[2][1][1]
-    a[2][1][1] = a[1][1][1]
-    a[1][1][1] = temp
-
-    temp = a[0][1][2]
-    a[0][1][2] = a[3][1][2]
-    a[3][1][2] = a[2][1][2]
-    a[2][1][2] = a[1][1][2]
-    a[1][1][2] = temp
-
-def standing_slice():
-    """
-    Performs a standing slice rotation (S) on the Rubik's Cube.
-    This affects the middle layer between the left, right, and back faces, rotating the middle slice of the cube.
-    """
-    temp = a[4][1][0]
-    a[4][1][0] = a[3][2][1]
-    a[3][2][1] = a[5][1][2]
-    a[5][1][2] = a[1][0][1]
-    a[1][0][1] = temp
-
-    temp = a[4][1][1]
-    a[4][1][1] = a[3][1][1]
-    a[3][1][1] = a[5][1][1]
-    a[5][1][1] = a[1][1][1]
-    a[1][1][1] = temp
-
-    temp = a[4][1][2]
-    a[4][1][2] = a[3][0][1]
-    a[3][0][1] = a[5][1][0]
-    a[5][1][0] = a[1][2][1]
-    a[1][2][1] = temp
-
-def rotate_face_counterclockwise(face):
-    """
-    Rotates a specified face of the Rubik's Cube counterclockwise (90 degrees).
-    This is achieved by performing three clockwise rotations on the face.
-    
-    Parameters:
-    face (str): The identifier of the face to rotate ('U', 'D', 'F', 'B', 'L', 'R').
-    """
-    rotate_face_clockwise(face)
-    rotate_face_clockwise(face)
-    rotate_face_clockwise(face)
-
-def rotate_face_clockwise(face):
-    """
-    Rotates a specified face of the Rubik's Cube clockwise (90 degrees).
-    This function rotates the cubies on the specified face and its adjacent pieces accordingly.
-    
-    Parameters:
-    face (str): The identifier of the face to rotate ('U', 'D', 'F', 'B', 'L', 'R').
-    
-    Raises:
-    Exception: If an invalid face identifier is provided.
-    """
-    f_id = -1
-    face = str.lower(face)
-    if face == "u":
-        f_id = 0
-    elif face == "f":
-        f_id = 1
-    elif face == "r":
-        f_id = 2
-    elif face == "l":
-        f_id = 3
-    elif face == "d":
-        f_id = 4
-    elif face == "b":
-        f_id = 5
-    else:
-        raise Exception("Invalid face: " + face)
-    temp = a[f_id][0][0]
-    a[f_id][0][0] = a[f_id][2][0]
-    a[f_id][2][0] = a[f_id][2][2]
-    a[f_id][2][2] = a[f_id][0][2]
-    a[f_id][0][2] = temp
-    temp = a[f_id][0][1]
-    a[f_id][0][1] = a[f_id][1][0]
-    a[f_id][1][0] = a[f_id][2][1]
-    a[f_id][2][1] = a[f_id][1][2]
-    a[f_id][1][2] = temp
-
-def get_restricted_faces(fixed_cubie):
-    """
-    Determines which faces of the Rubik's Cube are restricted by the position of a fixed cubie.
-    This function checks the positions of the fixed cubie and adds the affected faces to the restricted set.
-    
-    Parameters:
-    fixed_cubie (list): A list of cubie identifiers that are fixed in position.
-
-    Returns:
-    set: A set of restricted face identifiers ('U', 'D', 'F', 'B', 'L', 'R').
+        ValueError: If the move is invalid.
     """
-    # Initialize an empty set to hold restricted face identifiers
-    restricted_faces = set()
-    
-    # Iterate over each cubie in the provided fixed_cubie list
-    for cubie in fixed_cubie:
-        # Check if the cubie belongs to the upper face
-        if cubie in CUBIE_IDS['U']:
-            restricted_faces.add('U')  # Add 'U' to the restricted faces set
-
-        if cubie in CUBIE_IDS['D']:
-            restricted_faces.add('D')
-
-        if cubie in CUBIE_IDS['F']:
-            restricted_faces.add('F')
-
-        if cubie in CUBIE_IDS['B']:
-            restricted_faces.add('B')
-
-        if cubie in CUBIE_IDS['L']:
-            restricted_faces.add('L')
-
-        if cubie in CUBIE_IDS['R']:
-            restricted_faces.add('R')
-
-    # Return the set of restricted faces
-    return restricted_faces
-
-def is_move_allowed(move, restricted_faces):
-    """
-    Checks if a given move is allowed based on the restricted faces from a fixed cubie.
-    The move is allowed only if the face of the move is not restricted.
-    
-    Parameters:
-    move (str): A string representing the move (e.g., 'U', 'R', 'F').
-    restricted_faces (set): A set of face identifiers that are restricted by the fixed cubie.
-    
-    Returns:
-    bool: True if the move is allowed, False otherwise.
-    """
-    # Extract the face identifier from the move
-    face = move[0]
-    
-    # Check if the face is not in the set of restricted faces
-    return face not in restricted_faces
+    # Look up the precomputed permutation of the move and apply it in a single gather
+    cube.apply_move(mv)
 
 def get_current_cube_state():
     """
@@ -1691,276 +1332,82 @@ def get_current_cube_state():
     Returns:
     list: A list of 6 lists, each containing a 3x3 grid of cubie colors for each face.
     """
-    global a
-    
-    # Construct the current cube state as a list of lists, where each sub-list
-    return [
-        [a[i][j][k] for j in range(3) for k in range(3)]  # Flatten each 3x3 face into a single list
-        for i in range(6)  # Iterate over all 6 faces of the cube
-    ]
+    # Split the flat facelet array into one list of 9 colours per face
+    return cube.to_faces()
 
-def get_kociemba_string(scanned_faces):
+def start_solving(scanned_faces, fixed_cubie):
     """
-    Converts a given set of scanned faces to a Kociemba string.
-    The Kociemba string is a compact representation of the cube state, used in the Kociemba algorithm for solving the Rubik's Cube.
-    
-    Parameters:
-    scanned_faces (dict): A dictionary mapping face identifiers ('U', 'R', 'F', 'D', 'L', 'B') to 3x3 matrices of colors.
-    
-    Returns:
-    str: A Kociemba string representing the state of the cube.
-    """
-    kociemba_string = ''  # Initialize an empty string to hold the Kociemba representation
-    face_order = 'URFDLB'  # Define the order in which to read the faces
-    face_index = {'U': 4, 'R': 1, 'F': 0, 'D': 5, 'L': 3, 'B': 2}  # Mapping of face identifiers to their indices in scanned_faces
+    Starts solving the Rubik's Cube on the solver thread, so the window keeps rendering.
 
-    # Iterate through the defined order of faces
-    for face in face_order:
-        # Get the colors of the current face using the face_index mapping
-        face_colors = scanned_faces[face_index[face]]
-        
-        # Append each color of the current face to the Kociemba string
-        for color in face_colors:
-            kociemba_string += color
-            
-    return kociemba_string  # Return the constructed Kociemba string
-
-def get_affected_faces(move):
-    """
-    Returns a set of affected faces based on the given move.
-    
     Args:
-        move (str): The move to evaluate. Can be a single letter (e.g., 'U') or a modifier (e.g., 'U2', 'Ui').
-        
+        scanned_faces (list): The colours of each face in scanning order.
+        fixed_cubie (list): A list of cubies that should remain fixed during the solution.
+
     Returns:
-        set: A set of faces affected by the move (e.g., 'U', 'D', 'L', 'R').
+        concurrent.futures.Future: Resolves to a cube_solver.AnytimeSolution; pass it to solve_cube().
+            Its stop_event attribute stops the search when set (see stop_solving()).
     """
-    affected = set()  # Initialize an empty set to hold affected faces
-
-    # Check if the move is a basic face rotation, inverse or double turns
-    if move[0] in ['U', 'D', 'F', 'B', 'L', 'R', 'UI', 'DI', 'FI', 'BI', 'LI', 'RI', 'U2', 'D2', 'F2', 'B2', 'L2', 'R2']:
-        affected.add(move[0])  # Add the face being rotated to the affected set
-    # Handle the middle layer move (M), which affects U, D, and the faces in between
-    elif move[0] == 'M':
-        affected.update(['U', 'D', 'F', 'B', 'UI', 'DI', 'FI', 'BI', 'U2', 'D2', 'F2', 'B2'])
-    # Handle the equatorial layer move (E), which affects F, R, B, L
-    elif move[0] == 'E':
-        affected.update(['F', 'R', 'B', 'L', 'FI', 'RI', 'BI', 'LI', 'F2', 'R2', 'B2', 'L2'])
-    # Handle the standing layer move (S), which affects U, D, L, R
-    elif move[0] == 'S':
-        affected.update(['U', 'D', 'L', 'R', 'UI', 'DI', 'LI', 'RI', 'U2', 'D2', 'L2', 'R2'])
-
-    return affected  # Return the set of affected faces
+    stop_event = threading.Event()
+    # Copies, since the game loop keeps updating its own lists
+    solve_future = get_solve_executor().submit(cube_solver.solve_cube_anytime, [list(face) for face in scanned_faces],
+                                               list(fixed_cubie), SOLVE_BUDGET, get_solution_cache(), stop_event)
+    solve_future.stop_event = stop_event
+    return solve_future
 
-def get_equivalent_move(move, fixed_faces):
+def stop_solving(solve_future):
     """
-    Returns a list of equivalent moves for a given move, considering fixed faces.
+    Cancels a solve started by start_solving() whose result is no longer wanted.
 
-    Args:
-        move (str): The move to evaluate (e.g., 'U', 'D', 'F', etc.).
-        fixed_faces (set): A set of faces that are fixed in place (e.g., {'U', 'F'}).
-
-    Returns:
-        list: A list of equivalent moves that would yield the same result (e.g., ['U', 'D']).
-    """
-    # Dictionary mapping moves to their equivalents, including inverse relationships
-    equivalents = {
-        'U': ['D', 'E'],
-        'D': ['U', 'Ei'],
-        'F': ['B', 'Si'],
-        'B': ['F', 'S'],
-        'L': ['R', 'Mi'],
-        'R': ['L', 'M'],
-        'Ui': ['Di', 'Ei'],
-        'Di': ['Ui', 'E'],
-        'Fi': ['Bi', 'S'],
-        'Bi': ['Fi', 'Si'],
-        'Li': ['Ri', 'M'],
-        'Ri': ['Li', 'Mi'],
-        'U2': ['D2', 'E2'],
-        'D2': ['U2', 'E2'],
-        'F2': ['B2', 'S2'],
-        'B2': ['F2', 'S2'],
-        'L2': ['R2', 'M2'],
-        'R2': ['L2', 'M2']
-    }
-
-    # Check if the move corresponds to a fixed face
-    if move[0] in fixed_faces:
-        # If it does, return the list of equivalent moves from the dictionary
-        return equivalents.get(move, [move])  # If the move is not in the dictionary, return the original move as a single-element list
-    return [move]
-
-def update_reference_frame(reference_frame, move):
-    """
-    Updates the reference frame of the cube after a move is performed.
+    A solve that has not started yet is dropped; one that is already running stops its
+    search, so the single solver thread is free for the next cube, and any background
+    search of its solution never starts.
 
     Args:
-        reference_frame (dict): A dictionary representing the current reference frame of the cube.
-        move (str): The move to apply (e.g., 'U', 'M', 'S').
-
-    Returns:
-        dict: The updated reference frame after applying the move.
-    """
-    # Dictionary mapping moves to their corresponding rotation transformations
-    rotations = {
-        'E': lambda rf: {
-            'U': rf['U'], 'D': rf['D'],
-            'F': rf['L'], 'B': rf['R'],
-            'L': rf['B'], 'R': rf['F']
-        },
-        'Ei': lambda rf: {
-            'U': rf['U'], 'D': rf['D'],
-            'F': rf['R'], 'B': rf['L'],
-            'L': rf['F'], 'R': rf['B']
-        },
-        'E2': lambda rf: {
-            'U': rf['U'], 'D': rf['D'],
-            'F': rf['B'], 'B': rf['F'],
-            'L': rf['R'], 'R': rf['L']
-        },
-        'M': lambda rf: {
-            'U': rf['B'], 'D': rf['F'],
-            'F': rf['U'], 'B': rf['D'],
-            'L': rf['L'], 'R': rf['R']
-        },
-        'Mi': lambda rf: {
-            'U': rf['F'], 'D': rf['B'],
-            'F': rf['D'], 'B': rf['U'],
-            'L': rf['L'], 'R': rf['R']
-        },
-        'M2': lambda rf: {
-            'U': rf['D'], 'D': rf['U'],
-            'F': rf['B'], 'B': rf['F'],
-            'L': rf['L'], 'R': rf['R']
-        },
-        'S': lambda rf: {
-            'U': rf['L'], 'D': rf['R'],
-            'F': rf['F'], 'B': rf['B'],
-            'L': rf['D'], 'R': rf['U']
-        },
-        'Si': lambda rf: {
-            'U': rf['R'], 'D': rf['L'],
-            'F': rf['F'], 'B': rf['B'],
-            'L': rf['U'], 'R': rf['D']
-        },
-        'S2': lambda rf: {
-            'U': rf['D'], 'D': rf['U'],
-            'F': rf['F'], 'B': rf['B'],
-            'L': rf['R'], 'R': rf['L']
-        }
-    }
-    # Check if the move exists in the rotations dictionary
-    if move in rotations:
-        # Apply the corresponding transformation to the reference frame
-        return rotations[move](reference_frame)
-    
-    # If the move is not recognized, return the original reference frame unchanged
-    return reference_frame
-
-def adjust_move_for_reference_frame(move, reference_frame):
+        solve_future (concurrent.futures.Future): The future returned by start_solving().
     """
-    Adjusts a move according to the current reference frame of the cube.
+    solve_future.cancel()
+    solve_future.stop_event.set()
 
-    Args:
-        move (str): The move to adjust (e.g., 'U', 'D2').
-        reference_frame (dict): A dictionary representing the current reference frame of the cube.
-
-    Returns:
-        str: The adjusted move based on the reference frame (e.g., 'F', 'B2').
+def solve_cube(solve_future):
     """
-    # Extract the face from the move
-    face = move[0]
-    
-    # Determine if the move has 'i', '2')
-    modifier = move[1:] if len(move) > 1 else ''
-    
-    # Find the adjusted face based on the reference frame
-    adjusted_face = next(key for key, value in reference_frame.items() if value == face)
-    
-    # Return the adjusted move, combining the adjusted face with its modifier
-    return adjusted_face + modifier
+    Collects the solution of a finished solve started by start_solving().
+    The solving itself is done by cube_solver; this shows the result or error to the user.
 
-def is_cube_solved(current_state):
-    """
-    Checks if the Rubik's Cube is in a solved state.
+    A first solution is available at once; shorter ones keep arriving in the background
+    for SOLVE_BUDGET seconds (see cube_solver.AnytimeSolution).
 
     Args:
-        current_state (list): The current state of the cube as a list of lists, where each list represents a face.
+        solve_future (concurrent.futures.Future): The finished future returned by start_solving().
 
     Returns:
-        bool: True if the cube is solved, False otherwise.
-    """
-    # Define the solved state of the Rubik's Cube
-    solved_state = [
-        ['F', 'F', 'F', 'F', 'F', 'F', 'F', 'F', 'F'],  #(Green)
-        ['R', 'R', 'R', 'R', 'R', 'R', 'R', 'R', 'R'],  #(Red)
-        ['B', 'B', 'B', 'B', 'B', 'B', 'B', 'B', 'B'],  #(Blue)
-        ['L', 'L', 'L', 'L', 'L', 'L', 'L', 'L', 'L'],  #(Orange)
-        ['U', 'U', 'U', 'U', 'U', 'U', 'U', 'U', 'U'],  #(White)
-        ['D', 'D', 'D', 'D', 'D', 'D', 'D', 'D', 'D']   #(Yellow)
-    ]
-    
-    # Flatten the current state of the cube into a single list
-    flat_current_state = [color for face in current_state for color in face]
-    
-    # Flatten the solved state of the cube into a single list
-    flat_solved_state = [color for face in solved_state for color in face]
-    
-    # Compare the flattened current state with the flattened solved state
-    return flat_current_state == flat_solved_state
-
-def solve_cube(scanned_faces, fixed_cubie):
-    """
-    Solves the Rubik's Cube based on the scanned faces and fixed cubie positions.
-
-    Args:
-        scanned_faces (dict): A dictionary representing the cube's faces and their current colors.
-        fixed_cubie (list): A list of cubies that should remain fixed during the solution.
-
-    Returns:
-        list: A list of moves that solve the cube, or None if the cube is already solved or cannot be solved.
+        AnytimeSolution: The improving solution, or None if the cube is already solved or cannot be solved.
     """
-    if is_cube_solved(scanned_faces):
-        show_popup_message(screen, "Cube already solved.")
-        return None
-    
-    # Convert the scanned faces into a Kociemba string representation
-    cube_string = get_kociemba_string(scanned_faces)
     try:
-        kociemba_solution = kociemba.solve(cube_string)
-        print("Kociemba solution:", kociemba_solution)
-        # Convert the Kociemba solution into a list of moves
-        original_moves = [move if len(move) == 1 else move[0] + ('i' if "'" in move else '2') for move in kociemba_solution.split()]
-        # Get the restricted faces based on fixed cubies
-        fixed_faces = get_restricted_faces(fixed_cubie)
-        # Initialize a list to hold modified moves
-        modified_moves = []
-        # Initialize the reference frame to the standard face positions
-        reference_frame = {face: face for face in 'UDFBLR'}
-        # Process the original moves to adapt them to the current reference frame
-        while original_moves:
-            move = original_moves.pop(0)
-            # Adjust the move for the current reference frame
-            adjusted_move = adjust_move_for_reference_frame(move, reference_frame)
-            if adjusted_move[0] in fixed_faces:
-                equivalent_moves = get_equivalent_move(adjusted_move, fixed_faces)
-                # Add the equivalent moves to the modified moves list
-                for eq_move in equivalent_moves:
-                    modified_moves.append(eq_move)
-                    # Update the reference frame based on the equivalent move
-                    reference_frame = update_reference_frame(reference_frame, eq_move)
-            else:
-                # If not affecting fixed faces, just add the adjusted move
-                modified_moves.append(adjusted_move)
-                # Update the reference frame for the adjusted move
-                reference_frame = update_reference_frame(reference_frame, adjusted_move)
-        print("Final Solution:")
-        print(' '.join(modified_moves))
-        return modified_moves
+        solution = solve_future.result()
+    except cube_solver.InvalidCubeError as e:
+        # Name the first problem the validator found, e.g. a sticker read as the wrong colour
+        problem = e.problems[0].message + " " if e.problems else ""
+        show_popup_message(screen, "Rubik's cube scanned incorrectly. " + problem + "Please scan again.")
+        return None
+    except ValueError as e:
+        # Several fixed cubies can leave too few moves to solve the cube
+        show_popup_message(screen, str(e) + " Please release a cubie.")
+        return None
+    except TimeoutError:
+        # A solution may exist, but the fixed cubies make it too slow to find
+        show_popup_message(screen, "Finding a solution took too long. Please release a cubie and try again.")
+        return None
     except Exception as e:
-        show_popup_message(screen, "Rubik's cube scanned incorrectly. Please scan again.")
+        # Anything else, e.g. an unreadable solution cache or table file, must not end the game loop
+        print("The solver failed:", repr(e))
+        show_popup_message(screen, "The solver failed. Please try again.")
+        return None
+    if not solution.moves:
+        show_popup_message(screen, "Cube already solved.")
         return None
+    print("Final Solution:")
+    print(' '.join(solution.moves))
+    return solution
 
 # Define constants to represent different states or screens in the application
 MAIN_MENU = 0
@@ -2018,7 +1465,7 @@ def main_menu():
 
         draw_background(screen)
 
-        title_font = pygame.font.Font(font_path, 72)
+        title_font = get_font(72)
         title_shadow = title_font.render("Rubik's Cube Adventure", True, BLACK)
         title = title_font.render("Rubik's Cube Adventure", True, PINK)
         shadow_rect = title.get_rect(center=(width//2 + 3, 103))
@@ -2059,7 +1506,7 @@ def game_loop():
     Includes logic for managing the game state, showing the cube on screen, 
     and handling cube-solving animations.
     """
-    global fixed_cubie, scanned_faces, a, camera
+    global fixed_cubie, scanned_faces, cube, camera
     clock = pygame.time.Clock()
     scanning_complete = False
     scanned_faces = []
@@ -2069,13 +1516,16 @@ def game_loop():
     is_paused = False
     current_move_index = 0
     moves_to_execute = []
+    anytime_solution = None
+    solution_version = 0
+    solve_future = None
     move_delay = 1500
     last_move_time = 0
     show_control_buttons = False
     solution_text = ""
     is_selecting_cubie = False
     is_scanning = False
-    camera = cv2.VideoCapture(0)
+    camera = open_camera()
     solve_cube_button = Button(start_x_camera_buttons + button_width + button_spacing, button_y, button_width, button_height, "SOLVE CUBE", GREEN)
     scan_cube_button = Button(start_x_camera_buttons, button_y, button_width, button_height, "SCAN CUBE", YELLOW)
     waterdrop_button = Button(start_x_camera_buttons + 2 * (button_width + button_spacing), button_y, button_width, button_height, "WATER DROP", BLUE, image=waterdrop_image)
@@ -2110,18 +1560,15 @@ def game_loop():
                         speed_adjuster.is_dragging = True
                 else:  # If control buttons are not visible
                     if solve_cube_button.is_clicked(mouse_pos):
-                        if scanning_complete:
-                            moves_to_execute = solve_cube(scanned_faces, fixed_cubie)
-                            if moves_to_execute:
-                                is_solving = True
-                                is_paused = False
-                                current_move_index = 0
-                                last_move_time = current_time 
-                                show_control_buttons = True
-                                show_water_drop_prompt = False
-                                is_selecting_cubie = False
-                                solution_text = ' '.join(moves_to_execute)
+                        if scanning_complete and solve_future is None:
+                            solve_future = start_solving(scanned_faces, fixed_cubie)
                     elif scan_cube_button.is_clicked(mouse_pos):
+                        if solve_future is not None:
+                            stop_solving(solve_future)  # Rescanning cancels the solve in progress
+                            solve_future = None
+                        if anytime_solution is not None:
+                            anytime_solution.cancel()  # The old cube's solution is no longer needed
+                            anytime_solution = None
                         is_scanning = True  # Start scanning process
                         scanning_complete = False
                         scanned_faces = []  # Reset scanned faces
@@ -2135,12 +1582,11 @@ def game_loop():
                         if new_faces:
                             scanned_faces = new_faces
                             scanning_complete = True
-                            for i, face in enumerate(scanned_faces):  # Update 'a' with scanned faces
-                                for j in range(3):
-                                    for k in range(3):
-                                        a[i][j][k] = face[j*3 + k]
+                            cube = CubeState.from_faces(scanned_faces)  # Update the cube with scanned faces
                         is_scanning = False
 
+                    elif solve_future is not None:
+                        pass  # The cube and water drop can't change while they are being solved
                     elif waterdrop_button.is_clicked(mouse_pos):
                         if not scanning_complete: 
                             show_popup_message(screen, "Please scan the cube first.")
@@ -2150,7 +1596,11 @@ def game_loop():
                     elif is_selecting_cubie:
                         clicked_cubies = get_clicked_cubie(mouse_pos)
                         if clicked_cubies:
-                            fixed_cubie = clicked_cubies
+                            # Clicking a fixed cubie releases its piece; any other piece is fixed as well
+                            if clicked_cubies[0] in fixed_cubie:
+                                fixed_cubie = [cubie for cubie in fixed_cubie if cubie not in clicked_cubies]
+                            else:
+                                fixed_cubie = fixed_cubie + [cubie for cubie in clicked_cubies if cubie not in fixed_cubie]
             
             elif event.type == pygame.MOUSEBUTTONUP:
                 speed_adjuster.is_dragging = False
@@ -2164,12 +1614,7 @@ def game_loop():
             if camera and camera.isOpened():
                 ret, frame = camera.read()
                 if ret:
-                    frame = cv2.cvtColor(frame, cv2.COLOR_BGR2RGB)
-                    frame_surface = pygame.surfarray.make_surface(frame).convert()
-                    frame_surface = pygame.transform.rotate(frame_surface, -90)
-                    frame_surface = pygame.transform.flip(frame_surface, True, False)
-                    frame_surface = pygame.transform.scale(frame_surface, (camera_feed_rect.width, camera_feed_rect.height))
-                    screen.blit(frame_surface, camera_feed_rect)
+                    screen.blit(get_preview_renderer().render(frame), camera_feed_rect)
 
         # Draw cube if scanning is complete
         if scanning_complete and not is_scanning:
@@ -2196,7 +1641,38 @@ def game_loop():
             draw_wrapped_text(screen, f"Final Solution: {solution_text}", 40, WHITE, solution_rect)
 
         if show_water_drop_prompt and is_selecting_cubie and not is_scanning:
-            draw_text(screen, "Click on a cubie to fix its position.", 30, droplet_highlight, camera_y + camera_height + 60)
+            draw_text(screen, "Click cubies to fix or release their positions.", 30, droplet_highlight, camera_y + camera_height + 60)
+
+        # Start playing the solution once the solver thread has found one
+        if solve_future is not None and solve_future.done():
+            anytime_solution = solve_cube(solve_future)
+            solve_future = None
+            if anytime_solution:
+                moves_to_execute = anytime_solution.moves
+                solution_version = anytime_solution.version
+                is_solving = True
+                is_paused = False
+                current_move_index = 0
+                last_move_time = current_time
+                show_control_buttons = True
+                show_water_drop_prompt = False
+                is_selecting_cubie = False
+                solution_text = ' '.join(moves_to_execute)
+        elif solve_future is not None:
+            spinner_y = solve_cube_button.rect.bottom + 40
+            draw_spinner(screen, (width // 2 - 90, spinner_y), 18, WHITE, current_time)
+            draw_text(screen, "Solving...", 30, WHITE, spinner_y)
+
+        # Swap in a shorter solution found in the background, if it still saves moves from here
+        if is_solving and anytime_solution is not None and anytime_solution.version != solution_version:
+            solution_version = anytime_solution.version
+            executed_moves = moves_to_execute[:current_move_index]
+            remaining_moves = anytime_solution.continuation(executed_moves)
+            if len(remaining_moves) < len(moves_to_execute) - current_move_index:
+                moves_to_execute = executed_moves + remaining_moves
+                solution_text = ' '.join(moves_to_execute)
+                print("Shorter Solution:")
+                print(solution_text)
 
         # Handle solving completion
         if is_solving and not is_paused and moves_to_execute:
@@ -2206,6 +1682,7 @@ def game_loop():
                 last_move_time = current_time  # Update last move time
                 scanned_faces = get_current_cube_state()  # Update scanned faces
             elif current_move_index >= len(moves_to_execute):  # If all moves have been executed
+                anytime_solution.cancel()
                 is_solving = False  # Reset solving state
                 show_control_buttons = False  # Hide control buttons
                 popup_button_width = 200
@@ -2213,11 +1690,11 @@ def game_loop():
                 exit_button = Button((width + 20) // 2, height // 2 + 50, popup_button_width, button_height, "EXIT", RED)
                 result = show_popup_message(screen, "Cube Solved!", buttons=[play_again_button, exit_button], is_congratulations=True)
                 if result == "PLAY AGAIN":
-                    if camera and camera.isOpened():
+                    if camera:
                         camera.release()
                     return True
                 elif result == "EXIT" or result == "quit":
-                    if camera and camera.isOpened():
+                    if camera:
                         camera.release()
                     pygame.quit()
                     sys.exit()
@@ -2226,12 +1703,19 @@ def game_loop():
         pygame.display.flip()
         clock.tick(30)
 
-    if camera and camera.isOpened():
+    if solve_future is not None:
+        stop_solving(solve_future)
+    if anytime_solution is not None:
+        anytime_solution.cancel()
+    if camera:
         camera.release()
     return False
 
 def main():
     pygame.init()
+    # Load the solver tables in the background while the menu is shown
+    threading.Thread(target=cube_solver.warm_up, args=(SOLVE_METHOD,), daemon=True).start()
+    get_sticker_classifier()  # Loads the colour profile of the last scan, if there is one
     if camera_permissions():
         main_menu()
     pygame.quit()
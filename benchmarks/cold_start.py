@@ -0,0 +1,115 @@
+"""
+Cold-start benchmark for the Rubik's Cube Solver.
+
+Every measurement runs in a fresh Python process, so nothing is cached between runs:
+
+    python benchmarks/cold_start.py --runs 5
+
+Reports the import time of each subsystem, the time until the first menu frame is shown
+and the latency of the first and a warm kociemba solve.
+"""
+import argparse
+import os
+import statistics
+import subprocess
+import sys
+
+# Repository root, where the application modules and drop.png live
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# Subsystems whose import time is measured
+SUBSYSTEMS = ['numpy', 'pygame', 'cv2', 'kociemba', 'cube_state', 'cube_solver', 'Rubiks_Cube_Solver']
+
+IMPORT_SNIPPET = """
+import time
+start = time.perf_counter()
+import {module}
+print(time.perf_counter() - start)
+"""
+
+# Draws the first frame of the main menu the same way main_menu() does
+FIRST_FRAME_SNIPPET = """
+import time
+start = time.perf_counter()
+import sys
+import pygame
+import Rubiks_Cube_Solver as app
+app.draw_background(app.screen)
+title = app.get_font(72).render("Rubik's Cube Adventure", True, app.PINK)
+app.screen.blit(title, title.get_rect(center=(app.width // 2, 100)))
+app.cube_animation(app.screen, min(app.width, app.height) // 4, 0.5, 0.8)
+for button in app.buttons + [app.start_game_button]:
+    button.draw(app.screen, (0, 0))
+pygame.display.flip()
+print(time.perf_counter() - start, int('cv2' in sys.modules))
+"""
+
+SOLVE_SNIPPET = """
+import time
+import cube_solver
+start = time.perf_counter()
+cube_solver.warm_up()
+first = time.perf_counter() - start
+start = time.perf_counter()
+cube_solver.solve_kociemba_string(cube_solver.WARM_UP_KOCIEMBA_STRING, [])
+print(first, time.perf_counter() - start)
+"""
+
+
+def run_snippet(snippet, env):
+    """
+    Runs a snippet in a fresh interpreter and returns the numbers it prints.
+
+    Args:
+        snippet (str): The Python code to run.
+        env (dict): Environment variables for the process.
+
+    Returns:
+        list: The floats printed by the snippet.
+    """
+    output = subprocess.run([sys.executable, '-c', snippet], cwd=ROOT, env=env, check=True,
+                            stdout=subprocess.PIPE, universal_newlines=True).stdout
+    return [float(value) for value in output.split()]
+
+
+def median_ms(samples):
+    """
+    Returns the median of a list of durations in milliseconds.
+
+    Args:
+        samples (list): Durations in seconds.
+
+    Returns:
+        float: The median in milliseconds.
+    """
+    return statistics.median(samples) * 1000
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Measure the cold-start time of the Rubik's Cube Solver.")
+    parser.add_argument('--runs', type=int, default=5, help="Number of fresh processes per measurement.")
+    parser.add_argument('--display', action='store_true', help="Use the real display instead of SDL's dummy driver.")
+    args = parser.parse_args(argv)
+
+    env = dict(os.environ, PYGAME_HIDE_SUPPORT_PROMPT='1')
+    if not args.display:
+        env['SDL_VIDEODRIVER'] = 'dummy'
+
+    print("{:<24} {:>12}".format("Import", "median (ms)"))
+    for module in SUBSYSTEMS:
+        samples = [run_snippet(IMPORT_SNIPPET.format(module=module), env)[0] for _ in range(args.runs)]
+        print("{:<24} {:>12.1f}".format(module, median_ms(samples)))
+
+    frames = [run_snippet(FIRST_FRAME_SNIPPET, env) for _ in range(args.runs)]
+    print()
+    print("{:<24} {:>12.1f}".format("First menu frame", median_ms([frame[0] for frame in frames])))
+    print("{:<24} {:>12}".format("OpenCV loaded at start", "yes" if any(frame[1] for frame in frames) else "no"))
+
+    solves = [run_snippet(SOLVE_SNIPPET, env) for _ in range(args.runs)]
+    print("{:<24} {:>12.1f}".format("First solve (tables)", median_ms([solve[0] for solve in solves])))
+    print("{:<24} {:>12.1f}".format("Warm solve", median_ms([solve[1] for solve in solves])))
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
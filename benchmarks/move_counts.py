@@ -0,0 +1,53 @@
+"""
+Move-count benchmark for the water-drop rewrite and the peephole optimizer.
+
+Solves random cubes with a random fixed sticker and reports the mean HTM, QTM and STM
+counts of the rewritten Kociemba solutions before and after optimize_moves():
+
+    python benchmarks/move_counts.py --cubes 500
+"""
+import argparse
+import os
+import random
+import sys
+
+import numpy as np
+
+# Repository root, where the application modules live
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+import cube_solver  # noqa: E402
+from cube_batch import CubeBatch, random_scrambles  # noqa: E402
+from move_optimizer import METRICS, count_moves, optimize_moves  # noqa: E402
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Compare move counts before and after the peephole optimizer.")
+    parser.add_argument('--cubes', type=int, default=500, help="Number of random cubes to solve.")
+    parser.add_argument('--seed', type=int, default=0, help="Seed of the scrambles and fixed stickers.")
+    args = parser.parse_args(argv)
+
+    batch = CubeBatch.solved(args.cubes)
+    batch.apply_move_sequences(random_scrambles(args.cubes, 25, np.random.default_rng(args.seed)))
+    stickers = random.Random(args.seed)
+    before = dict.fromkeys(METRICS, 0)
+    after = dict.fromkeys(METRICS, 0)
+    for i in range(args.cubes):
+        fixed_cubie = cube_solver.get_cubie_group(stickers.randint(1, 54))
+        restricted_faces = cube_solver.get_restricted_faces(fixed_cubie)
+        solution = cube_solver.kociemba_solve(batch[i].to_kociemba_string())
+        moves = cube_solver.rewrite_solution(solution, restricted_faces)
+        for counts, sequence in ((before, moves), (after, optimize_moves(moves))):
+            for metric, value in count_moves(sequence).items():
+                counts[metric] += value
+
+    print("{:<8} {:>10} {:>10}".format("Metric", "rewritten", "optimized"))
+    for metric in METRICS:
+        print("{:<8} {:>10.2f} {:>10.2f}".format(metric.upper(), before[metric] / args.cubes,
+                                                 after[metric] / args.cubes))
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
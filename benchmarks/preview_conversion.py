@@ -0,0 +1,138 @@
+"""
+Microbenchmark of drawing camera frames into the preview area.
+
+Compares the old chain of cvtColor(), make_surface(), convert(), rotate(), flip() and
+scale() with camera_preview.PreviewRenderer on synthetic camera frames, blitting the
+result to the window each time like the app does:
+
+    python benchmarks/preview_conversion.py --frames 300
+
+Reports the time per frame and how many new images (arrays or surfaces) every frame
+allocates, and checks that both paths show the same picture.
+"""
+import argparse
+import os
+import sys
+import time
+
+import numpy as np
+
+# No window is needed to measure the conversion
+os.environ.setdefault('SDL_VIDEODRIVER', 'dummy')
+
+import cv2  # noqa: E402
+import pygame  # noqa: E402
+
+# Repository root, where the application modules live
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from camera_preview import PreviewRenderer  # noqa: E402
+
+# Size of the window and of the app's camera feed area
+WINDOW_SIZE = (1280, 720)
+PREVIEW_SIZE = (880, 530)
+
+
+class AllocationCounter:
+    """
+    Wraps image functions and counts the calls that returned a new object instead of one of their arguments.
+    """
+    def __init__(self):
+        self.count = 0
+
+    def wrap(self, function):
+        def counted(*args, **kwargs):
+            result = function(*args, **kwargs)
+            if not any(result is arg for arg in args + tuple(kwargs.values())):
+                self.count += 1
+            return result
+        return counted
+
+
+def old_preview(frame, counter):
+    """
+    The conversion the app used before PreviewRenderer, with every call counted.
+    """
+    rgb = counter.wrap(cv2.cvtColor)(frame, cv2.COLOR_BGR2RGB)
+    surface = counter.wrap(pygame.surfarray.make_surface)(rgb)
+    surface = counter.wrap(pygame.Surface.convert)(surface)
+    surface = counter.wrap(pygame.transform.rotate)(surface, -90)
+    surface = counter.wrap(pygame.transform.flip)(surface, True, False)
+    return counter.wrap(pygame.transform.scale)(surface, PREVIEW_SIZE)
+
+
+def new_preview(renderer, counter):
+    """
+    Returns PreviewRenderer.render() with the OpenCV calls it makes counted.
+    """
+    resize, cvt_color = cv2.resize, cv2.cvtColor
+
+    def render(frame):
+        cv2.resize, cv2.cvtColor = counter.wrap(resize), counter.wrap(cvt_color)
+        try:
+            return renderer.render(frame)
+        finally:
+            cv2.resize, cv2.cvtColor = resize, cvt_color
+    return render
+
+
+def measure(render, frames, screen, counter):
+    """
+    Renders and blits every frame.
+
+    Returns:
+        tuple: Milliseconds per frame and allocations per frame.
+    """
+    counter.count = 0
+    start = time.perf_counter()
+    for frame in frames:
+        screen.blit(render(frame), (0, 0))
+    elapsed = time.perf_counter() - start
+    return elapsed / len(frames) * 1000, counter.count / len(frames)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Compare the old and new camera preview conversions.")
+    parser.add_argument('--frames', type=int, default=300, help="Number of frames to convert per path.")
+    parser.add_argument('--width', type=int, default=1280, help="Width of the camera frames.")
+    parser.add_argument('--height', type=int, default=720, help="Height of the camera frames.")
+    parser.add_argument('--seed', type=int, default=0, help="Seed of the synthetic frames.")
+    args = parser.parse_args(argv)
+
+    pygame.init()
+    screen = pygame.display.set_mode(WINDOW_SIZE)
+    rng = np.random.default_rng(args.seed)
+    # A few distinct frames, reused like a camera's ring of driver buffers
+    frames = [rng.integers(0, 256, (args.height, args.width, 3), dtype=np.uint8) for _ in range(8)]
+    frames = [frames[i % len(frames)] for i in range(args.frames)]
+
+    counter = AllocationCounter()
+    renderer = PreviewRenderer(PREVIEW_SIZE)
+    old_render = lambda frame: old_preview(frame, counter)  # noqa: E731
+    new_render = new_preview(renderer, counter)
+
+    # On a smooth frame, both paths show the same upright picture up to their interpolation
+    gradient = np.zeros((args.height, args.width, 3), dtype=np.uint8)
+    gradient[:, :, 0] = np.linspace(0, 255, args.width)[None, :]
+    gradient[:, :, 2] = np.linspace(0, 255, args.height)[:, None]
+    old_pixels = pygame.surfarray.array3d(old_render(gradient)).astype(int)
+    new_pixels = pygame.surfarray.array3d(new_render(gradient)).astype(int)
+    if np.abs(old_pixels - new_pixels).max() > 4:
+        print("The two paths show different pictures.")
+        return 1
+
+    measure(old_render, frames[:10], screen, counter)  # Warm-up
+    measure(new_render, frames[:10], screen, counter)
+    print("{}x{} frames to a {}x{} preview, {} frames per path".format(
+        args.width, args.height, PREVIEW_SIZE[0], PREVIEW_SIZE[1], args.frames))
+    print("{:<18} {:>10} {:>20}".format("path", "ms/frame", "allocations/frame"))
+    for name, render in (('old chain', old_render), ('PreviewRenderer', new_render)):
+        ms, allocations = measure(render, frames, screen, counter)
+        print("{:<18} {:>10.2f} {:>20.1f}".format(name, ms, allocations))
+    pygame.quit()
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,125 @@
+"""
+Load generator for the local solve service.
+
+Sends random cubes with random water-drop stickers to a running service from several
+client threads and reports the latency percentiles and the throughput:
+
+    python -m solve_service --port 8765 &
+    python benchmarks/service_latency.py --requests 500 --concurrency 8
+
+With --repeat, every cube is sent twice, so the second round measures cache hits.
+"""
+import argparse
+import http.client
+import json
+import os
+import random
+import sys
+import threading
+import time
+
+import numpy as np
+
+# Repository root, where the application modules live
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from cube_batch import CubeBatch, random_scrambles  # noqa: E402
+
+
+def make_requests(n, pins, seed):
+    """
+    Builds request bodies for random cubes.
+
+    Args:
+        n (int): Number of cubes.
+        pins (int): Number of fixed stickers per cube (0 for none).
+        seed (int): Seed of the scrambles and stickers.
+
+    Returns:
+        list: The JSON request bodies as bytes.
+    """
+    batch = CubeBatch.solved(n)
+    batch.apply_move_sequences(random_scrambles(n, 25, np.random.default_rng(seed)))
+    stickers = random.Random(seed)
+    return [json.dumps({'facelets': batch[i].to_kociemba_string(),
+                        'fixed_stickers': stickers.sample(range(1, 55), pins)}).encode('utf-8')
+            for i in range(n)]
+
+
+def run_client(host, port, bodies, latencies, errors):
+    """
+    Sends requests one after another over a single keep-alive connection.
+
+    Args:
+        host (str): The service address.
+        port (int): The service port.
+        bodies (list): The request bodies to send.
+        latencies (list): Receives the seconds every request took.
+        errors (list): Receives the error of every failed request.
+    """
+    connection = http.client.HTTPConnection(host, port)
+    try:
+        for body in bodies:
+            start = time.perf_counter()
+            connection.request('POST', '/solve', body, {'Content-Type': 'application/json'})
+            response = connection.getresponse()
+            result = json.loads(response.read().decode('utf-8'))
+            latencies.append(time.perf_counter() - start)
+            if response.status != 200 or 'error' in result:
+                errors.append(result.get('error', response.status))
+    finally:
+        connection.close()
+
+
+def get_stats(host, port):
+    """
+    Returns the counters the service reports on GET /stats.
+    """
+    connection = http.client.HTTPConnection(host, port)
+    try:
+        connection.request('GET', '/stats')
+        return json.loads(connection.getresponse().read().decode('utf-8'))
+    finally:
+        connection.close()
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Measure the latency of a running solve service.")
+    parser.add_argument('--host', default='127.0.0.1', help="The service address.")
+    parser.add_argument('--port', type=int, default=8765, help="The service port.")
+    parser.add_argument('--requests', type=int, default=200, help="Number of distinct cubes to send.")
+    parser.add_argument('--concurrency', type=int, default=8, help="Number of client threads.")
+    parser.add_argument('--pins', type=int, default=1, help="Fixed stickers per cube.")
+    parser.add_argument('--repeat', action='store_true', help="Send every cube a second time.")
+    parser.add_argument('--seed', type=int, default=0, help="Seed of the scrambles and fixed stickers.")
+    args = parser.parse_args(argv)
+
+    bodies = make_requests(args.requests, args.pins, args.seed)
+    if args.repeat:
+        bodies = bodies + bodies
+    latencies, errors = [], []
+    threads = [threading.Thread(target=run_client, args=(args.host, args.port, bodies[i::args.concurrency],
+                                                         latencies, errors))
+               for i in range(args.concurrency)]
+    start = time.perf_counter()
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    elapsed = time.perf_counter() - start
+
+    latencies = np.array(latencies) * 1000
+    print("{} requests from {} clients in {:.2f} s ({:.1f} requests/s), {} errors".format(
+        len(latencies), args.concurrency, elapsed, len(latencies) / elapsed, len(errors)))
+    for name, value in (('p50', np.percentile(latencies, 50)), ('p90', np.percentile(latencies, 90)),
+                        ('p99', np.percentile(latencies, 99)), ('max', latencies.max())):
+        print("{:<4} {:>9.2f} ms".format(name, value))
+    stats = get_stats(args.host, args.port)
+    print("Mean batch size {:.2f}, cache hits {}, misses {}".format(
+        stats['mean_batch_size'], stats['cache_hits'], stats['cache_misses']))
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
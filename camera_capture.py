@@ -0,0 +1,134 @@
+"""
+Background camera capture that always has the newest frame ready.
+
+VideoCapture.read() blocks until the camera delivers its next frame and hands out
+frames the driver buffered earlier, so a render loop that reads inline runs at the
+camera's pace and shows stale images. CameraStream reads the camera on a daemon thread
+into a small ring buffer instead; read() returns the newest frame at once, and the
+counters tell how many frames were captured, read and dropped unseen.
+"""
+import threading
+from collections import deque
+
+# Seconds to wait before retrying after the camera failed to deliver a frame
+RETRY_DELAY = 0.05
+
+
+class CameraStream:
+    """
+    Reads a camera on a background thread and keeps the newest frames.
+
+    It has the read(), isOpened() and release() methods of cv2.VideoCapture, so it can
+    replace one directly. A frame returned by read() is never written to again by the
+    capture thread, so the caller may draw on it.
+
+    Attributes:
+        frame_number (int): The number of the frame read() returned last (0 before the first).
+        captured (int): Frames delivered by the camera.
+        read_count (int): Frames returned by read() for the first time.
+        dropped (int): Frames replaced by newer ones before read() returned them.
+        failed (int): Failed attempts to grab a frame.
+
+    Methods:
+        read(): Returns the newest frame without waiting.
+        wait_for_frame(timeout): Waits for a frame newer than the last one read.
+        stats(): Returns the counters.
+        isOpened(): Checks whether the camera is open.
+        release(): Stops the thread and closes the camera.
+    """
+    def __init__(self, capture, buffer_size=2):
+        """
+        Starts reading the camera on a daemon thread.
+
+        Args:
+            capture (cv2.VideoCapture): The opened camera; the stream releases it.
+            buffer_size (int, optional): How many of the newest frames are kept.
+        """
+        self.frame_number = 0
+        self.captured = 0
+        self.read_count = 0
+        self.dropped = 0
+        self.failed = 0
+        self._capture = capture
+        self._frames = deque(maxlen=buffer_size)  # (frame number, frame), newest last
+        self._new_frame = threading.Condition()
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, name='camera', daemon=True)
+        self._thread.start()
+
+    def _run(self):
+        """
+        Grabs frames until release() is called.
+        """
+        while not self._stop.is_set():
+            # Blocks for up to one frame interval; a fresh array is allocated for every frame
+            ret, frame = self._capture.read()
+            if not ret:
+                with self._new_frame:
+                    self.failed += 1
+                self._stop.wait(RETRY_DELAY)
+                continue
+            with self._new_frame:
+                self.captured += 1
+                self._frames.append((self.captured, frame))
+                self._new_frame.notify_all()
+
+    def read(self):
+        """
+        Returns the newest frame without waiting for the camera.
+
+        Returns:
+            tuple: True and the newest frame (the same one again if no newer frame has arrived
+            since the last call, see frame_number), or False and None before the first frame.
+        """
+        with self._new_frame:
+            if not self._frames:
+                return False, None
+            number, frame = self._frames[-1]
+            if number != self.frame_number:
+                self.dropped += number - self.frame_number - 1
+                self.read_count += 1
+                self.frame_number = number
+            return True, frame
+
+    def wait_for_frame(self, timeout=None):
+        """
+        Waits until a frame newer than the last one read() returned has arrived.
+
+        Args:
+            timeout (float, optional): Maximum number of seconds to wait.
+
+        Returns:
+            bool: True if a new frame is ready.
+        """
+        with self._new_frame:
+            return bool(self._new_frame.wait_for(
+                lambda: self._frames and self._frames[-1][0] != self.frame_number, timeout))
+
+    def stats(self):
+        """
+        Returns the counters.
+
+        Returns:
+            dict: The frames captured, read, dropped and failed.
+        """
+        with self._new_frame:
+            return {'captured': self.captured, 'read': self.read_count, 'dropped': self.dropped,
+                    'failed': self.failed}
+
+    def isOpened(self):
+        """
+        Checks whether the camera is open and the stream has not been released.
+
+        Returns:
+            bool: True while frames can arrive.
+        """
+        return not self._stop.is_set() and self._capture.isOpened()
+
+    def release(self):
+        """
+        Stops the capture thread and closes the camera.
+        """
+        self._stop.set()
+        self._thread.join()
+        self._capture.release()
@@ -0,0 +1,55 @@
+"""
+Camera frames to a pygame surface without allocating anything per frame.
+
+Showing a frame used to take a colour conversion, make_surface(), convert(), a rotation,
+a flip and a scale, each of which allocates a full-size image. The rotation and flip
+only undo the transpose of make_surface(), so the same picture comes out of two OpenCV
+calls that write into preallocated arrays: a resize to the preview size, then the BGR
+to RGB conversion into an array that a pygame surface shares as its pixel buffer.
+"""
+import numpy as np
+import pygame
+
+
+class PreviewRenderer:
+    """
+    Renders camera frames into one reusable surface of a fixed size.
+
+    Attributes:
+        size (tuple): The width and height of the preview.
+        surface (pygame.Surface): The preview; it shares its pixels with the renderer, so
+            it changes with every render() and anything drawn on it lasts until then.
+
+    Methods:
+        render(frame): Draws a camera frame into the surface.
+    """
+    def __init__(self, size):
+        """
+        Allocates the buffers.
+
+        Args:
+            size (tuple): The width and height of the preview.
+        """
+        self.size = tuple(size)
+        width, height = self.size
+        self._resized = np.empty((height, width, 3), dtype=np.uint8)
+        self._rgb = np.empty((height, width, 3), dtype=np.uint8)
+        self.surface = pygame.image.frombuffer(self._rgb, self.size, 'RGB')
+
+    def render(self, frame):
+        """
+        Draws a camera frame into the surface, scaled to the preview size.
+
+        Args:
+            frame (numpy.ndarray): The camera frame (BGR) as returned by VideoCapture.read().
+
+        Returns:
+            pygame.Surface: The surface attribute, holding the frame.
+        """
+        # Imported here like everywhere else in the app, so OpenCV only loads once the camera is used
+        import cv2
+
+        # Scaling first leaves fewer pixels for the colour conversion
+        cv2.resize(frame, self.size, dst=self._resized, interpolation=cv2.INTER_LINEAR)
+        cv2.cvtColor(self._resized, cv2.COLOR_BGR2RGB, dst=self._rgb)
+        return self.surface
@@ -0,0 +1,790 @@
+"""
+Two-phase search that only uses the moves a fixed water-drop piece allows.
+
+Instead of solving without constraints and then rewriting every turn of a restricted
+face as an opposite face turn plus a slice move, the search runs directly over the
+allowed moves: turns of the unrestricted faces and the slice moves that leave the
+fixed piece in place. Slice moves turn the centres, so the search follows the cube as
+seen from its centres (a CubieCube) together with the orientation of the centres.
+
+Phase 1 brings the cube into the subgroup <U, D, R2, L2, F2, B2> of the centres frame
+and phase 2 solves it inside that subgroup. Both phases are IDA* searches guided by
+pruning tables. The tables can be built once and stored as flat files, which are then
+memory-mapped on first use; without the files they are built with NumPy in memory:
+
+    python -m constrained_search build-tables
+"""
+import argparse
+import os
+import sys
+import time
+from functools import lru_cache
+from itertools import permutations
+
+import numpy as np
+
+from cube_state import MOVE_TABLES, WHOLE_CUBE_ROTATIONS, CubeState
+from cubie import (FACE_MOVES, MOVE_CUBES, N_CORNER_PERMUTATION, N_FLIP, N_SLICE, N_SLICE_PERMUTATION, N_TWIST,
+                   N_UD_EDGE_PERMUTATION, SLICE_POSITIONS, CubieCube, get_coordinate_move_tables,
+                   to_centres_frame, _rank_permutations)
+import table_store
+
+# Every physical move the search can use, in the project notation
+PHYSICAL_MOVES = [layer + suffix for layer in 'UDFBLRMES' for suffix in ('', '2', 'i')]
+
+# Layers on the same axis commute; each layer gets axis * 3 + position so runs of them are searched in one order
+_LAYER_ORDER = {'U': 0, 'E': 1, 'D': 2, 'R': 3, 'M': 4, 'L': 5, 'F': 6, 'S': 7, 'B': 8}
+
+# Face turns that keep the centres frame in the phase 2 subgroup
+PHASE2_FACE_MOVES = ['U', 'U2', 'Ui', 'D', 'D2', 'Di', 'R2', 'L2', 'F2', 'B2']
+
+# Distance stored in the pruning tables for coordinates the allowed moves can never reach
+UNREACHABLE = 255
+
+# Longest phase 2 tried before any solution has been found
+MAX_PHASE2_LENGTH = 20
+
+# Bump when the layout or meaning of the stored tables changes, so old table files are ignored
+TABLES_VERSION = 1
+
+# Where build_table_files() writes the tables and the solver looks for them
+TABLE_DIRECTORY = os.environ.get('CUBE_TABLE_DIR', os.path.join(os.path.dirname(os.path.abspath(__file__)), 'tables'))
+
+_OPPOSITE_FACES = {'U': 'D', 'D': 'U', 'R': 'L', 'L': 'R', 'F': 'B', 'B': 'F'}
+
+
+def _cube_key(cube):
+    """
+    Returns a hashable key of a cubie cube.
+    """
+    return tuple(cube.cp + cube.co + cube.ep + cube.eo)
+
+
+def _build_generators():
+    """
+    Works out what every physical move does to the cube as seen from its centres.
+
+    A face turn is a turn of whichever face of the centres frame is at that position, and a
+    slice move turns the two opposite faces of the centres frame and then the centres.
+
+    Returns:
+        tuple: The generators (tuples of FACE_MOVES indices), and for every orientation and
+        physical move the index of its generator and the orientation after the move.
+    """
+    # Every face turn and every pair of turns on opposite faces, keyed by the resulting cube
+    products = {}
+    for i, first in enumerate(FACE_MOVES):
+        products[_cube_key(MOVE_CUBES[first])] = (i,)
+        for j, second in enumerate(FACE_MOVES):
+            if second[0] == _OPPOSITE_FACES[first[0]]:
+                cube = MOVE_CUBES[first].copy()
+                cube.multiply(MOVE_CUBES[second])
+                products.setdefault(_cube_key(cube), (i, j))
+
+    generators = []
+    generator_index = {}
+    transitions = []
+    for _, rotation in WHOLE_CUBE_ROTATIONS:
+        row = []
+        for mv in PHYSICAL_MOVES:
+            state = CubeState()
+            state.apply_permutation(rotation)
+            state.apply_move(mv)
+            orientation, cube = to_centres_frame(state)
+            effect = products[_cube_key(cube)]
+            if effect not in generator_index:
+                generator_index[effect] = len(generators)
+                generators.append(effect)
+            row.append((generator_index[effect], orientation))
+        transitions.append(row)
+    return generators, transitions
+
+
+def _compose_tables(table, generators):
+    """
+    Combines a coordinate move table over FACE_MOVES into one over the generators.
+
+    Args:
+        table (numpy.ndarray): A [coordinate, face move] table.
+        generators (list): Tuples of FACE_MOVES indices.
+
+    Returns:
+        numpy.ndarray: A [coordinate, generator] table.
+    """
+    columns = []
+    for generator in generators:
+        column = np.arange(len(table))
+        for mv in generator:
+            column = table[column, mv]
+        columns.append(column)
+    return np.stack(columns, axis=1)
+
+
+def _build_slice_table():
+    """
+    Builds the move table of the slice coordinate over FACE_MOVES.
+
+    Returns:
+        numpy.ndarray: A 495 x 18 table.
+    """
+    table = np.zeros((N_SLICE, len(FACE_MOVES)), dtype=np.int64)
+    for i, positions in enumerate(SLICE_POSITIONS):
+        cube = CubieCube()
+        others = iter(range(8))
+        slice_edges = iter(range(8, 12))
+        cube.ep = [next(slice_edges) if j in positions else next(others) for j in range(12)]
+        for k, mv in enumerate(FACE_MOVES):
+            moved = cube.copy()
+            moved.multiply(MOVE_CUBES[mv])
+            table[i, k] = moved.get_slice()
+    return table
+
+
+def _build_phase2_edge_tables():
+    """
+    Builds the move tables of the U/D edge and slice edge permutations over FACE_MOVES.
+
+    Only the phase 2 moves keep the two groups of edges apart; the other columns are left at 0.
+
+    Returns:
+        tuple: A 8! x 18 table and a 4! x 18 table.
+    """
+    ud_edges = np.array(list(permutations(range(8))), dtype=np.int64)
+    slice_edges = np.array(list(permutations(range(4))), dtype=np.int64)
+    ud_table = np.zeros((N_UD_EDGE_PERMUTATION, len(FACE_MOVES)), dtype=np.int64)
+    slice_table = np.zeros((N_SLICE_PERMUTATION, len(FACE_MOVES)), dtype=np.int64)
+    for k, mv in enumerate(FACE_MOVES):
+        if mv in PHASE2_FACE_MOVES:
+            ep = MOVE_CUBES[mv].ep
+            ud_table[:, k] = _rank_permutations(ud_edges[:, ep[:8]])
+            slice_table[:, k] = _rank_permutations(slice_edges[:, [piece - 8 for piece in ep[8:]]])
+    return ud_table, slice_table
+
+
+def _build_pruning_table(table_a, table_b, generators):
+    """
+    Computes the distance to solved of every pair of two coordinates by breadth-first search.
+
+    Args:
+        table_a (numpy.ndarray): The [coordinate, generator] table of the first coordinate.
+        table_b (numpy.ndarray): The [coordinate, generator] table of the second coordinate.
+        generators (list): The generator columns the search may use.
+
+    Returns:
+        numpy.ndarray: The distance of pair (a, b) at index a * len(table_b) + b.
+    """
+    size_b = len(table_b)
+    depth = np.full(len(table_a) * size_b, UNREACHABLE, dtype=np.uint8)
+    depth[0] = 0
+    frontier = np.zeros(1, dtype=np.int64)
+    distance = 0
+    while frontier.size:
+        a, b = np.divmod(frontier, size_b)
+        for g in generators:
+            reached = table_a[a, g] * size_b + table_b[b, g]
+            reached = reached[depth[reached] == UNREACHABLE]
+            depth[reached] = distance + 1
+        distance += 1
+        frontier = np.flatnonzero(depth == distance)
+    return depth
+
+
+def _phase2_generators(generators):
+    """
+    Returns the indices of the generators that stay inside the phase 2 subgroup.
+    """
+    phase2 = {FACE_MOVES.index(mv) for mv in PHASE2_FACE_MOVES}
+    return {g for g, generator in enumerate(generators) if set(generator) <= phase2}
+
+
+def _build_search_arrays(generators):
+    """
+    Computes the move and pruning tables shared by every set of allowed moves.
+
+    Args:
+        generators (list): The generators from _build_generators().
+
+    Returns:
+        dict: NumPy arrays keyed by the attribute names of SearchTables.
+    """
+    face_tables = get_coordinate_move_tables()
+    twist = _compose_tables(face_tables['twist'].astype(np.int64), generators)
+    flip = _compose_tables(face_tables['flip'].astype(np.int64), generators)
+    slice_ = _compose_tables(_build_slice_table(), generators)
+    corner = _compose_tables(face_tables['corner_permutation'].astype(np.int64), generators)
+    ud_edge, slice_permutation = (_compose_tables(table, generators) for table in _build_phase2_edge_tables())
+
+    all_generators = range(len(generators))
+    phase2_generators = sorted(_phase2_generators(generators))
+    return {
+        'twist_move': twist.astype(np.uint16),
+        'flip_move': flip.astype(np.uint16),
+        'slice_move': slice_.astype(np.uint16),
+        'corner_move': corner.astype(np.uint16),
+        'ud_edge_move': ud_edge.astype(np.uint16),
+        'slice_permutation_move': slice_permutation.astype(np.uint16),
+        'slice_twist_prune': _build_pruning_table(slice_, twist, all_generators),
+        'slice_flip_prune': _build_pruning_table(slice_, flip, all_generators),
+        'slice_corner_prune': _build_pruning_table(slice_permutation, corner, phase2_generators),
+        'slice_ud_edge_prune': _build_pruning_table(slice_permutation, ud_edge, phase2_generators)
+    }
+
+
+def _as_views(arrays):
+    """
+    Flattens NumPy tables into memoryviews, the same type load_tables() returns.
+
+    Indexing a memoryview returns a plain int, which is much faster than indexing a NumPy array.
+    """
+    return {key: memoryview(np.ascontiguousarray(array).ravel()) for key, array in arrays.items()}
+
+
+class SearchTables:
+    """
+    Holds the move and pruning tables of the constrained two-phase search.
+
+    Every table is a flat sequence of ints: either memory-mapped from the files written by
+    build_table_files() or, if those are missing, computed in memory.
+
+    Attributes:
+        generators (list): What each generator does in the centres frame, as FACE_MOVES indices.
+        transitions (list): For every orientation and physical move, the generator and the new orientation.
+        phase2_generators (set): The generators that stay inside the phase 2 subgroup.
+        n_generators (int): The row length of the move tables.
+        twist_move, flip_move, slice_move: Phase 1 move tables, indexed by coordinate * n_generators + generator.
+        corner_move, ud_edge_move, slice_permutation_move: Phase 2 move tables, indexed the same way.
+        slice_twist_prune, slice_flip_prune: Phase 1 distances, indexed by slice * size + coordinate.
+        slice_corner_prune, slice_ud_edge_prune: Phase 2 distances, indexed by slice permutation * 8! + coordinate.
+    """
+    def __init__(self, generators, transitions, tables):
+        """
+        Initializes the tables.
+
+        Args:
+            generators (list): The generators from _build_generators().
+            transitions (list): The transitions from _build_generators().
+            tables (dict): Flat tables keyed by attribute name.
+        """
+        self.generators = generators
+        self.transitions = transitions
+        self.phase2_generators = _phase2_generators(generators)
+        self.n_generators = len(generators)
+        self.twist_move = tables['twist_move']
+        self.flip_move = tables['flip_move']
+        self.slice_move = tables['slice_move']
+        self.corner_move = tables['corner_move']
+        self.ud_edge_move = tables['ud_edge_move']
+        self.slice_permutation_move = tables['slice_permutation_move']
+        self.slice_twist_prune = tables['slice_twist_prune']
+        self.slice_flip_prune = tables['slice_flip_prune']
+        self.slice_corner_prune = tables['slice_corner_prune']
+        self.slice_ud_edge_prune = tables['slice_ud_edge_prune']
+
+    def array(self, name):
+        """
+        Returns a move table as a [coordinate, generator] NumPy array without copying it.
+
+        Args:
+            name (str): The attribute name of the table (e.g. 'twist_move').
+
+        Returns:
+            numpy.ndarray: The read-only table.
+        """
+        return np.frombuffer(getattr(self, name), dtype=np.uint16).reshape(-1, self.n_generators)
+
+
+def _build_orientation_pruning_table(table, generators, orientations, allowed=None):
+    """
+    Computes the distance to solved of every coordinate value in every orientation of the centres.
+
+    The cube counts as solved in any orientation, so the search starts from all of them.
+
+    Args:
+        table (numpy.ndarray): The [coordinate, generator] move table.
+        generators (numpy.ndarray): The generator of every move in every orientation, [orientation, move].
+        orientations (numpy.ndarray): The orientation after every move, [orientation, move].
+        allowed (numpy.ndarray, optional): Which moves may be used in every orientation.
+
+    Returns:
+        numpy.ndarray: The distance of coordinate c in orientation o at index c * 24 + o.
+    """
+    n_orientations = len(generators)
+    depth = np.full(len(table) * n_orientations, UNREACHABLE, dtype=np.uint8)
+    depth[:n_orientations] = 0
+    frontier = np.arange(n_orientations)
+    distance = 0
+    while frontier.size:
+        coordinate, orientation = np.divmod(frontier, n_orientations)
+        for k in range(generators.shape[1]):
+            reached = table[coordinate, generators[orientation, k]] * n_orientations + orientations[orientation, k]
+            if allowed is not None:
+                reached = reached[allowed[orientation, k]]
+            reached = reached[depth[reached] == UNREACHABLE]
+            depth[reached] = distance + 1
+        distance += 1
+        frontier = np.flatnonzero(depth == distance)
+    return depth
+
+
+def _build_constraint_arrays(tables, allowed_moves):
+    """
+    Computes the pruning tables of one set of allowed moves.
+
+    Args:
+        tables (SearchTables): The shared tables.
+        allowed_moves (tuple): The allowed moves from PHYSICAL_MOVES.
+
+    Returns:
+        dict: NumPy arrays keyed by the attribute names of ConstraintTables.
+    """
+    columns = [PHYSICAL_MOVES.index(mv) for mv in allowed_moves]
+    generators = np.array([[row[k][0] for k in columns] for row in tables.transitions])
+    orientations = np.array([[row[k][1] for k in columns] for row in tables.transitions])
+    phase2 = np.isin(generators, sorted(tables.phase2_generators))
+    # Widened so coordinate * 24 can't overflow the stored uint16
+    twist, flip, corner, ud_edge = (tables.array(name).astype(np.int64)
+                                    for name in ('twist_move', 'flip_move', 'corner_move', 'ud_edge_move'))
+    return {
+        'twist_prune': _build_orientation_pruning_table(twist, generators, orientations),
+        'flip_prune': _build_orientation_pruning_table(flip, generators, orientations),
+        'corner_prune': _build_orientation_pruning_table(corner, generators, orientations, phase2),
+        'ud_edge_prune': _build_orientation_pruning_table(ud_edge, generators, orientations, phase2)
+    }
+
+
+class ConstraintTables:
+    """
+    Holds the pruning tables of one set of allowed moves.
+
+    These tables know which faces cannot be turned and where the centres are, so they
+    give much tighter bounds than the shared tables when most turns need a slice move.
+
+    Attributes:
+        twist_prune, flip_prune: Phase 1 distances, indexed by coordinate * 24 + orientation.
+        corner_prune, ud_edge_prune: Phase 2 distances, indexed by coordinate * 24 + orientation.
+    """
+    def __init__(self, tables):
+        """
+        Initializes the tables.
+
+        Args:
+            tables (dict): Flat tables keyed by attribute name.
+        """
+        self.twist_prune = tables['twist_prune']
+        self.flip_prune = tables['flip_prune']
+        self.corner_prune = tables['corner_prune']
+        self.ud_edge_prune = tables['ud_edge_prune']
+
+
+def _constraint_table_name(allowed_moves):
+    """
+    Names the table files of a set of allowed moves after its layers (e.g. 'constraint-UFLMES').
+    """
+    return 'constraint-' + ''.join(sorted(set(mv[0] for mv in allowed_moves), key=_LAYER_ORDER.get))
+
+
+@lru_cache(maxsize=None)
+def get_search_tables():
+    """
+    Maps the table files on first use, or builds the tables if they are missing, and then returns the cached copy.
+
+    Returns:
+        SearchTables: The tables.
+    """
+    loaded = table_store.load_tables(TABLE_DIRECTORY, 'search', TABLES_VERSION)
+    if loaded is not None:
+        tables, metadata = loaded
+        generators = [tuple(generator) for generator in metadata['generators']]
+        transitions = [[tuple(transition) for transition in row] for row in metadata['transitions']]
+        return SearchTables(generators, transitions, tables)
+    generators, transitions = _build_generators()
+    return SearchTables(generators, transitions, _as_views(_build_search_arrays(generators)))
+
+
+@lru_cache(maxsize=32)
+def get_constraint_tables(allowed_moves):
+    """
+    Maps the table files of a set of allowed moves on first use, or builds the tables if they are
+    missing, and then returns the cached copy.
+
+    Args:
+        allowed_moves (tuple): The allowed moves from PHYSICAL_MOVES.
+
+    Returns:
+        ConstraintTables: The tables.
+    """
+    loaded = table_store.load_tables(TABLE_DIRECTORY, _constraint_table_name(allowed_moves), TABLES_VERSION)
+    if loaded is not None:
+        return ConstraintTables(loaded[0])
+    return ConstraintTables(_as_views(_build_constraint_arrays(get_search_tables(), allowed_moves)))
+
+
+def get_allowed_moves(fixed_cubie, restricted_faces):
+    """
+    Lists the physical moves that leave the fixed piece in place.
+
+    Turns of the restricted faces are never allowed (as in is_move_allowed()), and a slice
+    move is allowed only if it does not move any sticker of the fixed piece.
+
+    Args:
+        fixed_cubie (list): The sticker IDs of the fixed piece.
+        restricted_faces (set): The faces returned by get_restricted_faces().
+
+    Returns:
+        list: The allowed moves from PHYSICAL_MOVES.
+    """
+    stickers = [sticker - 1 for sticker in fixed_cubie]
+    allowed = []
+    for mv in PHYSICAL_MOVES:
+        if mv[0] in 'MES':
+            perm = MOVE_TABLES[mv.upper()]
+            if all(perm[sticker] == sticker for sticker in stickers):
+                allowed.append(mv)
+        elif mv[0] not in restricted_faces:
+            allowed.append(mv)
+    return allowed
+
+
+@lru_cache(maxsize=None)
+def _solved_facelets():
+    """
+    Returns the facelets of the solved cube in each of the 24 whole-cube orientations.
+
+    Returns:
+        numpy.ndarray: A 24 x 54 array; row k is the solved cube rotated by WHOLE_CUBE_ROTATIONS[k].
+    """
+    rows = []
+    for _, rotation in WHOLE_CUBE_ROTATIONS:
+        state = CubeState()
+        state.apply_permutation(rotation)
+        rows.append(state.facelets.copy())
+    return np.array(rows)
+
+
+def _can_be_solved(state, orientation, transitions, allowed_moves):
+    """
+    Checks the stickers that no allowed move can reach against every solved cube the moves can end in.
+
+    Pins can freeze pieces that are not pinned themselves: with the F centre and the UFL
+    corner pinned, nothing may turn the F, L or U faces or the M and E slices, so the FL
+    and UF edges never move. Such stickers, and the pinned ones, must already show the
+    colours of a solved cube in an orientation the allowed slices can turn the centres
+    to; otherwise no solution exists, however long the search runs.
+
+    Args:
+        state (CubeState): The cube.
+        orientation (int): The orientation of its centres (see cubie.to_centres_frame()).
+        transitions (list): SearchTables.transitions.
+        allowed_moves (tuple): The allowed moves from PHYSICAL_MOVES.
+
+    Returns:
+        bool: False if no solution can exist; True says nothing more than that.
+    """
+    moved = np.zeros(54, dtype=bool)
+    for mv in allowed_moves:
+        moved |= MOVE_TABLES[mv.upper()] != np.arange(54)
+    frozen = np.flatnonzero(~moved)
+
+    # Orientations the centres can reach with the allowed slices
+    columns = [PHYSICAL_MOVES.index(mv) for mv in allowed_moves]
+    reachable = {orientation}
+    frontier = [orientation]
+    while frontier:
+        current = frontier.pop()
+        for k in columns:
+            next_orientation = transitions[current][k][1]
+            if next_orientation not in reachable:
+                reachable.add(next_orientation)
+                frontier.append(next_orientation)
+
+    solved = _solved_facelets()[sorted(reachable)]
+    return bool((solved[:, frozen] == state.facelets[frozen]).all(axis=1).any())
+
+
+class SearchTimeout(TimeoutError):
+    """
+    Raised when the time budget of a search runs out (or it is stopped) before it found any solution.
+
+    A search that ends without a solution and without this error has proven that no
+    solution exists (within the length it was given).
+    """
+
+
+class _Search:
+    """
+    One constrained two-phase search from a given cube.
+    """
+    def __init__(self, tables, constraint_tables, orientation, cube, allowed_moves):
+        self.tables = tables
+        self.constraint_tables = constraint_tables
+        self.orientation = orientation
+        self.cube = cube
+        # For every orientation: (physical move, layer, generator, next orientation) of each allowed move
+        self.phase1_moves = []
+        self.phase2_moves = []
+        for row in tables.transitions:
+            moves = []
+            for mv in allowed_moves:
+                generator, next_orientation = row[PHYSICAL_MOVES.index(mv)]
+                moves.append((mv, _LAYER_ORDER[mv[0]], generator, next_orientation))
+            self.phase1_moves.append(moves)
+            self.phase2_moves.append([move for move in moves if move[2] in tables.phase2_generators])
+        self.path = []
+        self.generator_path = []
+        self.solutions = []
+        self.max_length = None
+        self.deadline = None
+        self.stop_event = None
+        self.nodes = 0
+
+    def check_deadline(self):
+        """
+        Stops the search once the deadline has passed or the stop event is set.
+        """
+        if self.deadline is not None and time.perf_counter() > self.deadline:
+            raise SearchTimeout()
+        if self.stop_event is not None and self.stop_event.is_set():
+            raise SearchTimeout()
+
+    def phase1_distance(self, twist, flip, slice_, orientation):
+        tables, constraint_tables = self.tables, self.constraint_tables
+        return max(tables.slice_twist_prune[slice_ * N_TWIST + twist], tables.slice_flip_prune[slice_ * N_FLIP + flip],
+                   constraint_tables.twist_prune[twist * 24 + orientation],
+                   constraint_tables.flip_prune[flip * 24 + orientation])
+
+    def phase2_distance(self, corner, ud_edge, slice_permutation, orientation):
+        tables, constraint_tables = self.tables, self.constraint_tables
+        offset = slice_permutation * N_CORNER_PERMUTATION
+        return max(tables.slice_corner_prune[offset + corner], tables.slice_ud_edge_prune[offset + ud_edge],
+                   constraint_tables.corner_prune[corner * 24 + orientation],
+                   constraint_tables.ud_edge_prune[ud_edge * 24 + orientation])
+
+    def phase1(self, twist, flip, slice_, orientation, togo, last_layer):
+        """
+        Depth-first phase 1 search for exactly togo more moves.
+        """
+        self.nodes += 1
+        if self.nodes & 1023 == 0:
+            self.check_deadline()
+        if togo == 0:
+            # A last move inside the subgroup means a shorter phase 1 was already tried
+            if self.generator_path and self.generator_path[-1] in self.tables.phase2_generators:
+                return False
+            return self.start_phase2(orientation, last_layer)
+        tables, constraint_tables = self.tables, self.constraint_tables
+        slice_twist_prune, slice_flip_prune = tables.slice_twist_prune, tables.slice_flip_prune
+        twist_prune, flip_prune = constraint_tables.twist_prune, constraint_tables.flip_prune
+        # Row of each move table; slicing a memoryview doesn't copy
+        n = tables.n_generators
+        twist_move = tables.twist_move[twist * n:(twist + 1) * n]
+        flip_move = tables.flip_move[flip * n:(flip + 1) * n]
+        slice_move = tables.slice_move[slice_ * n:(slice_ + 1) * n]
+        for mv, layer, generator, next_orientation in self.phase1_moves[orientation]:
+            if last_layer // 3 == layer // 3 and layer <= last_layer:
+                continue
+            next_twist = twist_move[generator]
+            next_flip = flip_move[generator]
+            next_slice = slice_move[generator]
+            # Same bound as phase1_distance(), written out since this loop runs for every node
+            if (twist_prune[next_twist * 24 + next_orientation] >= togo
+                    or flip_prune[next_flip * 24 + next_orientation] >= togo
+                    or slice_twist_prune[next_slice * N_TWIST + next_twist] >= togo
+                    or slice_flip_prune[next_slice * N_FLIP + next_flip] >= togo):
+                continue
+            self.path.append(mv)
+            self.generator_path.append(generator)
+            found = self.phase1(next_twist, next_flip, next_slice, next_orientation, togo - 1, layer)
+            self.path.pop()
+            self.generator_path.pop()
+            if found:
+                return True
+        return False
+
+    def start_phase2(self, orientation, last_layer):
+        """
+        Runs phase 2 from the end of the current phase 1 path.
+        """
+        cube = self.cube.copy()
+        for generator in self.generator_path:
+            for mv in self.tables.generators[generator]:
+                cube.multiply(MOVE_CUBES[FACE_MOVES[mv]])
+        corner = cube.get_corner_permutation()
+        ud_edge = cube.get_ud_edge_permutation()
+        slice_permutation = cube.get_slice_permutation()
+        limit = MAX_PHASE2_LENGTH if self.max_length is None else self.max_length - len(self.path)
+        for togo in range(self.phase2_distance(corner, ud_edge, slice_permutation, orientation), limit + 1):
+            if self.phase2(corner, ud_edge, slice_permutation, orientation, togo, last_layer):
+                return True
+        return False
+
+    def phase2(self, corner, ud_edge, slice_permutation, orientation, togo, last_layer):
+        """
+        Depth-first phase 2 search for exactly togo more moves.
+        """
+        self.nodes += 1
+        if self.nodes & 1023 == 0:
+            self.check_deadline()
+        if togo == 0:
+            if corner == 0 and ud_edge == 0 and slice_permutation == 0:
+                self.solutions.append(list(self.path))
+                return True
+            return False
+        tables, constraint_tables = self.tables, self.constraint_tables
+        slice_corner_prune, slice_ud_edge_prune = tables.slice_corner_prune, tables.slice_ud_edge_prune
+        corner_prune, ud_edge_prune = constraint_tables.corner_prune, constraint_tables.ud_edge_prune
+        n = tables.n_generators
+        corner_move = tables.corner_move[corner * n:(corner + 1) * n]
+        ud_edge_move = tables.ud_edge_move[ud_edge * n:(ud_edge + 1) * n]
+        slice_permutation_move = tables.slice_permutation_move[slice_permutation * n:(slice_permutation + 1) * n]
+        for mv, layer, generator, next_orientation in self.phase2_moves[orientation]:
+            if last_layer // 3 == layer // 3 and layer <= last_layer:
+                continue
+            next_corner = corner_move[generator]
+            next_ud_edge = ud_edge_move[generator]
+            next_slice_permutation = slice_permutation_move[generator]
+            # Same bound as phase2_distance(), written out since this is the innermost loop
+            offset = next_slice_permutation * N_CORNER_PERMUTATION
+            if (corner_prune[next_corner * 24 + next_orientation] >= togo
+                    or ud_edge_prune[next_ud_edge * 24 + next_orientation] >= togo
+                    or slice_corner_prune[offset + next_corner] >= togo
+                    or slice_ud_edge_prune[offset + next_ud_edge] >= togo):
+                continue
+            self.path.append(mv)
+            found = self.phase2(next_corner, next_ud_edge, next_slice_permutation, next_orientation, togo - 1, layer)
+            self.path.pop()
+            if found:
+                return True
+        return False
+
+    def search(self, max_length):
+        """
+        Searches phase 1 depths in increasing order until a solution within max_length is found.
+
+        Returns:
+            bool: True if a solution was added to self.solutions.
+        """
+        self.max_length = max_length
+        cube = self.cube
+        twist, flip, slice_ = cube.get_twist(), cube.get_flip(), cube.get_slice()
+        depth = self.phase1_distance(twist, flip, slice_, self.orientation)
+        if depth == UNREACHABLE:
+            # Several pinned pieces can leave too few moves to reach phase 2 at all
+            return False
+        while max_length is None or depth <= max_length:
+            if self.phase1(twist, flip, slice_, self.orientation, depth, -3):
+                return True
+            depth += 1
+        return False
+
+    def run(self, max_length, timeout, on_solution=None, stop_event=None):
+        """
+        Finds a solution and, while there is time left, keeps looking for shorter ones.
+
+        Without a timeout the first solution found is returned.
+        """
+        self.deadline = None if timeout is None else time.perf_counter() + timeout
+        self.stop_event = stop_event
+        try:
+            while self.search(max_length):
+                if on_solution is not None:
+                    on_solution(list(self.solutions[-1]))
+                if self.deadline is None:
+                    break
+                max_length = len(self.solutions[-1]) - 1
+        except SearchTimeout:
+            # Running out of time after a solution was found just ends the improving
+            if not self.solutions:
+                raise
+        return self.solutions[-1] if self.solutions else None
+
+
+def solve_constrained(cube_string, fixed_cubie, restricted_faces, max_length=None, timeout=None, on_solution=None,
+                      stop_event=None):
+    """
+    Solves a cube using only moves that keep the fixed pieces in place.
+
+    The cube ends up solved in whatever orientation the slice moves leave the centres in.
+
+    Args:
+        cube_string (str): A Kociemba facelet string.
+        fixed_cubie (list): The sticker IDs of the fixed pieces.
+        restricted_faces (set): The faces returned by get_restricted_faces() for the pieces.
+        max_length (int, optional): Only accept solutions with at most this many moves.
+        timeout (float, optional): Keep looking for shorter solutions for this many seconds
+            and then return the shortest one found. Without it the first solution is returned.
+        on_solution (callable, optional): Called with every solution as soon as it is found,
+            each one shorter than the last, so callers can use it before the search ends.
+        stop_event (threading.Event, optional): Ends the search early when set.
+
+    Returns:
+        list: The moves in the project notation (e.g. ['D', 'Mi', 'B2']), or None if the search
+        finished and no solution within max_length exists.
+
+    Raises:
+        ValueError: If the cube is not a legal cube.
+        SearchTimeout: If the timeout passed or stop_event was set before any solution was found.
+    """
+    state = CubeState.from_kociemba_string(cube_string)
+    orientation, cube = to_centres_frame(state)
+    cube.verify()
+    allowed_moves = tuple(get_allowed_moves(fixed_cubie, restricted_faces))
+    tables = get_search_tables()
+    # The pruning tables only see coordinates, so they can't tell that a frozen piece is out of place
+    if not _can_be_solved(state, orientation, tables.transitions, allowed_moves):
+        return None
+    search = _Search(tables, get_constraint_tables(allowed_moves), orientation, cube, allowed_moves)
+    return search.run(max_length, timeout, on_solution, stop_event)
+
+
+def build_table_files(directory=None):
+    """
+    Builds the search tables and the pruning tables of every water-drop position and writes them to disk.
+
+    Args:
+        directory (str, optional): Where to write the files. Defaults to TABLE_DIRECTORY.
+
+    Returns:
+        list: The names of the table groups written.
+    """
+    from cube_solver import get_cubie_group, get_restricted_faces
+
+    directory = directory or TABLE_DIRECTORY
+    generators, transitions = _build_generators()
+    arrays = _build_search_arrays(generators)
+    table_store.save_tables(directory, 'search', arrays, TABLES_VERSION,
+                            {'generators': generators, 'transitions': transitions})
+    written = ['search']
+
+    tables = SearchTables(generators, transitions, _as_views(arrays))
+    for sticker in range(1, 55):
+        fixed_cubie = get_cubie_group(sticker)
+        allowed_moves = tuple(get_allowed_moves(fixed_cubie, get_restricted_faces(fixed_cubie)))
+        name = _constraint_table_name(allowed_moves)
+        if name not in written:
+            table_store.save_tables(directory, name, _build_constraint_arrays(tables, allowed_moves), TABLES_VERSION)
+            written.append(name)
+    return written
+
+
+def main(argv=None):
+    """
+    Command line entry point: python -m constrained_search build-tables
+    """
+    parser = argparse.ArgumentParser(prog='python -m constrained_search',
+                                     description="Build the tables of the constrained two-phase search.")
+    commands = parser.add_subparsers(dest='command')
+    commands.required = True
+    build_parser = commands.add_parser('build-tables', help="Build every table and write it to disk to be memory-mapped.")
+    build_parser.add_argument('--directory', default=TABLE_DIRECTORY,
+                              help="Where to write the tables (default: the CUBE_TABLE_DIR variable or ./tables).")
+    args = parser.parse_args(argv)
+    if args.command == 'build-tables':
+        start = time.perf_counter()
+        written = build_table_files(args.directory)
+        print("Wrote {} table groups to {} in {:.1f}s".format(len(written), args.directory,
+                                                              time.perf_counter() - start))
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,174 @@
+"""
+Batched NumPy simulator that applies moves to many cubes at once.
+
+A batch is an N x 54 uint8 array using the same facelet layout as CubeState.
+"""
+import numpy as np
+
+from cube_state import (NUM_FACELETS, SOLVED_FACELETS, MOVE_TABLES, CubeState,
+                        compile_sequence, get_move_permutation, split_moves)
+
+# Names of the moves in the order of the rows of MOVE_PERMUTATIONS
+MOVE_NAMES = list(MOVE_TABLES)
+
+# Index of every move name in MOVE_PERMUTATIONS
+MOVE_INDEX = {name: i for i, name in enumerate(MOVE_NAMES)}
+
+# All move permutations stacked into one (number of moves) x 54 array
+MOVE_PERMUTATIONS = np.stack([MOVE_TABLES[name] for name in MOVE_NAMES])
+
+# Face turns used for random scrambles (no slices or whole-cube rotations)
+SCRAMBLE_MOVES = np.array([MOVE_INDEX[face + suffix] for face in 'UDFBLR' for suffix in ('', '2', 'I')])
+
+
+def get_move_indices(moves):
+    """
+    Converts move names into rows of MOVE_PERMUTATIONS.
+
+    Args:
+        moves (str or list): Moves separated by spaces (e.g. "R U Ri F2") or a list of moves.
+
+    Returns:
+        numpy.ndarray: The index of every move.
+
+    Raises:
+        ValueError: If a move is invalid.
+    """
+    indices = []
+    for mv in split_moves(moves):
+        name = mv.upper().replace("'", 'I')
+        if name not in MOVE_INDEX:
+            raise ValueError("Invalid Move: " + str(mv))
+        indices.append(MOVE_INDEX[name])
+    return np.array(indices, dtype=np.intp)
+
+
+def random_scrambles(count, length, rng=None):
+    """
+    Generates random face-turn scrambles as move indices.
+
+    Args:
+        count (int): Number of scrambles.
+        length (int): Number of moves in each scramble.
+        rng (numpy.random.Generator, optional): Random generator to draw from.
+
+    Returns:
+        numpy.ndarray: A count x length array of move indices.
+    """
+    rng = np.random.default_rng() if rng is None else rng
+    return SCRAMBLE_MOVES[rng.integers(0, len(SCRAMBLE_MOVES), size=(count, length))]
+
+
+class CubeBatch:
+    """
+    Represents many Rubik's Cubes as one N x 54 uint8 array.
+
+    Every operation acts on all cubes with a single vectorized gather.
+
+    Attributes:
+        facelets (numpy.ndarray): N x 54 face letters, one cube per row.
+
+    Methods:
+        apply_move(mv): Applies the same move to every cube.
+        apply_sequence(sequence): Applies the same move sequence to every cube.
+        apply_move_indices(indices): Applies a different move to every cube.
+        apply_move_sequences(sequences): Applies a different move sequence to every cube.
+        is_solved(): Checks which cubes are solved.
+        __getitem__(i): Returns cube i as a CubeState.
+    """
+    def __init__(self, facelets):
+        """
+        Initializes a batch from an N x 54 array of face letters.
+
+        Args:
+            facelets (numpy.ndarray): The facelets of every cube.
+        """
+        self.facelets = np.ascontiguousarray(facelets, dtype=np.uint8)
+        if self.facelets.ndim != 2 or self.facelets.shape[1] != NUM_FACELETS:
+            raise ValueError("A cube batch needs an N x 54 array of facelets.")
+
+    @classmethod
+    def solved(cls, count):
+        """
+        Creates a batch of solved cubes.
+
+        Args:
+            count (int): Number of cubes.
+
+        Returns:
+            CubeBatch: The solved batch.
+        """
+        return cls(np.tile(SOLVED_FACELETS, (count, 1)))
+
+    @classmethod
+    def from_states(cls, states):
+        """
+        Creates a batch from cube states or Kociemba strings.
+
+        Args:
+            states (iterable): CubeState objects or 54 character Kociemba strings.
+
+        Returns:
+            CubeBatch: The batch holding every state in order.
+        """
+        rows = [state.facelets if isinstance(state, CubeState) else CubeState.from_kociemba_string(state).facelets
+                for state in states]
+        return cls(np.stack(rows) if rows else np.empty((0, NUM_FACELETS), dtype=np.uint8))
+
+    def __len__(self):
+        return len(self.facelets)
+
+    def __getitem__(self, i):
+        return CubeState(self.facelets[i])
+
+    def apply_move(self, mv):
+        """
+        Applies the same move to every cube in place.
+
+        Args:
+            mv (str): The move to apply (e.g. 'U', 'Ri', "F'", 'x').
+        """
+        self.facelets = self.facelets.take(get_move_permutation(mv), axis=1)
+
+    def apply_sequence(self, sequence):
+        """
+        Applies the same move sequence to every cube in place, as one compiled permutation.
+
+        Args:
+            sequence (str or list): Moves separated by spaces (e.g. "R U Ri F2") or a list of moves.
+        """
+        self.facelets = self.facelets.take(compile_sequence(sequence), axis=1)
+
+    def apply_move_indices(self, indices):
+        """
+        Applies one move per cube in place.
+
+        Args:
+            indices (numpy.ndarray): N move indices (rows of MOVE_PERMUTATIONS), one per cube.
+        """
+        self.facelets = np.take_along_axis(self.facelets, MOVE_PERMUTATIONS[indices], axis=1)
+
+    def apply_move_sequences(self, sequences):
+        """
+        Applies one move sequence per cube in place.
+
+        Args:
+            sequences (numpy.ndarray): An N x L array of move indices, one row per cube.
+        """
+        for column in np.asarray(sequences).T:
+            self.apply_move_indices(column)
+
+    def is_solved(self, any_orientation=False):
+        """
+        Vectorized version of is_cube_solved() for the whole batch.
+
+        Args:
+            any_orientation (bool, optional): Also accept cubes that are solved but rotated as a whole.
+
+        Returns:
+            numpy.ndarray: A boolean per cube.
+        """
+        if any_orientation:
+            faces = self.facelets.reshape(-1, 6, 9)
+            return (faces == faces[:, :, 4:5]).all(axis=(1, 2))
+        return (self.facelets == SOLVED_FACELETS).all(axis=1)
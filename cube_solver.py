@@ -0,0 +1,1236 @@
+"""
+Solver library for the Rubik's Cube with a fixed water-drop sticker.
+
+Everything in this module works on explicit arguments and returns its results, so
+several cubes can be solved at the same time (for example from worker threads).
+It has no pygame or camera dependency; Rubiks_Cube_Solver.py is the interactive client.
+"""
+import argparse
+import json
+import os
+import sys
+import threading
+from collections import deque, namedtuple
+from concurrent.futures import FIRST_COMPLETED, CancelledError, ProcessPoolExecutor, wait
+from functools import partial
+from itertools import islice
+
+import kociemba
+
+from move_optimizer import count_moves, invert_moves, optimize_moves
+from solution_cache import SolutionCache
+
+
+class InvalidCubeError(ValueError):
+    """
+    Raised when a cube state cannot be solved, usually because it was scanned incorrectly.
+
+    Attributes:
+        problems (list): The cubie.ScanProblem entries found before solving, each with the
+            sticker IDs that cause it; empty if the solver itself rejected the cube.
+    """
+    def __init__(self, message, problems=()):
+        super().__init__(message)
+        self.problems = list(problems)
+
+
+# Unique IDs for each cubie on the cube for tracking during rotations
+CUBIE_IDS = {
+    'U': [37, 38, 39, 40, 41, 42, 43, 44, 45],
+    'L': [28, 29, 30, 31, 32, 33, 34, 35, 36],
+    'F': [1, 2, 3, 4, 5, 6, 7, 8, 9],
+    'R': [10, 11, 12, 13, 14, 15, 16, 17, 18],
+    'B': [19, 20, 21, 22, 23, 24, 25, 26, 27],
+    'D': [46, 47, 48, 49, 50, 51, 52, 53, 54]
+}
+
+# Pairs of cubie positions used for rotation calculations
+CUBIE_PAIRS = {
+    2: 44, 44: 2, 4: 33, 33: 4, 6: 13, 13: 6, 8: 47, 47: 8,
+    38: 20, 20: 38, 40: 29, 29: 40, 42: 11, 11: 42, 22: 15, 15: 22,
+    24: 31, 31: 24, 26: 53, 53: 26, 35: 49, 49: 35, 17: 51, 51: 17,
+    1: (30, 43), 30: (1, 43), 43: (1, 30), 3: (45, 10), 45: (3, 10), 10: (3, 45),
+    7: (36, 46), 36: (7, 46), 46: (7, 36), 9: (16, 48), 16: (9, 48), 48: (9, 16),
+    12: (19, 39), 19: (12, 39), 39: (12, 19), 18: (25, 54), 25: (18, 54), 54: (18, 25),
+    28: (21, 37), 21: (28, 37), 37: (28, 21), 34: (27, 52), 27: (34, 52), 52: (34, 27),
+    5: 5, 14: 14, 23: 23, 32: 32, 41: 41, 50: 50
+}
+
+# The face every sticker ID lies on
+STICKER_FACES = {sticker: face for face, stickers in CUBIE_IDS.items() for sticker in stickers}
+
+# Kociemba string of a solved cube
+SOLVED_KOCIEMBA_STRING = ''.join(face * 9 for face in 'URFDLB')
+
+# A scrambled cube that solves quickly, solved once by warm_up() to load kociemba's tables
+WARM_UP_KOCIEMBA_STRING = 'DRLUUBFBRBLURRLRUBLRDDFDLFUFUFFDBRDUBRUFLLFDDBFLUBLRBD'
+
+# 'kociemba' rewrites an unconstrained solution; 'native' searches the allowed moves directly;
+# 'orientations' rewrites solutions of all 24 whole-cube orientations and keeps the shortest
+SOLVE_METHODS = ('kociemba', 'native', 'orientations')
+
+# Seconds the native search may spend looking for a solution shorter than the rewritten one
+NATIVE_SEARCH_TIMEOUT = 1.0
+
+# Seconds the native search may spend when the pinned pieces rule out the rewrite, so it is the only solver
+PINNED_SEARCH_TIMEOUT = 10.0
+
+# Seconds an anytime solve keeps improving its solution in the background
+ANYTIME_SEARCH_BUDGET = 10.0
+
+
+def get_cubie_group(cubie_id):
+    """
+    Expands a sticker ID into the IDs of every sticker on the same piece.
+
+    Args:
+        cubie_id (int): The ID of a sticker (1-54, see CUBIE_IDS).
+
+    Returns:
+        list: The clicked sticker followed by the other stickers of its piece.
+    """
+    # Check if the cubie has paired cubies
+    if cubie_id in CUBIE_PAIRS:
+        paired_cubies = CUBIE_PAIRS[cubie_id]  # Get the paired cubies
+        if isinstance(paired_cubies, tuple):
+            return [cubie_id] + list(paired_cubies)
+        else:
+            return [cubie_id, paired_cubies]
+    return [cubie_id]  # Return the ID of the single clicked cubie if no pairs exist
+
+
+def get_restricted_faces(fixed_cubie):
+    """
+    Determines which faces of the Rubik's Cube are restricted by the position of a fixed cubie.
+    This function checks the positions of the fixed cubie and adds the affected faces to the restricted set.
+    
+    Parameters:
+    fixed_cubie (list): A list of cubie identifiers that are fixed in position.
+
+    Returns:
+    set: A set of restricted face identifiers ('U', 'D', 'F', 'B', 'L', 'R').
+    """
+    # One lookup per cubie instead of a scan of every face's list
+    return {STICKER_FACES[cubie] for cubie in fixed_cubie}
+
+
+def is_move_allowed(move, restricted_faces):
+    """
+    Checks if a given move is allowed based on the restricted faces from a fixed cubie.
+    The move is allowed only if the face of the move is not restricted.
+    
+    Parameters:
+    move (str): A string representing the move (e.g., 'U', 'R', 'F').
+    restricted_faces (set): A set of face identifiers that are restricted by the fixed cubie.
+    
+    Returns:
+    bool: True if the move is allowed, False otherwise.
+    """
+    # Extract the face identifier from the move
+    face = move[0]
+    
+    # Check if the face is not in the set of restricted faces
+    return face not in restricted_faces
+
+
+def get_kociemba_string(scanned_faces):
+    """
+    Converts a given set of scanned faces to a Kociemba string.
+    The Kociemba string is a compact representation of the cube state, used in the Kociemba algorithm for solving the Rubik's Cube.
+    
+    Parameters:
+    scanned_faces (dict): A dictionary mapping face identifiers ('U', 'R', 'F', 'D', 'L', 'B') to 3x3 matrices of colors.
+    
+    Returns:
+    str: A Kociemba string representing the state of the cube.
+    """
+    kociemba_string = ''  # Initialize an empty string to hold the Kociemba representation
+    face_order = 'URFDLB'  # Define the order in which to read the faces
+    face_index = {'U': 4, 'R': 1, 'F': 0, 'D': 5, 'L': 3, 'B': 2}  # Mapping of face identifiers to their indices in scanned_faces
+
+    # Iterate through the defined order of faces
+    for face in face_order:
+        # Get the colors of the current face using the face_index mapping
+        face_colors = scanned_faces[face_index[face]]
+        
+        # Append each color of the current face to the Kociemba string
+        for color in face_colors:
+            kociemba_string += color
+            
+    return kociemba_string  # Return the constructed Kociemba string
+
+
+def get_affected_faces(move):
+    """
+    Returns a set of affected faces based on the given move.
+    
+    Args:
+        move (str): The move to evaluate. Can be a single letter (e.g., 'U') or a modifier (e.g., 'U2', 'Ui').
+        
+    Returns:
+        set: A set of faces affected by the move (e.g., 'U', 'D', 'L', 'R').
+    """
+    affected = set()  # Initialize an empty set to hold affected faces
+
+    # Check if the move is a basic face rotation, inverse or double turns
+    if move[0] in ['U', 'D', 'F', 'B', 'L', 'R', 'UI', 'DI', 'FI', 'BI', 'LI', 'RI', 'U2', 'D2', 'F2', 'B2', 'L2', 'R2']:
+        affected.add(move[0])  # Add the face being rotated to the affected set
+    # Handle the middle layer move (M), which affects U, D, and the faces in between
+    elif move[0] == 'M':
+        affected.update(['U', 'D', 'F', 'B', 'UI', 'DI', 'FI', 'BI', 'U2', 'D2', 'F2', 'B2'])
+    # Handle the equatorial layer move (E), which affects F, R, B, L
+    elif move[0] == 'E':
+        affected.update(['F', 'R', 'B', 'L', 'FI', 'RI', 'BI', 'LI', 'F2', 'R2', 'B2', 'L2'])
+    # Handle the standing layer move (S), which affects U, D, L, R
+    elif move[0] == 'S':
+        affected.update(['U', 'D', 'L', 'R', 'UI', 'DI', 'LI', 'RI', 'U2', 'D2', 'L2', 'R2'])
+
+    return affected  # Return the set of affected faces
+
+
+def get_equivalent_move(move, fixed_faces):
+    """
+    Returns a list of equivalent moves for a given move, considering fixed faces.
+
+    Args:
+        move (str): The move to evaluate (e.g., 'U', 'D', 'F', etc.).
+        fixed_faces (set): A set of faces that are fixed in place (e.g., {'U', 'F'}).
+
+    Returns:
+        list: A list of equivalent moves that would yield the same result (e.g., ['U', 'D']).
+    """
+    # Dictionary mapping moves to their equivalents, including inverse relationships
+    equivalents = {
+        'U': ['D', 'E'],
+        'D': ['U', 'Ei'],
+        'F': ['B', 'Si'],
+        'B': ['F', 'S'],
+        'L': ['R', 'Mi'],
+        'R': ['L', 'M'],
+        'Ui': ['Di', 'Ei'],
+        'Di': ['Ui', 'E'],
+        'Fi': ['Bi', 'S'],
+        'Bi': ['Fi', 'Si'],
+        'Li': ['Ri', 'M'],
+        'Ri': ['Li', 'Mi'],
+        'U2': ['D2', 'E2'],
+        'D2': ['U2', 'E2'],
+        'F2': ['B2', 'S2'],
+        'B2': ['F2', 'S2'],
+        'L2': ['R2', 'M2'],
+        'R2': ['L2', 'M2']
+    }
+
+    # Check if the move corresponds to a fixed face
+    if move[0] in fixed_faces:
+        # If it does, return the list of equivalent moves from the dictionary
+        return equivalents.get(move, [move])  # If the move is not in the dictionary, return the original move as a single-element list
+    return [move]
+
+
+def update_reference_frame(reference_frame, move):
+    """
+    Updates the reference frame of the cube after a move is performed.
+
+    Args:
+        reference_frame (dict): A dictionary representing the current reference frame of the cube.
+        move (str): The move to apply (e.g., 'U', 'M', 'S').
+
+    Returns:
+        dict: The updated reference frame after applying the move.
+    """
+    # Dictionary mapping moves to their corresponding rotation transformations
+    rotations = {
+        'E': lambda rf: {
+            'U': rf['U'], 'D': rf['D'],
+            'F': rf['L'], 'B': rf['R'],
+            'L': rf['B'], 'R': rf['F']
+        },
+        'Ei': lambda rf: {
+            'U': rf['U'], 'D': rf['D'],
+            'F': rf['R'], 'B': rf['L'],
+            'L': rf['F'], 'R': rf['B']
+        },
+        'E2': lambda rf: {
+            'U': rf['U'], 'D': rf['D'],
+            'F': rf['B'], 'B': rf['F'],
+            'L': rf['R'], 'R': rf['L']
+        },
+        'M': lambda rf: {
+            'U': rf['B'], 'D': rf['F'],
+            'F': rf['U'], 'B': rf['D'],
+            'L': rf['L'], 'R': rf['R']
+        },
+        'Mi': lambda rf: {
+            'U': rf['F'], 'D': rf['B'],
+            'F': rf['D'], 'B': rf['U'],
+            'L': rf['L'], 'R': rf['R']
+        },
+        'M2': lambda rf: {
+            'U': rf['D'], 'D': rf['U'],
+            'F': rf['B'], 'B': rf['F'],
+            'L': rf['L'], 'R': rf['R']
+        },
+        'S': lambda rf: {
+            'U': rf['L'], 'D': rf['R'],
+            'F': rf['F'], 'B': rf['B'],
+            'L': rf['D'], 'R': rf['U']
+        },
+        'Si': lambda rf: {
+            'U': rf['R'], 'D': rf['L'],
+            'F': rf['F'], 'B': rf['B'],
+            'L': rf['U'], 'R': rf['D']
+        },
+        'S2': lambda rf: {
+            'U': rf['D'], 'D': rf['U'],
+            'F': rf['F'], 'B': rf['B'],
+            'L': rf['R'], 'R': rf['L']
+        }
+    }
+    # Check if the move exists in the rotations dictionary
+    if move in rotations:
+        # Apply the corresponding transformation to the reference frame
+        return rotations[move](reference_frame)
+    
+    # If the move is not recognized, return the original reference frame unchanged
+    return reference_frame
+
+
+def adjust_move_for_reference_frame(move, reference_frame):
+    """
+    Adjusts a move according to the current reference frame of the cube.
+
+    Args:
+        move (str): The move to adjust (e.g., 'U', 'D2').
+        reference_frame (dict): A dictionary representing the current reference frame of the cube.
+
+    Returns:
+        str: The adjusted move based on the reference frame (e.g., 'F', 'B2').
+    """
+    # Extract the face from the move
+    face = move[0]
+    
+    # Determine if the move has 'i', '2')
+    modifier = move[1:] if len(move) > 1 else ''
+    
+    # Find the adjusted face based on the reference frame
+    adjusted_face = next(key for key, value in reference_frame.items() if value == face)
+    
+    # Return the adjusted move, combining the adjusted face with its modifier
+    return adjusted_face + modifier
+
+
+# Moves in the project notation that can appear in a rewritten solution
+FACE_TURNS = [face + suffix for face in 'UDFBLR' for suffix in ('', 'i', '2')]
+SLICE_TURNS = [layer + suffix for layer in 'MES' for suffix in ('', 'i', '2')]
+
+
+def _build_reference_frames():
+    """
+    Enumerates the reference frames the slice moves can reach and the lookup tables between them.
+
+    The frames are the 24 rotations of the centres, found by applying update_reference_frame()
+    from the standard frame, so the tables give exactly the same results as the dictionaries.
+
+    Returns:
+        tuple: The frames as dictionaries, the product table (frame a followed by the rotation
+        of frame b is frame products[a][b]), the frame after each move and the adjusted face
+        move for each frame.
+    """
+    frames = [{face: face for face in 'UDFBLR'}]
+    index = {tuple(sorted(frames[0].items())): 0}
+    for frame in frames:
+        for move in SLICE_TURNS:
+            rotated = update_reference_frame(frame, move)
+            key = tuple(sorted(rotated.items()))
+            if key not in index:
+                index[key] = len(frames)
+                frames.append(rotated)
+    products = [[index[tuple(sorted((face, a[b[face]]) for face in a))] for b in frames] for a in frames]
+    slice_frames = {move: index[tuple(sorted(update_reference_frame(frames[0], move).items()))] for move in SLICE_TURNS}
+    frame_after_move = [dict({move: a for move in FACE_TURNS},
+                             **{move: products[a][b] for move, b in slice_frames.items()})
+                        for a in range(len(frames))]
+    adjusted_moves = [{move: adjust_move_for_reference_frame(move, frame) for move in FACE_TURNS} for frame in frames]
+    return frames, products, frame_after_move, adjusted_moves
+
+
+# The reference frames as integers: REFERENCE_FRAMES[i] is the dictionary of frame i (0 is
+# the standard frame), FRAME_PRODUCTS composes two frames, FRAME_AFTER_MOVE[i][move] replaces
+# update_reference_frame() and ADJUSTED_MOVES[i][move] replaces adjust_move_for_reference_frame()
+REFERENCE_FRAMES, FRAME_PRODUCTS, FRAME_AFTER_MOVE, ADJUSTED_MOVES = _build_reference_frames()
+
+# The rewrite of every turn of a restricted face (see get_equivalent_move())
+_EQUIVALENT_MOVES = {move: get_equivalent_move(move, {move[0]}) for move in FACE_TURNS}
+
+
+# Faces in the order of their bits in a face mask
+FACES = 'UDFBLR'
+
+# Every layer turn in the order of its bit in a move mask (the order of constrained_search.PHYSICAL_MOVES)
+LAYER_TURNS = [layer + suffix for layer in 'UDFBLRMES' for suffix in ('', '2', 'i')]
+_MOVE_BITS = {move: 1 << i for i, move in enumerate(LAYER_TURNS)}
+ALL_MOVES_MASK = (1 << len(LAYER_TURNS)) - 1
+
+# The outer faces on either side of each slice; a piece turns with the slice if it has a sticker on neither
+_SLICE_SIDES = {'M': 'LR', 'E': 'UD', 'S': 'FB'}
+
+
+def _build_sticker_tables():
+    """
+    Precomputes, for every sticker, its piece, the faces that piece lies on and the moves that leave it in place.
+
+    Returns:
+        tuple: Three lists indexed by sticker ID (index 0 is unused): the bitmask of the
+        stickers of the piece, the bitmask of its faces (bits in FACES order) and the bitmask
+        of the allowed moves (bits in LAYER_TURNS order).
+    """
+    piece_masks, face_masks, move_masks = [0], [0], [0]
+    for sticker in range(1, 55):
+        piece = set(get_cubie_group(sticker))  # A centre is listed as its own pair
+        faces = {STICKER_FACES[other] for other in piece}
+        moved_by = faces | {layer for layer, sides in _SLICE_SIDES.items() if not faces & set(sides)}
+        piece_masks.append(sum(1 << (other - 1) for other in piece))
+        face_masks.append(sum(1 << FACES.index(face) for face in faces))
+        move_masks.append(sum(bit for move, bit in _MOVE_BITS.items() if move[0] not in moved_by))
+    return piece_masks, face_masks, move_masks
+
+
+# Per-sticker constraint tables, indexed by sticker ID (see _build_sticker_tables())
+STICKER_PIECE_MASKS, STICKER_FACE_MASKS, STICKER_MOVE_MASKS = _build_sticker_tables()
+
+# The moves rewrite_solution() turns instead of each face: the opposite face and the slice between
+_REWRITE_MASKS = {face: 0 for face in FACES}
+for _move, _equivalents in _EQUIVALENT_MOVES.items():
+    for _equivalent in _equivalents:
+        _REWRITE_MASKS[_move[0]] |= _MOVE_BITS[_equivalent]
+
+
+class PinConstraint:
+    """
+    The moves that keep a set of pinned pieces in place, held as bitmasks.
+
+    Pinning a sticker pins its whole piece. Constraints combine with |, and checking a move
+    is a single mask test, however many pieces are pinned.
+
+    Attributes:
+        sticker_mask (int): Bit i - 1 is set for every sticker ID i of the pinned pieces.
+        face_mask (int): The faces the pinned pieces lie on, which must not be turned (bits in FACES order).
+        move_mask (int): The allowed moves (bits in LAYER_TURNS order).
+    """
+    __slots__ = ('sticker_mask', 'face_mask', 'move_mask')
+
+    def __init__(self, stickers=()):
+        """
+        Initializes the constraint.
+
+        Args:
+            stickers (iterable, optional): Sticker IDs (1-54) whose pieces are pinned.
+
+        Raises:
+            ValueError: If a sticker ID is out of range.
+        """
+        self.sticker_mask = 0
+        self.face_mask = 0
+        self.move_mask = ALL_MOVES_MASK
+        for sticker in stickers:
+            if not 1 <= sticker <= 54:
+                raise ValueError("Sticker IDs must be between 1 and 54, not " + str(sticker))
+            self.sticker_mask |= STICKER_PIECE_MASKS[sticker]
+            self.face_mask |= STICKER_FACE_MASKS[sticker]
+            self.move_mask &= STICKER_MOVE_MASKS[sticker]
+
+    def __or__(self, other):
+        combined = PinConstraint()
+        combined.sticker_mask = self.sticker_mask | other.sticker_mask
+        combined.face_mask = self.face_mask | other.face_mask
+        combined.move_mask = self.move_mask & other.move_mask
+        return combined
+
+    def __eq__(self, other):
+        if not isinstance(other, PinConstraint):
+            return NotImplemented
+        return self.sticker_mask == other.sticker_mask
+
+    def __hash__(self):
+        return hash(self.sticker_mask)
+
+    def __repr__(self):
+        return "PinConstraint({})".format(self.fixed_cubie)
+
+    def allows(self, move):
+        """
+        Checks whether a move keeps every pinned piece in place.
+
+        Args:
+            move (str): A layer turn in the project notation (e.g. 'U', 'Mi', 'F2').
+
+        Returns:
+            bool: True if the move is allowed.
+        """
+        return bool(self.move_mask & _MOVE_BITS[move])
+
+    @property
+    def fixed_cubie(self):
+        """
+        list: The sticker IDs of every pinned piece, in increasing order.
+        """
+        return [i + 1 for i in range(54) if self.sticker_mask >> i & 1]
+
+    @property
+    def restricted_faces(self):
+        """
+        set: The faces that must not be turned, as returned by get_restricted_faces().
+        """
+        return {face for i, face in enumerate(FACES) if self.face_mask >> i & 1}
+
+    @property
+    def allowed_moves(self):
+        """
+        list: The allowed moves, in LAYER_TURNS order.
+        """
+        return [move for move in LAYER_TURNS if self.move_mask & _MOVE_BITS[move]]
+
+    @property
+    def forbidden_layers(self):
+        """
+        str: The layers that can't be turned at all (e.g. 'FMU'), which identify the constraint for caching.
+        """
+        return ''.join(sorted({move[0] for move in LAYER_TURNS if not self.move_mask & _MOVE_BITS[move]}))
+
+    def can_rewrite(self):
+        """
+        Checks whether rewrite_solution() can keep the pinned pieces in place.
+
+        It replaces every turn of a restricted face by the opposite face and the slice between,
+        so those have to be allowed. This always holds for a single pinned piece.
+
+        Returns:
+            bool: True if every rewritten move is allowed.
+        """
+        return all(self.move_mask & _REWRITE_MASKS[face] == _REWRITE_MASKS[face]
+                   for i, face in enumerate(FACES) if self.face_mask >> i & 1)
+
+
+def is_cube_solved(current_state):
+    """
+    Checks if the Rubik's Cube is in a solved state.
+
+    Args:
+        current_state (list): The current state of the cube as a list of lists, where each list represents a face.
+
+    Returns:
+        bool: True if the cube is solved, False otherwise.
+    """
+    # Define the solved state of the Rubik's Cube
+    solved_state = [
+        ['F', 'F', 'F', 'F', 'F', 'F', 'F', 'F', 'F'],  #(Green)
+        ['R', 'R', 'R', 'R', 'R', 'R', 'R', 'R', 'R'],  #(Red)
+        ['B', 'B', 'B', 'B', 'B', 'B', 'B', 'B', 'B'],  #(Blue)
+        ['L', 'L', 'L', 'L', 'L', 'L', 'L', 'L', 'L'],  #(Orange)
+        ['U', 'U', 'U', 'U', 'U', 'U', 'U', 'U', 'U'],  #(White)
+        ['D', 'D', 'D', 'D', 'D', 'D', 'D', 'D', 'D']   #(Yellow)
+    ]
+    
+    # Flatten the current state of the cube into a single list
+    flat_current_state = [color for face in current_state for color in face]
+    
+    # Flatten the solved state of the cube into a single list
+    flat_solved_state = [color for face in solved_state for color in face]
+    
+    # Compare the flattened current state with the flattened solved state
+    return flat_current_state == flat_solved_state
+
+
+def rewrite_solution(solution, fixed_faces):
+    """
+    Rewrites a Kociemba solution so that no restricted face is ever turned.
+
+    Every turn of a restricted face is replaced by a turn of the opposite face plus a slice
+    move, and the reference frame is tracked so later moves are turned on the right faces.
+
+    Args:
+        solution (str or list): A Kociemba solution (e.g. "R U' F2") or a list of moves in the
+            project notation (e.g. ['R', 'Ui', 'F2']).
+        fixed_faces (set): The restricted faces returned by get_restricted_faces().
+
+    Returns:
+        list: The rewritten moves.
+    """
+    if isinstance(solution, str):
+        solution = solution.split()
+    # Convert the Kociemba notation into the project notation (U' -> Ui)
+    original_moves = [move if len(move) == 1 else move[0] + ('i' if move[1] in "'i" else '2') for move in solution]
+    # Initialize a list to hold modified moves
+    modified_moves = []
+    # Start in the standard frame; frames are indices into REFERENCE_FRAMES, so tracking them is two lookups per move
+    frame = 0
+    # Process the original moves to adapt them to the current reference frame
+    for move in original_moves:
+        # Adjust the move for the current reference frame
+        adjusted_move = ADJUSTED_MOVES[frame][move]
+        if adjusted_move[0] in fixed_faces:
+            # Replace the turn by the opposite face turn plus a slice move
+            for eq_move in _EQUIVALENT_MOVES[adjusted_move]:
+                modified_moves.append(eq_move)
+                frame = FRAME_AFTER_MOVE[frame][eq_move]
+        else:
+            # If not affecting fixed faces, just add the adjusted move
+            modified_moves.append(adjusted_move)
+            frame = FRAME_AFTER_MOVE[frame][adjusted_move]
+    return modified_moves
+
+
+# Guards the first call into kociemba, which loads its lookup tables
+_kociemba_lock = threading.Lock()
+_kociemba_ready = False
+
+
+def kociemba_solve(cube_string):
+    """
+    Calls kociemba.solve(), making sure its tables are loaded only once across threads.
+
+    Args:
+        cube_string (str): A Kociemba facelet string.
+
+    Returns:
+        str: The Kociemba solution (e.g. "R U' F2").
+
+    Raises:
+        InvalidCubeError: If kociemba rejects the cube.
+    """
+    global _kociemba_ready
+    try:
+        if not _kociemba_ready:
+            with _kociemba_lock:
+                solution = kociemba.solve(cube_string)
+                _kociemba_ready = True
+                return solution
+        return kociemba.solve(cube_string)
+    except ValueError as e:
+        raise InvalidCubeError(str(e)) from e
+
+
+def warm_up(method='kociemba'):
+    """
+    Loads kociemba's lookup tables and the scan validator ahead of the first real solve (for example from a background thread).
+
+    Args:
+        method (str, optional): Also build the native search tables if this is 'native'.
+    """
+    kociemba_solve(WARM_UP_KOCIEMBA_STRING)
+    from cubie import find_scan_problems
+    find_scan_problems(WARM_UP_KOCIEMBA_STRING)
+    if method == 'native':
+        import constrained_search
+        constrained_search.get_search_tables()
+
+
+class _AnyEvent:
+    """
+    Reads as set once any of several events is set, for a search that has more than one reason to stop.
+    """
+    def __init__(self, *events):
+        self._events = [event for event in events if event is not None]
+
+    def is_set(self):
+        return any(event.is_set() for event in self._events)
+
+
+def solve_kociemba_string(cube_string, fixed_cubie, cache=None, method='kociemba', stop_event=None):
+    """
+    Solves a cube given as a Kociemba string while keeping the fixed cubie in place.
+
+    With the 'native' method the rewritten Kociemba solution is only a fallback: the
+    constrained search looks for a shorter one that uses the allowed moves directly.
+    When several pinned pieces leave the rewrite without allowed moves (see
+    PinConstraint.can_rewrite()), the constrained search is the only solver, whatever the method.
+
+    Args:
+        cube_string (str): A Kociemba facelet string (faces in URFDLB order).
+        fixed_cubie (list): The sticker IDs of the pinned pieces (may be empty).
+        cache (SolutionCache, optional): Returns repeated states from this cache and stores new solutions in it.
+        method (str, optional): One of SOLVE_METHODS.
+        stop_event (threading.Event, optional): Ends the constrained search early when set,
+            e.g. once the caller no longer wants the result.
+
+    Returns:
+        list: The moves that solve the cube; empty if the cube is already solved.
+
+    Raises:
+        InvalidCubeError: If the cube cannot be solved.
+        ValueError: If the method is unknown, or no solution keeps every pinned piece in place.
+        TimeoutError: If the pinned pieces leave a search too slow to finish in PINNED_SEARCH_TIMEOUT seconds.
+        CancelledError: If stop_event was set before the pinned search found a solution.
+    """
+    if method not in SOLVE_METHODS:
+        raise ValueError("Unknown solving method: " + str(method))
+    if cube_string == SOLVED_KOCIEMBA_STRING:
+        return []
+    constraint = PinConstraint(fixed_cubie)
+    restricted_faces = constraint.restricted_faces
+    # Keyed by the layers that can't be turned, since pieces on the same faces may still forbid different slices
+    if cache is not None:
+        moves = cache.get(cube_string, constraint.forbidden_layers, method)
+        if moves is not None:
+            return moves
+    # Rejects most bad scans in microseconds, before any solver runs (imported here, since cubie pulls in NumPy)
+    from cubie import find_scan_problems
+    problems = find_scan_problems(cube_string)
+    if problems:
+        raise InvalidCubeError(' '.join(problem.message for problem in problems), problems)
+    if not constraint.can_rewrite():
+        # Imported on first use, since it pulls in NumPy
+        import constrained_search
+        # Stops at the first solution; solve_anytime() keeps shortening it in the background
+        found = threading.Event()
+        try:
+            moves = constrained_search.solve_constrained(cube_string, constraint.fixed_cubie, restricted_faces, None,
+                                                         PINNED_SEARCH_TIMEOUT, lambda moves: found.set(),
+                                                         _AnyEvent(found, stop_event))
+        except constrained_search.SearchTimeout:
+            if stop_event is not None and stop_event.is_set():
+                raise CancelledError("The solve was stopped.") from None
+            # Not a proof that there is no solution, only that it is too slow to find
+            raise TimeoutError("The search timed out after {:g} s; try fewer pins.".format(PINNED_SEARCH_TIMEOUT)) from None
+        if moves is None:
+            raise ValueError("No solution keeps all the pinned pieces in place.")
+    elif method == 'orientations':
+        moves = solve_all_orientations(cube_string, fixed_cubie, workers=1)
+    else:
+        kociemba_solution = kociemba_solve(cube_string)
+        # The rewrite leaves neighbouring turns of the same layers that can be merged or cancelled
+        moves = optimize_moves(rewrite_solution(kociemba_solution, restricted_faces))
+    if method == 'native' and restricted_faces and constraint.can_rewrite():
+        # Imported on first use, since it pulls in NumPy
+        import constrained_search
+        try:
+            native_moves = constrained_search.solve_constrained(cube_string, constraint.fixed_cubie, restricted_faces,
+                                                                len(moves) - 1, NATIVE_SEARCH_TIMEOUT,
+                                                                stop_event=stop_event)
+        except constrained_search.SearchTimeout:
+            native_moves = None  # Nothing shorter in time; keep the rewritten solution
+        if native_moves is not None:
+            moves = native_moves
+    if cache is not None:
+        cache.put(cube_string, constraint.forbidden_layers, moves, method)
+    return moves
+
+
+def solve_cube(scanned_faces, fixed_cubie, cache=None, method='kociemba'):
+    """
+    Solves the Rubik's Cube based on the scanned faces and fixed cubie positions.
+
+    Args:
+        scanned_faces (list): The colours of each face in scanning order (Front, Right, Back, Left, Up, Down).
+        fixed_cubie (list): A list of cubies that should remain fixed during the solution.
+        cache (SolutionCache, optional): A cache of previous solutions.
+        method (str, optional): One of SOLVE_METHODS.
+
+    Returns:
+        list: A list of moves that solve the cube; empty if the cube is already solved.
+
+    Raises:
+        InvalidCubeError: If the cube cannot be solved.
+    """
+    if is_cube_solved(scanned_faces):
+        return []
+    # Convert the scanned faces into a Kociemba string representation
+    return solve_kociemba_string(get_kociemba_string(scanned_faces), fixed_cubie, cache, method)
+
+
+def _solve_orientation(item):
+    """
+    Solves a cube as seen after one whole-cube rotation, for solve_all_orientations().
+
+    Args:
+        item (tuple): The Kociemba string, the sticker IDs of the fixed piece and the orientation index.
+
+    Returns:
+        list: The rewritten solution of the rotated cube, mapped back to moves of the unrotated cube.
+    """
+    # Imported on first use, since it pulls in NumPy
+    from cube_state import CubeState, rotate_state, unrotate_moves
+    cube_string, fixed_cubie, orientation = item
+    state, rotated_cubie = rotate_state(CubeState.from_kociemba_string(cube_string), fixed_cubie, orientation)
+    return unrotate_moves(solve_kociemba_string(state.to_kociemba_string(), rotated_cubie), orientation)
+
+
+def solve_all_orientations(cube_string, fixed_cubie, workers=None):
+    """
+    Solves a cube in each of the 24 whole-cube orientations and keeps the shortest solution.
+
+    How much the water-drop rewrite lengthens a solution depends on which faces the fixed
+    piece lands on in Kociemba's frame, so every orientation is solved and rewritten and
+    the result is mapped back to the cube as it was scanned.
+
+    Args:
+        cube_string (str): A Kociemba facelet string (faces in URFDLB order).
+        fixed_cubie (list): The sticker IDs of the fixed piece (may be empty).
+        workers (int, optional): Number of worker processes (defaults to the number of CPUs);
+            1 solves the orientations one after another in this process.
+
+    Returns:
+        list: The shortest solution, fewest face turns first among equally long ones.
+
+    Raises:
+        InvalidCubeError: If the cube cannot be solved.
+    """
+    items = [(cube_string, list(fixed_cubie), orientation) for orientation in range(24)]
+    if workers == 1:
+        solutions = map(_solve_orientation, items)
+    else:
+        solutions = map_in_pool(_solve_orientation, items, workers, chunksize=1)
+    return min(solutions, key=lambda moves: (len(moves), count_moves(moves)['htm']))
+
+
+class AnytimeSolution:
+    """
+    A solution that is usable at once and keeps getting shorter while a background thread searches.
+
+    Attributes:
+        cube_string (str): The Kociemba facelet string being solved.
+        version (int): Incremented every time a shorter solution replaces the current one.
+
+    Methods:
+        moves: The shortest solution found so far.
+        continuation(executed_moves): The moves that finish the best solution after some moves were played.
+        wait(timeout): Waits for the search to end.
+        cancel(): Stops the search early.
+    """
+    def __init__(self, cube_string, moves, stop_event=None):
+        """
+        Initializes the solution with a first sequence of moves; start() begins improving it.
+
+        Args:
+            cube_string (str): The Kociemba facelet string being solved.
+            moves (list): The first solution.
+            stop_event (threading.Event, optional): Shared with the caller, so setting it
+                works like cancel(); a new event is used if none is given.
+        """
+        self.cube_string = cube_string
+        self.version = 0
+        self._moves = list(moves)
+        self._lock = threading.Lock()
+        self._stop = threading.Event() if stop_event is None else stop_event
+        self._finished = threading.Event()
+        self._finished.set()
+
+    @property
+    def moves(self):
+        """
+        list: A copy of the shortest solution found so far.
+        """
+        with self._lock:
+            return list(self._moves)
+
+    @property
+    def done(self):
+        """
+        bool: True once the background search has ended (or was never needed).
+        """
+        return self._finished.is_set()
+
+    def start(self, constraint, budget, cache=None):
+        """
+        Searches the allowed moves for shorter solutions in a daemon thread.
+
+        Args:
+            constraint (PinConstraint): The pinned pieces.
+            budget (float): Seconds to keep searching.
+            cache (SolutionCache, optional): Stores the final solution as a 'native' one,
+                unless the search was cancelled.
+        """
+        if self._stop.is_set():
+            return  # Cancelled before the search began
+        self._finished.clear()
+        thread = threading.Thread(target=self._search, args=(constraint, budget, cache), daemon=True)
+        thread.start()
+
+    def _search(self, constraint, budget, cache):
+        """
+        Runs the constrained search, publishing every shorter solution as soon as it is found.
+        """
+        # Imported on first use, since it pulls in NumPy
+        import constrained_search
+        try:
+            try:
+                constrained_search.solve_constrained(self.cube_string, constraint.fixed_cubie,
+                                                     constraint.restricted_faces, len(self._moves) - 1, budget,
+                                                     self._improve, self._stop)
+            except constrained_search.SearchTimeout:
+                pass  # The budget ran out before anything shorter turned up
+            if cache is not None and not self._stop.is_set():
+                cache.put(self.cube_string, constraint.forbidden_layers, self.moves, 'native')
+        finally:
+            self._finished.set()
+
+    def _improve(self, moves):
+        """
+        Replaces the current solution if moves is shorter.
+        """
+        with self._lock:
+            if len(moves) < len(self._moves):
+                self._moves = list(moves)
+                self.version += 1
+
+    def continuation(self, executed_moves):
+        """
+        Returns the moves that solve the cube after some moves of an earlier solution were played.
+
+        The played moves are undone and the best solution is played instead; the peephole
+        optimizer cancels the prefix they share, so if the best solution starts with the
+        played moves this is exactly its remainder.
+
+        Args:
+            executed_moves (list): The moves already played from the original state.
+
+        Returns:
+            list: The moves that finish solving the cube.
+        """
+        return optimize_moves(invert_moves(executed_moves) + self.moves)
+
+    def wait(self, timeout=None):
+        """
+        Waits for the background search to end.
+
+        Args:
+            timeout (float, optional): Maximum number of seconds to wait.
+
+        Returns:
+            bool: True if the search has ended.
+        """
+        return self._finished.wait(timeout)
+
+    def cancel(self):
+        """
+        Stops the background search; the best solution found so far stays available.
+        """
+        self._stop.set()
+
+
+def solve_anytime(cube_string, fixed_cubie, budget=ANYTIME_SEARCH_BUDGET, cache=None, stop_event=None):
+    """
+    Returns a valid solution at once and keeps looking for shorter ones in the background.
+
+    The first solution is the rewritten and optimized Kociemba solution, which takes
+    milliseconds. If the fixed piece restricts any face, the constrained search then looks for
+    shorter solutions for up to budget seconds and swaps each one in as it is found.
+    With several pinned pieces the first solution may come from that search instead.
+
+    Args:
+        cube_string (str): A Kociemba facelet string (faces in URFDLB order).
+        fixed_cubie (list): The sticker IDs of the pinned pieces (may be empty).
+        budget (float, optional): Seconds to keep improving the solution.
+        cache (SolutionCache, optional): A cache of previous solutions.
+        stop_event (threading.Event, optional): Stops the first search and the background
+            one when set; see AnytimeSolution.
+
+    Returns:
+        AnytimeSolution: The solution, already improving in the background.
+
+    Raises:
+        InvalidCubeError: If the cube cannot be solved.
+        ValueError: If no solution keeps every pinned piece in place.
+        TimeoutError: If the pinned pieces leave a search too slow to finish in PINNED_SEARCH_TIMEOUT seconds.
+        CancelledError: If stop_event was set before the pinned search found a solution.
+    """
+    constraint = PinConstraint(fixed_cubie)
+    cached_moves = None if cache is None else cache.get(cube_string, constraint.forbidden_layers, 'native')
+    if cached_moves is not None:
+        return AnytimeSolution(cube_string, cached_moves, stop_event)
+    moves = solve_kociemba_string(cube_string, fixed_cubie, cache, stop_event=stop_event)
+    solution = AnytimeSolution(cube_string, moves, stop_event)
+    if constraint.face_mask and solution.moves and budget > 0:
+        solution.start(constraint, budget, cache)
+    return solution
+
+
+def solve_cube_anytime(scanned_faces, fixed_cubie, budget=ANYTIME_SEARCH_BUDGET, cache=None, stop_event=None):
+    """
+    Anytime version of solve_cube() for scanned faces; see solve_anytime().
+
+    Args:
+        scanned_faces (list): The colours of each face in scanning order (Front, Right, Back, Left, Up, Down).
+        fixed_cubie (list): A list of cubies that should remain fixed during the solution.
+        budget (float, optional): Seconds to keep improving the solution.
+        cache (SolutionCache, optional): A cache of previous solutions.
+        stop_event (threading.Event, optional): Stops the search when set; see solve_anytime().
+
+    Returns:
+        AnytimeSolution: The solution, already improving in the background.
+
+    Raises:
+        InvalidCubeError: If the cube cannot be solved.
+    """
+    if is_cube_solved(scanned_faces):
+        return AnytimeSolution(SOLVED_KOCIEMBA_STRING, [])
+    return solve_anytime(get_kociemba_string(scanned_faces), fixed_cubie, budget, cache, stop_event)
+
+
+# Result of one cube solved by solve_many(); exactly one of moves and error is None
+SolveResult = namedtuple('SolveResult', ['index', 'facelets', 'moves', 'error'])
+
+
+def _solve_chunk(function, chunk):
+    """
+    Applies a function to a chunk of items inside a worker process.
+
+    Args:
+        function (callable): A module-level function taking one item.
+        chunk (list): The items.
+
+    Returns:
+        list: The result for every item, in order.
+    """
+    return [function(item) for item in chunk]
+
+
+def map_in_pool(function, items, workers=None, ordered=True, chunksize=64, method='kociemba'):
+    """
+    Applies a function to a stream of items over a process pool.
+
+    Items are sent to the workers in chunks, with a bounded number of chunks in flight,
+    so arbitrarily long input streams are processed in constant memory. Each worker
+    loads kociemba's tables once when it starts.
+
+    Args:
+        function (callable): A module-level (picklable) function taking one item.
+        items (iterable): The items.
+        workers (int, optional): Number of worker processes (defaults to the number of CPUs).
+        ordered (bool, optional): Yield results in input order; otherwise as soon as chunks finish.
+        chunksize (int, optional): Number of items sent to a worker at a time.
+        method (str, optional): The solving method whose tables every worker loads up front.
+
+    Yields:
+        The result of the function for every item.
+    """
+    items = iter(items)
+    workers = workers or os.cpu_count() or 1
+    with ProcessPoolExecutor(max_workers=workers, initializer=warm_up, initargs=(method,)) as executor:
+        max_in_flight = 4 * workers
+        pending = deque()
+
+        def submit_next():
+            chunk = list(islice(items, chunksize))
+            if chunk:
+                pending.append(executor.submit(_solve_chunk, function, chunk))
+            return bool(chunk)
+
+        while len(pending) < max_in_flight and submit_next():
+            pass
+        while pending:
+            if ordered:
+                done = [pending.popleft()]
+            else:
+                done, _ = wait(pending, return_when=FIRST_COMPLETED)
+                for future in done:
+                    pending.remove(future)
+            for future in done:
+                for result in future.result():
+                    yield result
+                submit_next()
+
+
+def _solve_item(item):
+    """
+    Solves one item for solve_many() inside a worker process.
+
+    Args:
+        item (tuple): The index, Kociemba string, fixed sticker ID (or None) and solving method.
+
+    Returns:
+        SolveResult: The solution or the error for the item.
+    """
+    index, cube_string, fixed_sticker, method = item
+    try:
+        fixed_cubie = [] if fixed_sticker is None else get_cubie_group(fixed_sticker)
+        return SolveResult(index, cube_string, solve_kociemba_string(cube_string, fixed_cubie, method=method), None)
+    except (ValueError, TimeoutError) as e:
+        return SolveResult(index, cube_string, None, str(e))
+
+
+def solve_many(states, fixed_sticker=None, workers=None, ordered=True, chunksize=64, method='kociemba'):
+    """
+    Solves many cubes in parallel over a process pool.
+
+    Errors are reported per cube in the results instead of stopping the whole run.
+
+    Args:
+        states (iterable): Kociemba strings or CubeState objects. An item may also be a
+            (state, fixed_sticker) pair to use a different sticker for that cube.
+        fixed_sticker (int, optional): The water-drop sticker ID (1-54) used for every cube.
+        workers (int, optional): Number of worker processes (defaults to the number of CPUs).
+        ordered (bool, optional): Yield results in input order; otherwise as soon as they finish.
+        chunksize (int, optional): Number of cubes sent to a worker at a time.
+        method (str, optional): One of SOLVE_METHODS.
+
+    Yields:
+        SolveResult: The index, Kociemba string and either the moves or an error for every cube.
+    """
+    def items():
+        for index, state in enumerate(states):
+            sticker = fixed_sticker
+            if isinstance(state, tuple):
+                state, sticker = state
+            if not isinstance(state, str):
+                state = state.to_kociemba_string()
+            yield index, state, sticker, method
+
+    return map_in_pool(_solve_item, items(), workers, ordered, chunksize, method)
+
+
+def _parse_sticker_id(sticker):
+    """
+    Reads one sticker ID of a request.
+
+    Args:
+        sticker (int or str): The ID as given, e.g. 7 from JSON or '7' from a text line.
+
+    Returns:
+        int: The ID.
+
+    Raises:
+        ValueError: If the ID is not a whole number.
+    """
+    # bool is an int subclass, but true is not a sticker
+    if isinstance(sticker, int) and not isinstance(sticker, bool):
+        return sticker
+    if isinstance(sticker, str) and sticker.strip().lstrip('+-').isdigit():
+        return int(sticker)
+    raise ValueError("Sticker IDs must be whole numbers, got {}.".format(json.dumps(sticker)))
+
+
+def parse_request(line):
+    """
+    Parses one line of input for the headless solver.
+
+    A line is either a Kociemba facelet string optionally followed by sticker IDs
+    ("UUUUUUUUURRR... 7 30"), or a JSON object {"facelets": "...", "fixed_stickers": [7, 30]}
+    ({"fixed_sticker": 7} is accepted for a single sticker). Every sticker pins its piece.
+
+    Args:
+        line (str): The input line.
+
+    Returns:
+        tuple: The facelet string and the list of fixed sticker IDs (empty if no sticker is fixed).
+
+    Raises:
+        ValueError: If the line cannot be parsed.
+    """
+    line = line.strip()
+    if line.startswith('{'):
+        request = json.loads(line)
+        cube_string = request.get('facelets', '')
+        fixed_stickers = request.get('fixed_stickers', [])
+        if not isinstance(fixed_stickers, list):
+            raise ValueError("fixed_stickers must be a list of sticker IDs.")
+        if request.get('fixed_sticker') is not None:
+            fixed_stickers = [request['fixed_sticker']] + fixed_stickers
+    else:
+        fields = line.split()
+        if not fields:
+            raise ValueError("Expected a facelet string and optional sticker IDs.")
+        cube_string, fixed_stickers = fields[0], fields[1:]
+    if not isinstance(cube_string, str) or len(cube_string) != 54 or set(cube_string) - set('URFDLB'):
+        raise ValueError("The facelet string must be 54 letters from URFDLB.")
+    fixed_stickers = [_parse_sticker_id(sticker) for sticker in fixed_stickers]
+    if not all(1 <= sticker <= 54 for sticker in fixed_stickers):
+        raise ValueError("The fixed sticker IDs must be between 1 and 54.")
+    return cube_string, fixed_stickers
+
+
+def describe_solution(moves):
+    """
+    Describes a solution for the headless solver.
+
+    Args:
+        moves (list): The moves that solve the cube.
+
+    Returns:
+        dict: The "solution", its "length" and its "metrics" (the HTM, QTM and STM counts).
+    """
+    return {'solution': moves, 'length': len(moves), 'metrics': count_moves(moves)}
+
+
+def solve_request(line, cache=None, method='kociemba'):
+    """
+    Solves one line of input for the headless solver and describes the result.
+
+    Args:
+        line (str): The input line (see parse_request()).
+        cache (SolutionCache, optional): A cache of previous solutions.
+        method (str, optional): One of SOLVE_METHODS.
+
+    Returns:
+        dict: The request fields with either the fields of describe_solution(), or "error" and,
+        for a bad scan, the IDs of the suspicious "stickers". "timed_out" is true if the search
+        ran out of time, so the same request may succeed when retried.
+    """
+    result = {'input': line.strip()}
+    try:
+        cube_string, fixed_stickers = parse_request(line)
+        result = {'facelets': cube_string, 'fixed_stickers': fixed_stickers}
+        fixed_cubie = PinConstraint(fixed_stickers).fixed_cubie
+        result.update(describe_solution(solve_kociemba_string(cube_string, fixed_cubie, cache, method)))
+    except InvalidCubeError as e:
+        result['error'] = str(e)
+        result['stickers'] = sorted({sticker for problem in e.problems for sticker in problem.stickers})
+    except ValueError as e:
+        result['error'] = str(e)
+    except TimeoutError as e:
+        result['error'] = str(e)
+        result['timed_out'] = True
+    return result
+
+
+def run_solve(input_stream, output_stream, workers=None, cache=None, method='kociemba'):
+    """
+    Streams solutions as JSON lines, one for every non-empty input line.
+
+    Args:
+        input_stream (file): The stream of requests.
+        output_stream (file): The stream the JSON results are written to.
+        workers (int, optional): Solve over a pool of this many processes, keeping the input order.
+        cache (SolutionCache, optional): A cache of previous solutions (only used without workers).
+        method (str, optional): One of SOLVE_METHODS.
+    """
+    lines = (line for line in input_stream if line.strip())
+    if workers:
+        results = map_in_pool(partial(solve_request, method=method), lines, workers, method=method)
+    else:
+        results = (solve_request(line, cache, method) for line in lines)
+    for result in results:
+        output_stream.write(json.dumps(result) + '\n')
+        output_stream.flush()
+
+
+def main(argv=None):
+    """
+    Headless command line entry point: python -m cube_solver solve < cubes.txt
+    """
+    parser = argparse.ArgumentParser(prog='python -m cube_solver',
+                                     description="Solve Rubik's Cubes with a fixed water-drop sticker without a display.")
+    commands = parser.add_subparsers(dest='command')
+    commands.required = True
+    solve_parser = commands.add_parser('solve', help="Read facelet strings and sticker IDs from stdin and write JSON lines to stdout.")
+    solve_parser.add_argument('--workers', type=int, default=None,
+                              help="Solve in parallel over this many processes (results keep the input order).")
+    solve_parser.add_argument('--cache', metavar='PATH', default=None,
+                              help="Reuse and store solutions in this sqlite file (without --workers).")
+    solve_parser.add_argument('--method', choices=SOLVE_METHODS, default='kociemba',
+                              help="Rewrite Kociemba solutions, search the allowed moves directly for shorter ones, "
+                                   "or rewrite the solutions of all 24 orientations and keep the shortest.")
+    args = parser.parse_args(argv)
+    if args.command == 'solve':
+        cache = SolutionCache(path=args.cache) if args.cache else None
+        try:
+            run_solve(sys.stdin, sys.stdout, args.workers, cache, args.method)
+        finally:
+            if cache is not None:
+                cache.close()
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,551 @@
+"""
+Array-backed Rubik's Cube state with precomputed move permutation tables.
+
+The cube is stored as 54 facelets in the same order used by get_current_cube_state():
+faces Front, Right, Back, Left, Up, Down, each face read row by row.
+"""
+from functools import lru_cache
+
+import numpy as np
+
+# Order of the faces in the flat facelet array (matches the scanning order)
+FACE_ORDER = 'FRBLUD'
+
+# Number of facelets on the cube
+NUM_FACELETS = 54
+
+# Order of the faces in a Kociemba string and their index in FACE_ORDER
+KOCIEMBA_FACE_ORDER = 'URFDLB'
+KOCIEMBA_FACE_INDEX = {'U': 4, 'R': 1, 'F': 0, 'D': 5, 'L': 3, 'B': 2}
+
+
+def facelet_index(face, row, col):
+    """
+    Converts a (face, row, column) position into an index in the flat facelet array.
+
+    Args:
+        face (int): Index of the face in FACE_ORDER (0-5).
+        row (int): Row of the facelet on the face (0-2).
+        col (int): Column of the facelet on the face (0-2).
+
+    Returns:
+        int: The index of the facelet (0-53).
+    """
+    return face * 9 + row * 3 + col
+
+
+def _face_cycles(face):
+    """
+    Returns the two 4-cycles that turn the stickers of a face clockwise.
+
+    Args:
+        face (int): Index of the face in FACE_ORDER.
+
+    Returns:
+        list: Two cycles of (face, row, col) positions.
+    """
+    return [
+        ((face, 0, 0), (face, 2, 0), (face, 2, 2), (face, 0, 2)),  # Corners
+        ((face, 0, 1), (face, 1, 0), (face, 2, 1), (face, 1, 2))   # Edges
+    ]
+
+
+# Sticker cycles of every clockwise quarter turn.
+# In each cycle the first position receives the sticker of the second, the second
+# receives the sticker of the third and so on, with the last receiving the first.
+QUARTER_TURN_CYCLES = {
+    'U': _face_cycles(4) + [
+        ((0, 0, 0), (1, 0, 0), (2, 0, 0), (3, 0, 0)),
+        ((0, 0, 1), (1, 0, 1), (2, 0, 1), (3, 0, 1)),
+        ((0, 0, 2), (1, 0, 2), (2, 0, 2), (3, 0, 2))
+    ],
+    'D': _face_cycles(5) + [
+        ((0, 2, 0), (3, 2, 0), (2, 2, 0), (1, 2, 0)),
+        ((0, 2, 1), (3, 2, 1), (2, 2, 1), (1, 2, 1)),
+        ((0, 2, 2), (3, 2, 2), (2, 2, 2), (1, 2, 2))
+    ],
+    'F': _face_cycles(0) + [
+        ((4, 2, 0), (3, 2, 2), (5, 0, 2), (1, 0, 0)),
+        ((4, 2, 1), (3, 1, 2), (5, 0, 1), (1, 1, 0)),
+        ((4, 2, 2), (3, 0, 2), (5, 0, 0), (1, 2, 0))
+    ],
+    'B': _face_cycles(2) + [
+        ((4, 0, 2), (1, 2, 2), (5, 2, 0), (3, 0, 0)),
+        ((4, 0, 1), (1, 1, 2), (5, 2, 1), (3, 1, 0)),
+        ((4, 0, 0), (1, 0, 2), (5, 2, 2), (3, 2, 0))
+    ],
+    'L': _face_cycles(3) + [
+        ((0, 0, 0), (4, 0, 0), (2, 2, 2), (5, 0, 0)),
+        ((0, 1, 0), (4, 1, 0), (2, 1, 2), (5, 1, 0)),
+        ((0, 2, 0), (4, 2, 0), (2, 0, 2), (5, 2, 0))
+    ],
+    'R': _face_cycles(1) + [
+        ((0, 2, 2), (5, 2, 2), (2, 0, 0), (4, 2, 2)),
+        ((0, 1, 2), (5, 1, 2), (2, 1, 0), (4, 1, 2)),
+        ((0, 0, 2), (5, 0, 2), (2, 2, 0), (4, 0, 2))
+    ],
+    'M': [
+        ((0, 0, 1), (4, 0, 1), (2, 2, 1), (5, 0, 1)),
+        ((0, 1, 1), (4, 1, 1), (2, 1, 1), (5, 1, 1)),
+        ((0, 2, 1), (4, 2, 1), (2, 0, 1), (5, 2, 1))
+    ],
+    'E': [
+        ((0, 1, 0), (3, 1, 0), (2, 1, 0), (1, 1, 0)),
+        ((0, 1, 1), (3, 1, 1), (2, 1, 1), (1, 1, 1)),
+        ((0, 1, 2), (3, 1, 2), (2, 1, 2), (1, 1, 2))
+    ],
+    'S': [
+        ((4, 1, 0), (3, 2, 1), (5, 1, 2), (1, 0, 1)),
+        ((4, 1, 1), (3, 1, 1), (5, 1, 1), (1, 1, 1)),
+        ((4, 1, 2), (3, 0, 1), (5, 1, 0), (1, 2, 1))
+    ]
+}
+
+# Whole-cube rotations expressed as layer turns (x follows R, y follows U, z follows F)
+CUBE_ROTATIONS = {
+    'X': ['R', 'MI', 'LI'],
+    'Y': ['U', 'EI', 'DI'],
+    'Z': ['F', 'S', 'BI']
+}
+
+# Layer turns in the order used by the move tables
+LAYERS = 'UDFBLRMES'
+
+
+def identity_permutation():
+    """
+    Returns the permutation that leaves every facelet in place.
+
+    Returns:
+        numpy.ndarray: An array of 54 indices.
+    """
+    return np.arange(NUM_FACELETS, dtype=np.intp)
+
+
+def compose(first, second):
+    """
+    Composes two facelet permutations.
+
+    A permutation `p` moves the cube from `state` to `state[p]`, so applying `first`
+    and then `second` is the same as applying `first[second]`.
+
+    Args:
+        first (numpy.ndarray): The permutation applied first.
+        second (numpy.ndarray): The permutation applied second.
+
+    Returns:
+        numpy.ndarray: The combined permutation.
+    """
+    return first[second]
+
+
+def _cycles_to_permutation(cycles):
+    """
+    Builds a facelet permutation from a list of sticker cycles.
+
+    Args:
+        cycles (list): Cycles of (face, row, col) positions as in QUARTER_TURN_CYCLES.
+
+    Returns:
+        numpy.ndarray: The permutation of the 54 facelets.
+    """
+    perm = identity_permutation()
+    for cycle in cycles:
+        positions = [facelet_index(*pos) for pos in cycle]
+        for target, source in zip(positions, positions[1:] + positions[:1]):
+            perm[target] = source
+    return perm
+
+
+def _build_move_tables():
+    """
+    Precomputes the permutation of every layer turn and whole-cube rotation.
+
+    Returns:
+        dict: A dictionary mapping upper-case move names (e.g. 'U', 'UI', 'U2', 'X') to permutations.
+    """
+    tables = {}
+    for layer in LAYERS:
+        quarter = _cycles_to_permutation(QUARTER_TURN_CYCLES[layer])
+        tables[layer] = quarter
+        tables[layer + '2'] = compose(quarter, quarter)
+        tables[layer + 'I'] = compose(tables[layer + '2'], quarter)
+    for axis, layers in CUBE_ROTATIONS.items():
+        quarter = identity_permutation()
+        for layer in layers:
+            quarter = compose(quarter, tables[layer])
+        tables[axis] = quarter
+        tables[axis + '2'] = compose(quarter, quarter)
+        tables[axis + 'I'] = compose(tables[axis + '2'], quarter)
+    for perm in tables.values():
+        perm.flags.writeable = False
+    return tables
+
+
+# Permutation of every move, keyed by the upper-case notation used by move()
+MOVE_TABLES = _build_move_tables()
+
+# Every accepted spelling of a move mapped to its permutation ('U', 'Ui', "U'", 'UI', 'x', ...)
+_MOVE_LOOKUP = {}
+for _name, _perm in MOVE_TABLES.items():
+    for _spelling in (_name, _name.replace('I', 'i'), _name.replace('I', "'")):
+        _MOVE_LOOKUP[_spelling] = _perm
+        _MOVE_LOOKUP[_spelling.lower()] = _perm
+
+
+def get_move_permutation(mv):
+    """
+    Looks up the precomputed permutation of a move.
+
+    Args:
+        mv (str): The move in any of the notations used by the project (e.g. 'U', 'Ui', "U'", 'UI', 'x').
+
+    Returns:
+        numpy.ndarray: The permutation of the 54 facelets.
+
+    Raises:
+        ValueError: If the move is invalid.
+    """
+    try:
+        return _MOVE_LOOKUP[mv]
+    except KeyError:
+        raise ValueError("Invalid Move: " + str(mv)) from None
+
+
+def split_moves(sequence):
+    """
+    Splits a move sequence into individual moves.
+
+    Args:
+        sequence (str or list): Moves separated by spaces (e.g. "R U Ri F2") or a list of moves.
+
+    Returns:
+        list: The individual moves.
+    """
+    if isinstance(sequence, str):
+        return sequence.split()
+    return list(sequence)
+
+
+@lru_cache(maxsize=4096)
+def _compile_moves(moves):
+    """
+    Composes a tuple of moves into one permutation (cached on the tuple of moves).
+
+    Args:
+        moves (tuple): The moves to compose, in order.
+
+    Returns:
+        numpy.ndarray: The read-only permutation of the whole sequence.
+    """
+    perm = identity_permutation()
+    for mv in moves:
+        perm = compose(perm, get_move_permutation(mv))
+    perm.flags.writeable = False
+    return perm
+
+
+def compile_sequence(sequence):
+    """
+    Composes a whole move sequence into a single 54-entry permutation.
+
+    Compiled sequences are cached, so replaying the same solution again costs one lookup
+    and applying it to a state costs the same as a single move.
+
+    Args:
+        sequence (str or list): Moves separated by spaces (e.g. "R U Ri F2") or a list of moves.
+
+    Returns:
+        numpy.ndarray: The permutation of the whole sequence.
+
+    Raises:
+        ValueError: If the sequence contains an invalid move.
+    """
+    return _compile_moves(tuple(split_moves(sequence)))
+
+
+# Facelets of a solved cube, each sticker labelled with the letter of its face
+SOLVED_FACELETS = np.frombuffer(''.join(face * 9 for face in FACE_ORDER).encode('ascii'), dtype=np.uint8)
+
+# Indices of the six centre facelets in FACE_ORDER
+CENTER_INDICES = np.array([facelet_index(face, 1, 1) for face in range(6)])
+
+
+def _build_whole_cube_rotations():
+    """
+    Enumerates the 24 whole-cube rotations by breadth-first search over x and y.
+
+    Returns:
+        list: (moves, permutation) pairs, starting with the identity. `moves` is the
+        shortest list of x/y turns that performs the rotation.
+    """
+    rotations = [([], identity_permutation())]
+    seen = {rotations[0][1].tobytes()}
+    for moves, perm in rotations:
+        for axis in ('x', 'y'):
+            rotated = compose(perm, MOVE_TABLES[axis.upper()])
+            if rotated.tobytes() not in seen:
+                seen.add(rotated.tobytes())
+                rotations.append((moves + [axis], rotated))
+    return rotations
+
+
+# The 24 whole-cube rotations; the position in this list is the orientation index of a cube
+WHOLE_CUBE_ROTATIONS = _build_whole_cube_rotations()
+
+# Centre letters of a rotated solved cube mapped to the orientation index of the rotation
+_ORIENTATION_BY_CENTERS = {
+    SOLVED_FACELETS[perm[CENTER_INDICES]].tobytes(): i for i, (_, perm) in enumerate(WHOLE_CUBE_ROTATIONS)
+}
+
+
+def _build_rotated_moves():
+    """
+    Works out, for every whole-cube rotation, which turn of the unrotated cube each layer turn of the rotated cube is.
+
+    A state rotated by `perm` and then turned by `mv` is the state turned by
+    perm + mv + inverse(perm) and then rotated, so the turns are conjugated by the rotation.
+
+    Returns:
+        list: For every orientation, a dictionary mapping moves in the project notation (e.g. 'Ui')
+        to the equivalent move of the unrotated cube.
+    """
+    names = {MOVE_TABLES[layer + suffix.upper()].tobytes(): layer + suffix
+             for layer in LAYERS for suffix in ('', '2', 'i')}
+    rotated_moves = []
+    for _, perm in WHOLE_CUBE_ROTATIONS:
+        inverse = np.argsort(perm)
+        rotated_moves.append({name: names[compose(compose(perm, MOVE_TABLES[name.upper()]), inverse).tobytes()]
+                              for name in names.values()})
+    return rotated_moves
+
+
+# For every orientation, each layer turn of the rotated cube as a turn of the unrotated cube
+ROTATED_MOVES = _build_rotated_moves()
+
+
+def rotate_state(state, fixed_cubie, orientation):
+    """
+    Re-expresses a cube state as seen after a whole-cube rotation.
+
+    The colours are renamed after the faces their centres end up on, so the rotated state
+    can be passed to Kociemba like any other.
+
+    Args:
+        state (CubeState): The cube state.
+        fixed_cubie (list): The sticker IDs (1-54) of the fixed piece.
+        orientation (int): The index of the rotation in WHOLE_CUBE_ROTATIONS.
+
+    Returns:
+        tuple: The rotated state and the sticker IDs where the fixed piece ends up.
+    """
+    perm = WHOLE_CUBE_ROTATIONS[orientation][1]
+    inverse = np.argsort(perm)
+    rotated = state.copy()
+    rotated.apply_permutation(perm)
+    names = np.zeros(256, dtype=np.uint8)
+    names[rotated.facelets[CENTER_INDICES]] = SOLVED_FACELETS[CENTER_INDICES]
+    rotated.facelets[:] = names[rotated.facelets]
+    return rotated, [int(inverse[sticker - 1]) + 1 for sticker in fixed_cubie]
+
+
+def unrotate_moves(moves, orientation):
+    """
+    Maps moves that solve a state returned by rotate_state() back to moves for the original state.
+
+    Args:
+        moves (list): Moves in the project notation for the rotated cube.
+        orientation (int): The index of the rotation in WHOLE_CUBE_ROTATIONS.
+
+    Returns:
+        list: The same turns, named as seen on the original cube.
+    """
+    return [ROTATED_MOVES[orientation][mv] for mv in moves]
+
+
+def get_orientation(state):
+    """
+    Returns the whole-cube rotation that takes the standard orientation to the centres of a state.
+
+    Slice moves and whole-cube rotations move the centres; face turns never do.
+
+    Args:
+        state (CubeState): The cube state.
+
+    Returns:
+        int: The orientation index in WHOLE_CUBE_ROTATIONS.
+
+    Raises:
+        ValueError: If the centres are not six different faces in a reachable arrangement.
+    """
+    try:
+        return _ORIENTATION_BY_CENTERS[state.facelets[CENTER_INDICES].tobytes()]
+    except KeyError:
+        raise ValueError("The centres do not form a valid cube orientation.") from None
+
+
+class CubeState:
+    """
+    Represents a Rubik's Cube as a flat array of 54 facelets.
+
+    Every move is a single gather through a precomputed permutation into a buffer
+    owned by the state, so applying moves does not allocate.
+
+    Attributes:
+        facelets (numpy.ndarray): 54 uint8 face letters in FACE_ORDER, row by row.
+
+    Methods:
+        apply_move(mv): Applies a single move (e.g. 'U', 'Ri', 'F2', 'x').
+        apply_moves(moves): Applies a list of moves one after another.
+        apply_sequence(sequence): Applies a whole sequence as one compiled permutation.
+        apply_permutation(perm): Applies a precomputed facelet permutation.
+        to_faces(): Returns the state in the format of get_current_cube_state().
+        to_kociemba_string(): Returns the state as a Kociemba facelet string.
+        is_solved(): Checks whether the cube is solved in the standard orientation.
+        copy(): Returns an independent copy of the state.
+
+    States compare equal and hash by their facelets, so they can be used in sets and as
+    dictionary keys. For compact keys use cubie.rank_state(), which packs a state into one integer.
+    """
+    __slots__ = ('facelets', '_scratch')
+
+    def __init__(self, facelets=None):
+        """
+        Initializes a cube state, solved unless facelets are given.
+
+        Args:
+            facelets (array-like, optional): 54 face letters as a string, bytes or uint8 array.
+        """
+        if facelets is None:
+            self.facelets = SOLVED_FACELETS.copy()
+        elif isinstance(facelets, str):
+            self.facelets = np.frombuffer(facelets.encode('ascii'), dtype=np.uint8).copy()
+        else:
+            self.facelets = np.array(bytearray(facelets) if isinstance(facelets, bytes) else facelets, dtype=np.uint8)
+        if self.facelets.shape != (NUM_FACELETS,):
+            raise ValueError("A cube state needs exactly 54 facelets.")
+        self._scratch = np.empty(NUM_FACELETS, dtype=np.uint8)
+
+    @classmethod
+    def from_faces(cls, scanned_faces):
+        """
+        Creates a state from six lists of nine colours, as produced by scan_cube().
+
+        Args:
+            scanned_faces (list): Face data in FACE_ORDER (Front, Right, Back, Left, Up, Down).
+
+        Returns:
+            CubeState: The corresponding cube state.
+        """
+        return cls(''.join(''.join(face) for face in scanned_faces))
+
+    @classmethod
+    def from_kociemba_string(cls, cube_string):
+        """
+        Creates a state from a Kociemba facelet string (faces in URFDLB order).
+
+        Args:
+            cube_string (str): The 54 character Kociemba string.
+
+        Returns:
+            CubeState: The corresponding cube state.
+        """
+        if len(cube_string) != NUM_FACELETS:
+            raise ValueError("A cube state needs exactly 54 facelets.")
+        faces = [None] * 6
+        for i, face in enumerate(KOCIEMBA_FACE_ORDER):
+            faces[KOCIEMBA_FACE_INDEX[face]] = cube_string[i * 9:(i + 1) * 9]
+        return cls(''.join(faces))
+
+    def apply_permutation(self, perm):
+        """
+        Applies a facelet permutation to the cube in place.
+
+        Args:
+            perm (numpy.ndarray): A permutation from MOVE_TABLES or compose().
+        """
+        # 'clip' skips numpy's bounds-checking copy; every table index is already valid
+        self.facelets.take(perm, 0, self._scratch, 'clip')
+        self.facelets, self._scratch = self._scratch, self.facelets
+
+    def apply_move(self, mv):
+        """
+        Applies a single move to the cube in place.
+
+        Args:
+            mv (str): The move to apply (e.g. 'U', 'D2', 'Ri', "F'", 'x').
+
+        Raises:
+            ValueError: If the move is invalid.
+        """
+        self.apply_permutation(get_move_permutation(mv))
+
+    def apply_moves(self, moves):
+        """
+        Applies a list of moves to the cube in place.
+
+        Args:
+            moves (list): The moves to apply, in order.
+        """
+        for mv in moves:
+            self.apply_permutation(get_move_permutation(mv))
+
+    def apply_sequence(self, sequence):
+        """
+        Applies a whole move sequence in place using its compiled permutation.
+
+        Args:
+            sequence (str or list): Moves separated by spaces (e.g. "R U Ri F2") or a list of moves.
+        """
+        self.apply_permutation(compile_sequence(sequence))
+
+    def to_faces(self):
+        """
+        Returns the cube as six lists of nine face letters, like get_current_cube_state().
+
+        Returns:
+            list: Face data in FACE_ORDER (Front, Right, Back, Left, Up, Down).
+        """
+        letters = self.facelets.tobytes().decode('ascii')
+        return [list(letters[i:i + 9]) for i in range(0, NUM_FACELETS, 9)]
+
+    def to_kociemba_string(self):
+        """
+        Returns the cube as a Kociemba facelet string (faces in URFDLB order).
+
+        Returns:
+            str: The 54 character Kociemba string.
+        """
+        letters = self.facelets.tobytes().decode('ascii')
+        return ''.join(letters[KOCIEMBA_FACE_INDEX[face] * 9:KOCIEMBA_FACE_INDEX[face] * 9 + 9]
+                       for face in KOCIEMBA_FACE_ORDER)
+
+    def is_solved(self):
+        """
+        Checks whether the cube is solved in the standard orientation.
+
+        Returns:
+            bool: True if every facelet shows the letter of its face.
+        """
+        return bool(np.array_equal(self.facelets, SOLVED_FACELETS))
+
+    def copy(self):
+        """
+        Returns an independent copy of the cube state.
+
+        Returns:
+            CubeState: A new state with the same facelets.
+        """
+        return CubeState(self.facelets)
+
+    def __eq__(self, other):
+        if not isinstance(other, CubeState):
+            return NotImplemented
+        return self.facelets.tobytes() == other.facelets.tobytes()
+
+    def __hash__(self):
+        # States are mutable: do not apply moves to a state while it is a key in a dict or set
+        return hash(self.facelets.tobytes())
+
+    def __repr__(self):
+        return "CubeState('" + self.facelets.tobytes().decode('ascii') + "')"
@@ -0,0 +1,806 @@
+"""
+Cubie-level model of the Rubik's Cube: 8 corners and 12 edges with their orientations.
+
+Positions, piece names and the facelet numbering follow the Kociemba facelet string
+(U1-U9, R1-R9, F1-F9, D1-D9, L1-L9, B1-B9), so a CubieCube converts both ways to the
+string returned by get_kociemba_string().
+"""
+from collections import namedtuple
+from functools import lru_cache
+from itertools import combinations, permutations
+from math import factorial
+from operator import itemgetter
+
+import numpy as np
+
+from cube_state import (KOCIEMBA_FACE_INDEX, KOCIEMBA_FACE_ORDER, CubeState, WHOLE_CUBE_ROTATIONS, get_orientation,
+                        split_moves)
+
+# Corner positions and pieces
+CORNER_NAMES = ['URF', 'UFL', 'ULB', 'UBR', 'DFR', 'DLF', 'DBL', 'DRB']
+
+# Edge positions and pieces
+EDGE_NAMES = ['UR', 'UF', 'UL', 'UB', 'DR', 'DF', 'DL', 'DB', 'FR', 'FL', 'BL', 'BR']
+
+# Kociemba string indices of the stickers of each corner, starting with the U/D sticker
+CORNER_FACELETS = [
+    (8, 9, 20), (6, 18, 38), (0, 36, 47), (2, 45, 11),
+    (29, 26, 15), (27, 44, 24), (33, 53, 42), (35, 17, 51)
+]
+
+# Kociemba string indices of the stickers of each edge
+EDGE_FACELETS = [
+    (5, 10), (7, 19), (3, 37), (1, 46), (32, 16), (28, 25),
+    (30, 43), (34, 52), (23, 12), (21, 41), (50, 39), (48, 14)
+]
+
+# Colours (face letters) of every corner and edge piece, in the same sticker order
+CORNER_COLORS = [tuple(name) for name in CORNER_NAMES]
+EDGE_COLORS = [tuple(name) for name in EDGE_NAMES]
+
+# Centre stickers of the Kociemba string and the face they belong to
+CENTER_FACELETS = {4: 'U', 13: 'R', 22: 'F', 31: 'D', 40: 'L', 49: 'B'}
+
+# Sticker ID (1-54, as in CUBIE_IDS) of every index of a Kociemba string
+KOCIEMBA_STICKER_IDS = [KOCIEMBA_FACE_INDEX[face] * 9 + i + 1 for face in KOCIEMBA_FACE_ORDER for i in range(9)]
+
+# Colours of every real corner as read in each of its three twists, and of every real edge
+# both ways round, mapped to the piece and its orientation (as in from_kociemba_string())
+_CORNER_LOOKUP = {tuple(colors[(i - ori) % 3] for i in range(3)): (piece, ori)
+                  for piece, colors in enumerate(CORNER_COLORS) for ori in range(3)}
+_EDGE_LOOKUP = {(colors if ori == 0 else colors[::-1]): (piece, ori)
+                for piece, colors in enumerate(EDGE_COLORS) for ori in range(2)}
+
+# Reads the colours of every corner and edge position out of a Kociemba string in one call
+_CORNER_READERS = [itemgetter(*stickers) for stickers in CORNER_FACELETS]
+_EDGE_READERS = [itemgetter(*stickers) for stickers in EDGE_FACELETS]
+
+# The 18 face turns in the order used by the coordinate move tables
+FACE_MOVES = [face + suffix for face in 'URFDLB' for suffix in ('', '2', 'i')]
+
+# Number of values of each coordinate
+N_TWIST = 3 ** 7
+N_FLIP = 2 ** 11
+N_CORNER_PERMUTATION = factorial(8)
+
+# Edge permutations of one parity (the parity always matches the corner permutation)
+N_EDGE_PERMUTATION_HALF = factorial(12) // 2
+
+# Phase 2 of the two-phase search moves the 8 U/D edges and the 4 slice edges (FR, FL, BL, BR) separately
+N_SLICE = 495
+N_UD_EDGE_PERMUTATION = factorial(8)
+N_SLICE_PERMUTATION = factorial(4)
+
+# Every set of 4 positions the slice edges can occupy, solved (8, 9, 10, 11) first
+SLICE_POSITIONS = [tuple(sorted(positions)) for positions in combinations(range(11, -1, -1), 4)]
+_SLICE_INDEX = {positions: i for i, positions in enumerate(SLICE_POSITIONS)}
+
+# Number of legal cubes with the centres in place (about 4.3 * 10^19, just over 65 bits)
+N_CUBIE_STATES = N_CORNER_PERMUTATION * N_TWIST * N_EDGE_PERMUTATION_HALF * N_FLIP
+
+# Number of legal cubes in any of the 24 orientations that slice moves can leave the centres in
+N_STATES = len(WHOLE_CUBE_ROTATIONS) * N_CUBIE_STATES
+
+
+# Number of set bits of every 12 bit mask, for ranking permutations of up to 12 elements
+_BIT_COUNTS = bytes(bin(mask).count('1') for mask in range(1 << 12))
+
+
+def _lehmer_code(perm):
+    """
+    Ranks a permutation of up to 12 elements in one pass and finds its parity.
+
+    The elements smaller than perm[i] that come after it are the ones smaller than perm[i]
+    that have not been seen yet, so one bitmask of the elements seen so far and a lookup
+    of its bit count give every digit of the Lehmer code.
+
+    Args:
+        perm (sequence): A permutation of range(n), n <= 12.
+
+    Returns:
+        tuple: The lexicographic rank and the parity (0 for even, 1 for odd).
+
+    Raises:
+        ValueError: If an element appears twice.
+    """
+    n = len(perm)
+    rank = parity = seen = 0
+    for i, element in enumerate(perm):
+        bit = 1 << element
+        if seen & bit:
+            raise ValueError("Element {} appears twice.".format(element))
+        smaller = element - _BIT_COUNTS[seen & (bit - 1)]
+        rank = rank * (n - i) + smaller
+        # The parity of a permutation is the parity of the sum of its Lehmer digits
+        parity ^= smaller & 1
+        seen |= bit
+    return rank, parity
+
+
+def rank_permutation(perm):
+    """
+    Ranks a permutation in lexicographic order (its Lehmer code).
+
+    Args:
+        perm (sequence): A permutation of range(n), n <= 12.
+
+    Returns:
+        int: The rank, from 0 to n! - 1.
+    """
+    return _lehmer_code(perm)[0]
+
+
+def unrank_permutation(rank, n):
+    """
+    Returns the permutation of range(n) with the given lexicographic rank.
+
+    Args:
+        rank (int): The rank, from 0 to n! - 1.
+        n (int): Number of elements.
+
+    Returns:
+        list: The permutation.
+    """
+    digits = []
+    for base in range(1, n + 1):
+        digits.append(rank % base)
+        rank //= base
+    remaining = list(range(n))
+    return [remaining.pop(digit) for digit in reversed(digits)]
+
+
+def permutation_parity(perm):
+    """
+    Returns the parity of a permutation.
+
+    Args:
+        perm (sequence): A permutation of range(n).
+
+    Returns:
+        int: 0 for an even permutation, 1 for an odd one.
+    """
+    parity = 0
+    for i in range(len(perm)):
+        for j in range(i + 1, len(perm)):
+            if perm[j] < perm[i]:
+                parity ^= 1
+    return parity
+
+
+class CubieCube:
+    """
+    Represents a Rubik's Cube by the position and orientation of its 20 movable pieces.
+
+    Piece cp[i] sits in corner position i twisted by co[i] (0-2), and piece ep[i] sits in
+    edge position i flipped by eo[i] (0-1). The centres are fixed as in a Kociemba string.
+
+    Attributes:
+        cp (list): Corner permutation, 8 piece indices.
+        co (list): Corner orientation, 8 values in 0-2.
+        ep (list): Edge permutation, 12 piece indices.
+        eo (list): Edge orientation, 12 values in 0-1.
+
+    Methods:
+        multiply(other): Applies the permutation of another cubie cube in place.
+        apply_move(mv): Applies a face turn in place (e.g. 'U', 'R2', 'Fi').
+        apply_moves(moves): Applies a sequence of face turns in place.
+        to_kociemba_string(): Converts the cube back to a Kociemba facelet string.
+        verify(): Checks that the cube can be reached by turning a real cube.
+    """
+    __slots__ = ('cp', 'co', 'ep', 'eo')
+
+    def __init__(self, cp=None, co=None, ep=None, eo=None):
+        """
+        Initializes a cubie cube, solved unless the pieces are given.
+
+        Args:
+            cp (list, optional): Corner permutation.
+            co (list, optional): Corner orientation.
+            ep (list, optional): Edge permutation.
+            eo (list, optional): Edge orientation.
+        """
+        self.cp = list(range(8)) if cp is None else list(cp)
+        self.co = [0] * 8 if co is None else list(co)
+        self.ep = list(range(12)) if ep is None else list(ep)
+        self.eo = [0] * 12 if eo is None else list(eo)
+
+    @classmethod
+    def from_kociemba_string(cls, cube_string):
+        """
+        Builds a cubie cube from a Kociemba facelet string.
+
+        Args:
+            cube_string (str): 54 face letters in URFDLB order.
+
+        Returns:
+            CubieCube: The corresponding cubie cube.
+
+        Raises:
+            ValueError: If a corner or edge does not match any real piece.
+        """
+        cube = cls()
+        for i, stickers in enumerate(CORNER_FACELETS):
+            # The orientation is the sticker that shows the U or D colour
+            for ori in range(3):
+                if cube_string[stickers[ori]] in 'UD':
+                    break
+            else:
+                raise ValueError("Corner " + CORNER_NAMES[i] + " has no U or D sticker.")
+            colors = (cube_string[stickers[(ori + 1) % 3]], cube_string[stickers[(ori + 2) % 3]])
+            for j, piece in enumerate(CORNER_COLORS):
+                if piece[1:] == colors and piece[0] == cube_string[stickers[ori]]:
+                    cube.cp[i], cube.co[i] = j, ori
+                    break
+            else:
+                raise ValueError("Corner " + CORNER_NAMES[i] + " does not match any piece.")
+        for i, stickers in enumerate(EDGE_FACELETS):
+            colors = (cube_string[stickers[0]], cube_string[stickers[1]])
+            for j, piece in enumerate(EDGE_COLORS):
+                if piece == colors:
+                    cube.ep[i], cube.eo[i] = j, 0
+                    break
+                if piece == colors[::-1]:
+                    cube.ep[i], cube.eo[i] = j, 1
+                    break
+            else:
+                raise ValueError("Edge " + EDGE_NAMES[i] + " does not match any piece.")
+        return cube
+
+    @classmethod
+    def from_state(cls, state):
+        """
+        Builds a cubie cube from a CubeState with its centres in place.
+
+        Args:
+            state (CubeState): The facelet state.
+
+        Returns:
+            CubieCube: The corresponding cubie cube.
+        """
+        return cls.from_kociemba_string(state.to_kociemba_string())
+
+    def to_kociemba_string(self):
+        """
+        Converts the cube to a Kociemba facelet string.
+
+        Returns:
+            str: 54 face letters in URFDLB order.
+        """
+        letters = [''] * 54
+        for index, face in CENTER_FACELETS.items():
+            letters[index] = face
+        for i, stickers in enumerate(CORNER_FACELETS):
+            piece, ori = self.cp[i], self.co[i]
+            for k in range(3):
+                letters[stickers[(k + ori) % 3]] = CORNER_COLORS[piece][k]
+        for i, stickers in enumerate(EDGE_FACELETS):
+            piece, ori = self.ep[i], self.eo[i]
+            for k in range(2):
+                letters[stickers[(k + ori) % 2]] = EDGE_COLORS[piece][k]
+        return ''.join(letters)
+
+    def to_state(self):
+        """
+        Converts the cube to a CubeState.
+
+        Returns:
+            CubeState: The facelet state.
+        """
+        return CubeState.from_kociemba_string(self.to_kociemba_string())
+
+    def copy(self):
+        """
+        Returns an independent copy of the cubie cube.
+
+        Returns:
+            CubieCube: The copy.
+        """
+        return CubieCube(self.cp, self.co, self.ep, self.eo)
+
+    def multiply(self, other):
+        """
+        Applies another cubie cube (for example a move) to this one in place.
+
+        Args:
+            other (CubieCube): The permutation applied after this cube.
+        """
+        cp, co, ep, eo = self.cp, self.co, self.ep, self.eo
+        self.cp = [cp[j] for j in other.cp]
+        self.co = [(co[j] + twist) % 3 for j, twist in zip(other.cp, other.co)]
+        self.ep = [ep[j] for j in other.ep]
+        self.eo = [(eo[j] + flip) % 2 for j, flip in zip(other.ep, other.eo)]
+
+    def apply_move(self, mv):
+        """
+        Applies a single face turn in place.
+
+        Args:
+            mv (str): The move to apply (e.g. 'U', 'R2', 'Fi', "F'").
+
+        Raises:
+            ValueError: If the move is not a face turn.
+        """
+        self.multiply(get_move_cube(mv))
+
+    def apply_moves(self, moves):
+        """
+        Applies a sequence of face turns in place.
+
+        Args:
+            moves (str or list): Moves separated by spaces (e.g. "R U Ri F2") or a list of moves.
+        """
+        for mv in split_moves(moves):
+            self.multiply(get_move_cube(mv))
+
+    def get_twist(self):
+        """
+        Returns the corner orientation coordinate (0 to 3^7 - 1).
+
+        Returns:
+            int: The twist of corners 0-6 read as a base 3 number; corner 7 follows from them.
+        """
+        twist = 0
+        for ori in self.co[:7]:
+            twist = twist * 3 + ori
+        return twist
+
+    def set_twist(self, twist):
+        """
+        Sets the corner orientations from a twist coordinate.
+
+        Args:
+            twist (int): The twist coordinate.
+        """
+        total = 0
+        for i in range(6, -1, -1):
+            self.co[i] = twist % 3
+            total += self.co[i]
+            twist //= 3
+        self.co[7] = -total % 3
+
+    def get_flip(self):
+        """
+        Returns the edge orientation coordinate (0 to 2^11 - 1).
+
+        Returns:
+            int: The flip of edges 0-10 read as a base 2 number; edge 11 follows from them.
+        """
+        flip = 0
+        for ori in self.eo[:11]:
+            flip = flip * 2 + ori
+        return flip
+
+    def set_flip(self, flip):
+        """
+        Sets the edge orientations from a flip coordinate.
+
+        Args:
+            flip (int): The flip coordinate.
+        """
+        total = 0
+        for i in range(10, -1, -1):
+            self.eo[i] = flip % 2
+            total += self.eo[i]
+            flip //= 2
+        self.eo[11] = total % 2
+
+    def get_corner_permutation(self):
+        """
+        Returns the corner permutation coordinate (0 to 8! - 1).
+
+        Returns:
+            int: The lexicographic rank of the corner permutation.
+        """
+        return rank_permutation(self.cp)
+
+    def set_corner_permutation(self, rank):
+        """
+        Sets the corner permutation from its coordinate.
+
+        Args:
+            rank (int): The corner permutation coordinate.
+        """
+        self.cp = unrank_permutation(rank, 8)
+
+    def get_edge_permutation(self):
+        """
+        Returns the edge permutation coordinate (0 to 12! - 1).
+
+        Returns:
+            int: The lexicographic rank of the edge permutation.
+        """
+        return rank_permutation(self.ep)
+
+    def set_edge_permutation(self, rank):
+        """
+        Sets the edge permutation from its coordinate.
+
+        Args:
+            rank (int): The edge permutation coordinate.
+        """
+        self.ep = unrank_permutation(rank, 12)
+
+    def get_slice(self):
+        """
+        Returns the slice coordinate (0 to 494): which positions hold the FR, FL, BL and BR edges.
+
+        Returns:
+            int: The index of the positions in SLICE_POSITIONS; 0 when they are in the middle layer.
+        """
+        return _SLICE_INDEX[tuple(i for i, piece in enumerate(self.ep) if piece >= 8)]
+
+    def get_ud_edge_permutation(self):
+        """
+        Returns the permutation coordinate of the 8 U/D edges (0 to 8! - 1).
+
+        Only meaningful when the slice edges are in the middle layer (slice coordinate 0).
+
+        Returns:
+            int: The lexicographic rank of the first 8 edges.
+        """
+        return rank_permutation(self.ep[:8])
+
+    def get_slice_permutation(self):
+        """
+        Returns the permutation coordinate of the 4 slice edges (0 to 4! - 1).
+
+        Only meaningful when the slice edges are in the middle layer (slice coordinate 0).
+
+        Returns:
+            int: The lexicographic rank of the last 4 edges.
+        """
+        return rank_permutation([piece - 8 for piece in self.ep[8:]])
+
+    def verify(self):
+        """
+        Checks that the cube can be reached by turning a real cube.
+
+        Raises:
+            ValueError: If a piece is missing or duplicated, or the twist, flip or parity is wrong.
+        """
+        if sorted(self.cp) != list(range(8)):
+            raise ValueError("Some corners are missing or appear twice.")
+        if sorted(self.ep) != list(range(12)):
+            raise ValueError("Some edges are missing or appear twice.")
+        if sum(self.co) % 3 != 0:
+            raise ValueError("A corner is twisted.")
+        if sum(self.eo) % 2 != 0:
+            raise ValueError("An edge is flipped.")
+        if permutation_parity(self.cp) != permutation_parity(self.ep):
+            raise ValueError("Two pieces are swapped.")
+
+    def __eq__(self, other):
+        if not isinstance(other, CubieCube):
+            return NotImplemented
+        return self.cp == other.cp and self.co == other.co and self.ep == other.ep and self.eo == other.eo
+
+    def __repr__(self):
+        return "CubieCube(cp={}, co={}, ep={}, eo={})".format(self.cp, self.co, self.ep, self.eo)
+
+
+# A problem found in a scanned cube and the sticker IDs (1-54) that cause it; stickers is
+# empty when the problem can't be pinned on particular pieces (colour counts, twist, flip, parity)
+ScanProblem = namedtuple('ScanProblem', ['message', 'stickers'])
+
+
+def _sticker_ids(indices):
+    """
+    Converts Kociemba string indices into sorted sticker IDs.
+    """
+    return tuple(sorted(KOCIEMBA_STICKER_IDS[i] for i in indices))
+
+
+def find_scan_problems(cube_string):
+    """
+    Checks a scanned cube without solving it.
+
+    The checks run from the most to the least specific: sticker colours and counts, pieces
+    that no real cube has, pieces that appear twice, and finally the twist, flip and
+    permutation parity that no sequence of turns can change.
+
+    Args:
+        cube_string (str): A Kociemba facelet string (faces in URFDLB order).
+
+    Returns:
+        list: A ScanProblem for everything that is wrong; empty if the cube can be solved.
+    """
+    if len(cube_string) != 54:
+        return [ScanProblem("A cube has 54 stickers, not {}.".format(len(cube_string)), ())]
+    unknown = [i for i, color in enumerate(cube_string) if color not in CENTER_FACELETS.values()]
+    if unknown:
+        return [ScanProblem("Some stickers are not one of the six face colours.", _sticker_ids(unknown))]
+
+    problems = []
+    for index, face in CENTER_FACELETS.items():
+        if cube_string[index] != face:
+            problems.append(ScanProblem("The {} centre shows {}.".format(face, cube_string[index]), _sticker_ids([index])))
+    # A wrong count can't tell which sticker was misread; the piece checks below can
+    for face in 'URFDLB':
+        count = cube_string.count(face)
+        if count != 9:
+            problems.append(ScanProblem("There are {} {} stickers instead of 9.".format(count, face), ()))
+
+    # Position of every piece found, its total twist/flip and the permutation for the parity check
+    pieces = []
+    for names, facelets, readers, lookup in ((CORNER_NAMES, CORNER_FACELETS, _CORNER_READERS, _CORNER_LOOKUP),
+                                             (EDGE_NAMES, EDGE_FACELETS, _EDGE_READERS, _EDGE_LOOKUP)):
+        positions = {}
+        orientation = 0
+        for i, read in enumerate(readers):
+            found = lookup.get(read(cube_string))
+            if found is None:
+                problems.append(ScanProblem("The piece at {} is not a real piece.".format(names[i]),
+                                            _sticker_ids(facelets[i])))
+            else:
+                positions.setdefault(found[0], []).append(i)
+                orientation += found[1]
+        for piece, found_at in sorted(positions.items()):
+            if len(found_at) > 1:
+                problems.append(ScanProblem("The {} piece appears {} times.".format(names[piece], len(found_at)),
+                                            _sticker_ids([sticker for i in found_at for sticker in facelets[i]])))
+        pieces.append((positions, orientation))
+    if problems:
+        return problems
+
+    (corners, twist), (edges, flip) = pieces
+    if twist % 3:
+        problems.append(ScanProblem("A corner is twisted.", ()))
+    if flip % 2:
+        problems.append(ScanProblem("An edge is flipped.", ()))
+    cp = [piece for piece, _ in sorted(corners.items(), key=lambda item: item[1])]
+    ep = [piece for piece, _ in sorted(edges.items(), key=lambda item: item[1])]
+    if permutation_parity(cp) != permutation_parity(ep):
+        problems.append(ScanProblem("Two pieces are swapped.", ()))
+    return problems
+
+
+def _build_move_cubes():
+    """
+    Derives the cubie cube of every face turn from the facelet move tables.
+
+    Returns:
+        dict: A dictionary mapping move names in FACE_MOVES to CubieCube objects.
+    """
+    move_cubes = {}
+    for mv in FACE_MOVES:
+        state = CubeState()
+        state.apply_move(mv)
+        move_cubes[mv] = CubieCube.from_state(state)
+    return move_cubes
+
+
+# The cubie cube of every face turn
+MOVE_CUBES = _build_move_cubes()
+
+# Every accepted spelling of a face turn ('U', 'Ui', 'UI', "U'", ...) mapped to its cubie cube
+_MOVE_CUBE_LOOKUP = {}
+for _name, _cube in MOVE_CUBES.items():
+    for _spelling in (_name, _name.upper(), _name.replace('i', "'")):
+        _MOVE_CUBE_LOOKUP[_spelling] = _cube
+
+
+def get_move_cube(mv):
+    """
+    Looks up the cubie cube of a face turn.
+
+    Args:
+        mv (str): The move (e.g. 'U', 'R2', 'Fi', "F'").
+
+    Returns:
+        CubieCube: The permutation performed by the move.
+
+    Raises:
+        ValueError: If the move is not a face turn.
+    """
+    try:
+        return _MOVE_CUBE_LOOKUP[mv]
+    except KeyError:
+        raise ValueError("Invalid Move: " + str(mv)) from None
+
+
+@lru_cache(maxsize=None)
+def get_coordinate_move_tables():
+    """
+    Builds the move tables of the twist, flip and corner permutation coordinates.
+
+    Each table has one row per coordinate value and one column per move in FACE_MOVES,
+    so applying a move to a coordinate is a single lookup: table[coordinate, move].
+    The tables are built with vectorized NumPy operations on first use and then cached.
+
+    Returns:
+        dict: Tables keyed by 'twist', 'flip' and 'corner_permutation'.
+    """
+    moves = [MOVE_CUBES[mv] for mv in FACE_MOVES]
+
+    # Every twist as 8 corner orientations
+    twist = np.arange(N_TWIST)
+    co = np.zeros((N_TWIST, 8), dtype=np.int64)
+    for i in range(6, -1, -1):
+        co[:, i] = twist % 3
+        twist = twist // 3
+    co[:, 7] = -co[:, :7].sum(axis=1) % 3
+    weights = 3 ** np.arange(6, -1, -1)
+    twist_table = np.stack([((co[:, mv.cp] + mv.co) % 3)[:, :7] @ weights for mv in moves], axis=1)
+
+    # Every flip as 12 edge orientations
+    flip = np.arange(N_FLIP)
+    eo = np.zeros((N_FLIP, 12), dtype=np.int64)
+    for i in range(10, -1, -1):
+        eo[:, i] = flip % 2
+        flip = flip // 2
+    eo[:, 11] = eo[:, :11].sum(axis=1) % 2
+    weights = 2 ** np.arange(10, -1, -1)
+    flip_table = np.stack([((eo[:, mv.ep] + mv.eo) % 2)[:, :11] @ weights for mv in moves], axis=1)
+
+    # Every corner permutation, in lexicographic (rank) order
+    cp = np.array(list(permutations(range(8))), dtype=np.int64)
+    corner_table = np.stack([_rank_permutations(cp[:, mv.cp]) for mv in moves], axis=1)
+
+    return {
+        'twist': twist_table.astype(np.uint16),
+        'flip': flip_table.astype(np.uint16),
+        'corner_permutation': corner_table.astype(np.uint16)
+    }
+
+
+def _rank_permutations(perms):
+    """
+    Vectorized rank_permutation() for a 2D array with one permutation per row.
+
+    Args:
+        perms (numpy.ndarray): An N x n array of permutations.
+
+    Returns:
+        numpy.ndarray: The lexicographic rank of every row.
+    """
+    n = perms.shape[1]
+    ranks = np.zeros(len(perms), dtype=np.int64)
+    for i in range(n - 1):
+        smaller = (perms[:, i + 1:] < perms[:, i:i + 1]).sum(axis=1)
+        ranks = ranks * (n - i) + smaller
+    return ranks
+
+
+def rank_cubie_cube(cube):
+    """
+    Packs a legal cubie cube into a single integer from 0 to N_CUBIE_STATES - 1.
+
+    Args:
+        cube (CubieCube): A cube that passes verify().
+
+    Returns:
+        int: The rank of the cube.
+    """
+    rank = cube.get_corner_permutation() * N_TWIST + cube.get_twist()
+    rank = rank * N_EDGE_PERMUTATION_HALF + cube.get_edge_permutation() // 2
+    return rank * N_FLIP + cube.get_flip()
+
+
+def unrank_cubie_cube(rank):
+    """
+    Rebuilds the cubie cube packed by rank_cubie_cube().
+
+    Args:
+        rank (int): A rank from 0 to N_CUBIE_STATES - 1.
+
+    Returns:
+        CubieCube: The cube with that rank.
+    """
+    cube = CubieCube()
+    rank, flip = divmod(rank, N_FLIP)
+    rank, edge_half = divmod(rank, N_EDGE_PERMUTATION_HALF)
+    corner_permutation, twist = divmod(rank, N_TWIST)
+    cube.set_flip(flip)
+    cube.set_twist(twist)
+    cube.set_corner_permutation(corner_permutation)
+    # Lexicographic ranks 2k and 2k + 1 differ by one swap, so exactly one has the right parity
+    cube.set_edge_permutation(2 * edge_half)
+    if permutation_parity(cube.ep) != permutation_parity(cube.cp):
+        cube.set_edge_permutation(2 * edge_half + 1)
+    return cube
+
+
+# Permutation that undoes each whole-cube rotation
+_INVERSE_ROTATIONS = [np.argsort(perm) for _, perm in WHOLE_CUBE_ROTATIONS]
+
+
+def to_centres_frame(state):
+    """
+    Splits a cube state into the orientation of its centres and the cube seen from its centres.
+
+    Slice moves turn the centres, so the pieces are read relative to wherever the centres
+    are: the returned cubie cube is the state rotated back to the standard orientation.
+
+    Args:
+        state (CubeState): The cube state.
+
+    Returns:
+        tuple: The orientation index in WHOLE_CUBE_ROTATIONS and the CubieCube.
+
+    Raises:
+        ValueError: If the centres do not form a valid orientation.
+    """
+    orientation = get_orientation(state)
+    return orientation, CubieCube.from_state(CubeState(state.facelets.take(_INVERSE_ROTATIONS[orientation])))
+
+
+def rank_kociemba_string(cube_string):
+    """
+    Packs a legal Kociemba facelet string into a single integer from 0 to N_CUBIE_STATES - 1.
+
+    Gives the same rank as rank_cubie_cube(CubieCube.from_kociemba_string(cube_string)),
+    reading the pieces with one lookup each and checking legality along the way: a
+    string is ranked if and only if find_scan_problems() finds nothing wrong with it.
+
+    Args:
+        cube_string (str): 54 face letters in URFDLB order.
+
+    Returns:
+        int: The rank of the cube.
+
+    Raises:
+        ValueError: If the string is not a legal cube with its centres in place.
+    """
+    if len(cube_string) != 54 or cube_string[4::9] != 'URFDLB':
+        raise ValueError("The facelet string must have 54 stickers and its centres in place.")
+    try:
+        corners = [_CORNER_LOOKUP[read(cube_string)] for read in _CORNER_READERS]
+        edges = [_EDGE_LOOKUP[read(cube_string)] for read in _EDGE_READERS]
+    except KeyError:
+        raise ValueError("The cube has a piece that no real cube has.") from None
+    corner_permutation, corner_parity = _lehmer_code([piece for piece, _ in corners])
+    edge_permutation, edge_parity = _lehmer_code([piece for piece, _ in edges])
+    twist = flip = 0
+    for _, ori in corners[:7]:
+        twist = twist * 3 + ori
+    for _, ori in edges[:11]:
+        flip = flip * 2 + ori
+    if sum(ori for _, ori in corners) % 3 or sum(ori for _, ori in edges) % 2 or corner_parity != edge_parity:
+        raise ValueError("The cube has a twisted corner, a flipped edge or two swapped pieces.")
+    rank = corner_permutation * N_TWIST + twist
+    rank = rank * N_EDGE_PERMUTATION_HALF + edge_permutation // 2
+    return rank * N_FLIP + flip
+
+
+# For every orientation, the facelet of a state that lands on each index of the Kociemba
+# string once the state is rotated back to the standard orientation
+_KOCIEMBA_GATHERS = [inverse[[KOCIEMBA_FACE_INDEX[face] * 9 + i for face in KOCIEMBA_FACE_ORDER for i in range(9)]]
+                     for inverse in _INVERSE_ROTATIONS]
+
+
+def rank_state(state):
+    """
+    Packs a legal cube state into a single integer from 0 to N_STATES - 1.
+
+    The rank combines the orientation of the centres (changed by slice moves) with the
+    corner and edge coordinates, so it fits in 70 bits. An int key takes about a third
+    of the memory of the 54 character Kociemba string, and equal ranks mean equal cubes.
+
+    Args:
+        state (CubeState): The cube state.
+
+    Returns:
+        int: The rank of the state.
+
+    Raises:
+        ValueError: If the state is not a legal cube.
+    """
+    orientation = get_orientation(state)
+    cube_string = state.facelets.take(_KOCIEMBA_GATHERS[orientation]).tobytes().decode('ascii')
+    return orientation * N_CUBIE_STATES + rank_kociemba_string(cube_string)
+
+
+def unrank_state(rank):
+    """
+    Rebuilds the cube state packed by rank_state().
+
+    Args:
+        rank (int): A rank from 0 to N_STATES - 1.
+
+    Returns:
+        CubeState: The state with that rank.
+    """
+    orientation, rank = divmod(rank, N_CUBIE_STATES)
+    state = unrank_cubie_cube(rank).to_state()
+    state.apply_permutation(WHOLE_CUBE_ROTATIONS[orientation][1])
+    return state
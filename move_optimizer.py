@@ -0,0 +1,155 @@
+"""
+Peephole optimizer and move counts for solutions in the project notation.
+
+The moves produced by rewrite_solution() are already expressed in the reference frame of
+the physical cube: every letter names the layer at that position in space, whatever centre
+currently sits there. Layers on the same axis (U, E, D / R, M, L / F, S, B) therefore
+commute, so a run of same-axis moves can be reduced to at most one turn per layer, and a
+run that cancels out lets its neighbours merge in turn (e.g. 'U R Ri U' -> 'U2').
+
+Only layers the input already turns are ever turned, and the final permutation is
+unchanged, so a sequence that keeps the fixed water-drop piece in place still does.
+"""
+import sys
+
+# Axis of every layer, and the order its layers are written in within a merged run
+LAYER_AXES = {'U': 0, 'E': 0, 'D': 0, 'R': 1, 'M': 1, 'L': 1, 'F': 2, 'S': 2, 'B': 2}
+_AXIS_LAYERS = ['UED', 'RML', 'FSB']
+
+# Quarter turns of each suffix, and the suffix of each number of quarter turns
+_QUARTER_TURNS = {'': 1, '2': 2, 'i': 3}
+_SUFFIXES = {1: '', 2: '2', 3: 'i'}
+
+# Slice moves, which count as two face turns in the face-turn metrics
+SLICE_LAYERS = 'MES'
+
+# Names of the metrics returned by count_moves()
+METRICS = ('htm', 'qtm', 'stm')
+
+
+def parse_move(move):
+    """
+    Splits a move into its layer and number of clockwise quarter turns.
+
+    Args:
+        move (str): A move in the project notation (e.g. 'U', 'Mi', 'F2'). Kociemba's
+            apostrophe (e.g. "U'") is accepted as well.
+
+    Returns:
+        tuple: The layer letter and the quarter turns (1, 2 or 3).
+
+    Raises:
+        ValueError: If the move is not a layer turn.
+    """
+    layer, suffix = move[:1].upper(), move[1:].replace("'", 'i').lower()
+    if layer not in LAYER_AXES or suffix not in _QUARTER_TURNS:
+        raise ValueError("Unknown move: " + repr(move))
+    return layer, _QUARTER_TURNS[suffix]
+
+
+def invert_moves(moves):
+    """
+    Returns the sequence that undoes a sequence of moves.
+
+    Args:
+        moves (list): Moves in the project notation.
+
+    Returns:
+        list: The inverse moves in reverse order.
+
+    Raises:
+        ValueError: If a move is not a layer turn.
+    """
+    inverse = []
+    for move in reversed(moves):
+        layer, turns = parse_move(move)
+        inverse.append(layer + _SUFFIXES[4 - turns])
+    return inverse
+
+
+def optimize_moves(moves):
+    """
+    Merges and cancels neighbouring turns of layers on the same axis.
+
+    Args:
+        moves (list): Moves in the project notation.
+
+    Returns:
+        list: An equivalent sequence that is never longer in any metric of count_moves().
+
+    Raises:
+        ValueError: If a move is not a layer turn.
+    """
+    # Each run is [axis, {layer: quarter turns}] and holds at least one non-zero turn
+    runs = []
+    for move in moves:
+        layer, turns = parse_move(move)
+        axis = LAYER_AXES[layer]
+        if runs and runs[-1][0] == axis:
+            run_turns = runs[-1][1]
+            run_turns[layer] = (run_turns.get(layer, 0) + turns) % 4
+            if not any(run_turns.values()):
+                # The run cancelled out, so the next move may merge with the run before it
+                runs.pop()
+        else:
+            runs.append([axis, {layer: turns}])
+
+    optimized = []
+    for axis, run_turns in runs:
+        for layer in _AXIS_LAYERS[axis]:
+            turns = run_turns.get(layer, 0)
+            if turns:
+                optimized.append(layer + _SUFFIXES[turns])
+    return optimized
+
+
+def count_moves(moves):
+    """
+    Counts a sequence in the usual move metrics.
+
+    HTM counts every face turn as one move, QTM counts a half turn as two, and STM counts
+    every layer turn (slices included) as one. A slice move counts as two face turns in HTM
+    and QTM, since it turns the cube the same way as the two outer faces.
+
+    Args:
+        moves (list): Moves in the project notation.
+
+    Returns:
+        dict: The number of moves in each of METRICS.
+
+    Raises:
+        ValueError: If a move is not a layer turn.
+    """
+    counts = dict.fromkeys(METRICS, 0)
+    for move in moves:
+        layer, turns = parse_move(move)
+        faces = 2 if layer in SLICE_LAYERS else 1
+        counts['htm'] += faces
+        counts['qtm'] += faces * (2 if turns == 2 else 1)
+        counts['stm'] += 1
+    return counts
+
+
+def main(argv=None):
+    """
+    Command line entry point: python -m move_optimizer "D D E Ei R"
+    """
+    argv = sys.argv[1:] if argv is None else argv
+    if not argv:
+        print("Usage: python -m move_optimizer MOVES...", file=sys.stderr)
+        return 2
+    moves = ' '.join(argv).split()
+    try:
+        optimized = optimize_moves(moves)
+    except ValueError as e:
+        print(e, file=sys.stderr)
+        return 2
+    before, after = count_moves(moves), count_moves(optimized)
+    print(' '.join(optimized))
+    for metric in METRICS:
+        print("{}: {} -> {}".format(metric.upper(), before[metric], after[metric]))
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,155 @@
+"""
+Bounded LRU cache of solutions, keyed by cube state and water-drop constraint.
+
+A solution depends only on the Kociemba facelet string, on the set of layers that must
+not be turned and on the solving method, so every set of pinned pieces that forbids the
+same layers shares entries. In memory the cube is keyed by its rank (cubie.rank_kociemba_string()),
+a single int. The cache can optionally be backed by an sqlite file so solutions survive
+restarts; the file keeps the readable facelet strings.
+"""
+import sqlite3
+import threading
+from collections import OrderedDict
+
+
+class SolutionCache:
+    """
+    Keeps the most recently used solutions in memory, optionally persisted to disk.
+
+    Attributes:
+        maxsize (int): Maximum number of solutions kept in memory.
+        path (str): The sqlite file backing the cache, or None for a memory-only cache.
+        hits (int): Number of lookups answered by the cache.
+        misses (int): Number of lookups that were not in the cache.
+
+    Methods:
+        get(cube_string, forbidden_layers, method): Returns a cached solution or None.
+        put(cube_string, forbidden_layers, moves, method): Stores a solution.
+        clear(): Removes every solution from memory and disk.
+        close(): Closes the sqlite file.
+    """
+    def __init__(self, maxsize=4096, path=None):
+        """
+        Initializes the cache.
+
+        Args:
+            maxsize (int, optional): Maximum number of solutions kept in memory.
+            path (str, optional): An sqlite file to load and store solutions in.
+        """
+        self.maxsize = maxsize
+        self.path = path
+        self.hits = 0
+        self.misses = 0
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self._db = None
+        if path is not None:
+            self._db = sqlite3.connect(path, check_same_thread=False)
+            # The restricted column holds the forbidden layers; it keeps its name so existing files still load
+            self._db.execute("CREATE TABLE IF NOT EXISTS solutions ("
+                             "facelets TEXT NOT NULL, restricted TEXT NOT NULL, method TEXT NOT NULL, "
+                             "moves TEXT NOT NULL, PRIMARY KEY (facelets, restricted, method))")
+            self._db.commit()
+
+    def __len__(self):
+        return len(self._entries)
+
+    @staticmethod
+    def make_key(cube_string, forbidden_layers, method='kociemba'):
+        """
+        Builds the in-memory key of a cube state and constraint.
+
+        Args:
+            cube_string (str): A Kociemba facelet string.
+            forbidden_layers (iterable): The layers that must not be turned (e.g. 'FMU').
+            method (str, optional): The solving method that produced the solution.
+
+        Returns:
+            tuple: The rank of the cube (see cubie.rank_kociemba_string()), or the facelet string
+            itself if the cube is not legal, the sorted forbidden layers as a string and the method.
+        """
+        # Imported here, since cubie pulls in NumPy and cube_solver loads this module without it
+        from cubie import rank_kociemba_string
+        try:
+            # A 70 bit int takes about a third of the memory of the 54 character string
+            state = rank_kociemba_string(cube_string)
+        except ValueError:
+            state = cube_string
+        return state, ''.join(sorted(forbidden_layers)), method
+
+    def get(self, cube_string, forbidden_layers, method='kociemba'):
+        """
+        Looks up a solution, falling back to the sqlite file on a memory miss.
+
+        Args:
+            cube_string (str): A Kociemba facelet string.
+            forbidden_layers (iterable): The layers that must not be turned (e.g. 'FMU').
+            method (str, optional): The solving method.
+
+        Returns:
+            list: A copy of the cached moves, or None if the state is not cached.
+        """
+        key = self.make_key(cube_string, forbidden_layers, method)
+        with self._lock:
+            moves = self._entries.get(key)
+            if moves is not None:
+                self._entries.move_to_end(key)
+            elif self._db is not None:
+                row = self._db.execute("SELECT moves FROM solutions "
+                                       "WHERE facelets = ? AND restricted = ? AND method = ?",
+                                       (cube_string,) + key[1:]).fetchone()
+                if row is not None:
+                    moves = tuple(row[0].split())
+                    self._remember(key, moves)
+            if moves is None:
+                self.misses += 1
+                return None
+            self.hits += 1
+            return list(moves)
+
+    def put(self, cube_string, forbidden_layers, moves, method='kociemba'):
+        """
+        Stores a solution in memory and, if the cache is persistent, on disk.
+
+        Args:
+            cube_string (str): A Kociemba facelet string.
+            forbidden_layers (iterable): The layers that must not be turned (e.g. 'FMU').
+            moves (list): The moves that solve the cube.
+            method (str, optional): The solving method that produced the moves.
+        """
+        key = self.make_key(cube_string, forbidden_layers, method)
+        moves = tuple(moves)
+        with self._lock:
+            self._remember(key, moves)
+            if self._db is not None:
+                self._db.execute("INSERT OR REPLACE INTO solutions VALUES (?, ?, ?, ?)",
+                                 (cube_string,) + key[1:] + (' '.join(moves),))
+                self._db.commit()
+
+    def _remember(self, key, moves):
+        """
+        Adds an entry to the in-memory LRU, evicting the least recently used one if full.
+        """
+        self._entries[key] = moves
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.maxsize:
+            self._entries.popitem(last=False)
+
+    def clear(self):
+        """
+        Removes every solution from memory and from the sqlite file.
+        """
+        with self._lock:
+            self._entries.clear()
+            if self._db is not None:
+                self._db.execute("DELETE FROM solutions")
+                self._db.commit()
+
+    def close(self):
+        """
+        Closes the sqlite file; the in-memory entries stay usable.
+        """
+        with self._lock:
+            if self._db is not None:
+                self._db.close()
+                self._db = None
@@ -0,0 +1,395 @@
+"""
+Long-lived local solve service: a warm solver behind a localhost HTTP endpoint.
+
+    python -m solve_service --port 8765 --method native
+
+POST /solve takes one request in the headless format (see cube_solver.parse_request()),
+e.g. {"facelets": "...", "fixed_stickers": [7, 30]}, and answers with the JSON object
+cube_solver.solve_request() describes. A request that can't be parsed is answered with
+400 and the reason in "error". GET /stats reports the request, batch and cache counters.
+
+The worker processes load kociemba's tables (and the constrained search tables for the
+'native' method) once when the service starts. Repeated states are answered from the
+solution cache in the server process without touching the workers, and so are repeats of
+requests that can never be solved (a bad scan, or pins that allow no solution); requests
+that timed out are tried again. Requests that
+arrive together are collected for a few milliseconds and sent to the workers as one
+chunk per worker, so a burst costs a handful of inter-process round trips instead of
+one per request.
+"""
+import argparse
+import json
+import os
+import queue
+import sys
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import Future, ProcessPoolExecutor
+from functools import partial
+from http.server import BaseHTTPRequestHandler, HTTPServer
+from socketserver import ThreadingMixIn
+
+from cube_solver import SOLVE_METHODS, PinConstraint, describe_solution, parse_request, solve_request, warm_up
+from solution_cache import SolutionCache
+
+# Longest a batch waits for more requests after its first one arrived, in seconds
+BATCH_WINDOW = 0.005
+
+# Most requests sent to the workers in one batch
+BATCH_SIZE = 64
+
+# Most proven failures ("no solution keeps the pins", bad scans) remembered, so repeats skip the workers
+FAILURE_CACHE_SIZE = 1024
+
+# Longest a client waits for its solution before the service gives up on it, in seconds
+REQUEST_TIMEOUT = 60.0
+
+# Largest request body accepted, in bytes (a request is a single cube)
+MAX_REQUEST_BYTES = 4096
+
+
+def _solve_lines(lines, method):
+    """
+    Solves a chunk of requests inside a worker process.
+
+    Args:
+        lines (list): The requests (see cube_solver.parse_request()).
+        method (str): One of cube_solver.SOLVE_METHODS.
+
+    Returns:
+        list: The result of cube_solver.solve_request() for every request, in order.
+    """
+    return [solve_request(line, method=method) for line in lines]
+
+
+class SolveService:
+    """
+    Solves requests on a warm process pool, batching the ones that arrive together.
+
+    Attributes:
+        method (str): The solving method, one of cube_solver.SOLVE_METHODS.
+        workers (int): Number of worker processes.
+        cache (SolutionCache): The solutions already found.
+        requests (int): Number of requests received.
+        failure_hits (int): Number of requests answered from the remembered failures.
+        batches (int): Number of batches sent to the workers.
+        batched (int): Number of requests sent to the workers.
+
+    Methods:
+        submit(line): Starts solving a request and returns a future of its result.
+        solve(line, timeout): Solves a request and returns its result.
+        stats(): Returns the counters.
+        close(): Stops the batching thread and the worker processes.
+    """
+    def __init__(self, method='kociemba', workers=None, cache=None, batch_window=BATCH_WINDOW,
+                 batch_size=BATCH_SIZE):
+        """
+        Starts the worker processes and the batching thread.
+
+        Args:
+            method (str, optional): One of cube_solver.SOLVE_METHODS.
+            workers (int, optional): Number of worker processes (defaults to the number of CPUs).
+            cache (SolutionCache, optional): The cache to answer repeated states from (a new
+                in-memory cache by default).
+            batch_window (float, optional): Seconds a batch waits for more requests.
+            batch_size (int, optional): Most requests in one batch.
+
+        Raises:
+            ValueError: If the method is unknown.
+        """
+        if method not in SOLVE_METHODS:
+            raise ValueError("Unknown solving method: " + str(method))
+        self.method = method
+        self.workers = workers or os.cpu_count() or 1
+        self.cache = SolutionCache() if cache is None else cache
+        self.batch_window = batch_window
+        self.batch_size = batch_size
+        self.requests = 0
+        self.failure_hits = 0
+        self.batches = 0
+        self.batched = 0
+        self._lock = threading.Lock()
+        # Error fields of requests that can never be solved, keyed like the solution cache
+        self._failures = OrderedDict()
+        self._queue = queue.Queue()
+        self._executor = ProcessPoolExecutor(max_workers=self.workers, initializer=warm_up, initargs=(method,))
+        # Starts the workers, which load their tables as they start, before the first request arrives
+        for future in [self._executor.submit(_solve_lines, [], method) for _ in range(self.workers)]:
+            future.result()
+        self._dispatcher = threading.Thread(target=self._dispatch, daemon=True)
+        self._dispatcher.start()
+
+    def submit(self, line):
+        """
+        Starts solving one request.
+
+        Requests that can't be parsed, cached states and states already proven unsolvable
+        are answered at once; the others are queued for the next batch.
+
+        Args:
+            line (str): The request (see cube_solver.parse_request()).
+
+        Returns:
+            concurrent.futures.Future: The future of the dictionary cube_solver.solve_request() returns.
+        """
+        with self._lock:
+            self.requests += 1
+        future = Future()
+        try:
+            cube_string, fixed_stickers = parse_request(line)
+        except ValueError:
+            # Describes the error exactly as the headless solver does, without a worker
+            future.set_result(solve_request(line))
+            return future
+        forbidden_layers = PinConstraint(fixed_stickers).forbidden_layers
+        result = {'facelets': cube_string, 'fixed_stickers': fixed_stickers}
+        failure_key = SolutionCache.make_key(cube_string, forbidden_layers, self.method)
+        with self._lock:
+            failure = self._failures.get(failure_key)
+            if failure is not None:
+                self._failures.move_to_end(failure_key)
+                self.failure_hits += 1
+        if failure is not None:
+            result.update(failure)
+            future.set_result(result)
+            return future
+        moves = self.cache.get(cube_string, forbidden_layers, self.method)
+        if moves is not None:
+            result.update(describe_solution(moves))
+            future.set_result(result)
+        else:
+            self._queue.put((line, cube_string, forbidden_layers, future))
+        return future
+
+    def solve(self, line, timeout=REQUEST_TIMEOUT):
+        """
+        Solves one request.
+
+        Args:
+            line (str): The request (see cube_solver.parse_request()).
+            timeout (float, optional): Seconds to wait for the solution.
+
+        Returns:
+            dict: The result, as returned by cube_solver.solve_request().
+
+        Raises:
+            concurrent.futures.TimeoutError: If the solution took longer than timeout.
+        """
+        return self.submit(line).result(timeout)
+
+    def _next_batch(self):
+        """
+        Waits for a request and collects the ones that arrive within the batch window.
+
+        Returns:
+            list: The queued requests, or None once the service is closing.
+        """
+        first = self._queue.get()
+        if first is None:
+            return None
+        batch = [first]
+        deadline = time.monotonic() + self.batch_window
+        while len(batch) < self.batch_size:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                break
+            try:
+                item = self._queue.get(timeout=remaining)
+            except queue.Empty:
+                break
+            if item is None:
+                # Finish this batch, then stop
+                self._queue.put(None)
+                break
+            batch.append(item)
+        return batch
+
+    def _dispatch(self):
+        """
+        Sends batches to the workers, one chunk per worker, until the service closes.
+        """
+        while True:
+            batch = self._next_batch()
+            if batch is None:
+                return
+            with self._lock:
+                self.batches += 1
+                self.batched += len(batch)
+            n_chunks = min(self.workers, len(batch))
+            for i in range(n_chunks):
+                chunk = batch[i::n_chunks]
+                try:
+                    chunk_future = self._executor.submit(_solve_lines, [item[0] for item in chunk], self.method)
+                except RuntimeError as e:
+                    # The pool is shutting down
+                    for item in chunk:
+                        item[3].set_exception(e)
+                    continue
+                chunk_future.add_done_callback(partial(self._finish_chunk, chunk))
+
+    def _finish_chunk(self, chunk, chunk_future):
+        """
+        Caches the solutions of a finished chunk and hands every result to its future.
+        """
+        try:
+            results = chunk_future.result()
+        except Exception as e:
+            for item in chunk:
+                item[3].set_exception(e)
+            return
+        for (line, cube_string, forbidden_layers, future), result in zip(chunk, results):
+            if 'solution' in result:
+                self.cache.put(cube_string, forbidden_layers, result['solution'], self.method)
+            elif not result.get('timed_out'):
+                # A bad scan or a proven dead end gives the same answer every time; a timeout may not
+                self._remember_failure(cube_string, forbidden_layers,
+                                       {key: result[key] for key in ('error', 'stickers') if key in result})
+            future.set_result(result)
+
+    def _remember_failure(self, cube_string, forbidden_layers, failure):
+        """
+        Remembers the error fields of an unsolvable request, forgetting the oldest one if full.
+        """
+        key = SolutionCache.make_key(cube_string, forbidden_layers, self.method)
+        with self._lock:
+            self._failures[key] = failure
+            self._failures.move_to_end(key)
+            while len(self._failures) > FAILURE_CACHE_SIZE:
+                self._failures.popitem(last=False)
+
+    def stats(self):
+        """
+        Returns the counters of the service.
+
+        Returns:
+            dict: The requests received, the batches and requests sent to the workers, the
+            mean batch size, the cache hits, misses and size, and the failures remembered and reused.
+        """
+        with self._lock:
+            return {'requests': self.requests, 'batches': self.batches, 'batched': self.batched,
+                    'failures': len(self._failures), 'failure_hits': self.failure_hits,
+                    'mean_batch_size': self.batched / self.batches if self.batches else 0.0,
+                    'cache_hits': self.cache.hits, 'cache_misses': self.cache.misses, 'cache_size': len(self.cache),
+                    'workers': self.workers, 'method': self.method}
+
+    def close(self):
+        """
+        Solves the queued requests, then stops the batching thread and the worker processes.
+        """
+        self._queue.put(None)
+        self._dispatcher.join()
+        self._executor.shutdown(wait=True)
+
+
+class _ThreadingHTTPServer(ThreadingMixIn, HTTPServer):
+    """
+    Handles every connection in its own thread, so concurrent requests can share a batch.
+    """
+    daemon_threads = True
+
+
+class SolveRequestHandler(BaseHTTPRequestHandler):
+    """
+    Answers POST /solve and GET /stats with JSON; the server's service attribute does the solving.
+    """
+    protocol_version = 'HTTP/1.1'
+    # The headers and the body go out as separate small writes; with Nagle's algorithm the body
+    # waits for the client's delayed ACK, about 40 ms on every request after the first on a connection
+    disable_nagle_algorithm = True
+
+    def _send_json(self, status, body):
+        data = json.dumps(body).encode('utf-8')
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+    def do_GET(self):
+        if self.path == '/stats':
+            self._send_json(200, self.server.service.stats())
+        else:
+            self._send_json(404, {'error': "Unknown path: " + self.path})
+
+    def do_POST(self):
+        if self.path != '/solve':
+            self._send_json(404, {'error': "Unknown path: " + self.path})
+            return
+        length = self.headers.get('Content-Length', '')
+        length = int(length) if length.isdigit() else 0
+        if not 0 < length <= MAX_REQUEST_BYTES:
+            self.close_connection = True
+            self._send_json(400, {'error': "Expected a request body of at most {} bytes.".format(MAX_REQUEST_BYTES)})
+            return
+        line = self.rfile.read(length).decode('utf-8', 'replace')
+        # A request that can't be parsed is the client's error, not the solver's
+        try:
+            parse_request(line)
+        except ValueError as e:
+            self._send_json(400, {'input': line.strip(), 'error': str(e)})
+            return
+        try:
+            result = self.server.service.solve(line)
+        except Exception as e:
+            self._send_json(500, {'input': line.strip(), 'error': "The solver failed: " + (str(e) or type(e).__name__)})
+            return
+        self._send_json(200, result)
+
+    def log_message(self, format, *args):
+        """
+        Keeps the terminal quiet; every request would otherwise print a line.
+        """
+
+
+def create_server(service, host='127.0.0.1', port=8765):
+    """
+    Creates an HTTP server for a solve service.
+
+    Args:
+        service (SolveService): The service that solves the requests.
+        host (str, optional): The address to listen on; keep it local, there is no authentication.
+        port (int, optional): The port to listen on (0 picks a free one).
+
+    Returns:
+        HTTPServer: The server; call serve_forever() to start answering.
+    """
+    server = _ThreadingHTTPServer((host, port), SolveRequestHandler)
+    server.service = service
+    return server
+
+
+def main(argv=None):
+    """
+    Command line entry point: python -m solve_service --port 8765
+    """
+    parser = argparse.ArgumentParser(prog='python -m solve_service',
+                                     description="Serve constrained cube solutions over localhost HTTP.")
+    parser.add_argument('--host', default='127.0.0.1', help="Address to listen on.")
+    parser.add_argument('--port', type=int, default=8765, help="Port to listen on.")
+    parser.add_argument('--workers', type=int, default=None, help="Number of worker processes (defaults to the number of CPUs).")
+    parser.add_argument('--method', choices=SOLVE_METHODS, default='kociemba', help="The solving method (see python -m cube_solver solve --help).")
+    parser.add_argument('--cache', metavar='PATH', default=None, help="Reuse and store solutions in this sqlite file.")
+    parser.add_argument('--batch-window', type=float, default=BATCH_WINDOW * 1000,
+                        help="Milliseconds a batch waits for more requests.")
+    args = parser.parse_args(argv)
+
+    cache = SolutionCache(path=args.cache) if args.cache else None
+    service = SolveService(args.method, args.workers, cache, args.batch_window / 1000)
+    server = create_server(service, args.host, args.port)
+    print("Serving {} solutions with {} workers on http://{}:{}/solve".format(
+        args.method, service.workers, *server.server_address[:2]), file=sys.stderr)
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+        service.close()
+        if cache is not None:
+            cache.close()
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,329 @@
+"""
+Colour classification of the nine stickers of a scanned face.
+
+Every colour is a box of HSV values, so "pixel is in the range of colour k" splits into
+one test per channel. The classifier turns each channel into a lookup table of colour
+bitmasks once; labelling a frame then converts only the 3x3 grid to HSV, maps every
+pixel to the bitmask of the colours it matches and counts the bitmasks of all nine
+cells in one bincount. The counts are exactly what cv2.inRange() and np.average()
+give cell by cell, colour by colour, without any per-cell work.
+
+Fixed ranges fail under unusual lighting, so a CentroidClassifier can be learned from
+the scan itself instead: the centre of every face has a known colour, so the mean Lab
+colour of the six centre cells gives one centroid per colour, and every cell takes the
+colour of the nearest centroid. The centroids are saved as a small JSON profile.
+
+A single frame taken while the cube moves is easily misread, so a ReadingAccumulator
+sums the votes of the last few frames and tells when all nine stickers have kept the
+same confident colour for long enough to capture the face without a key press.
+"""
+import json
+import os
+from collections import deque, namedtuple
+
+import numpy as np
+
+# Top-left corner of the 3x3 scan grid in the camera frame, and the size of one cell, in pixels
+GRID_LEFT, GRID_TOP = 440, 180
+CELL_SIZE = 120
+
+# Version of the colour profile files written by CentroidClassifier.save()
+PROFILE_VERSION = 1
+
+# Number of recent frames whose votes are summed
+VOTE_WINDOW = 5
+
+# Smallest mean vote of a sticker's colour over the window for it to count as confident
+STABLE_CONFIDENCE = 0.5
+
+# Consecutive frames all nine stickers must stay confident and unchanged before the face is stable
+STABLE_FRAMES = 10
+
+# Result of classifying a face: the colour name of every cell (row by row), the confidence in
+# it and the vote of every colour (for StickerClassifier, the fraction of the cell's pixels it matches)
+FaceReading = namedtuple('FaceReading', ['colors', 'confidences', 'votes'])
+
+
+def _crop_grid(frame, left, top, cell_size):
+    """
+    Returns the 3x3 scan grid of a camera frame.
+
+    Args:
+        frame (numpy.ndarray): The camera frame.
+        left, top (int): The top-left corner of the grid.
+        cell_size (int): The width and height of one cell.
+
+    Returns:
+        numpy.ndarray: A view of the grid, or a black-padded copy if the frame is too small to hold it.
+    """
+    size = 3 * cell_size
+    region = frame[top:top + size, left:left + size]
+    if region.shape[:2] != (size, size):
+        # The missing pixels are black, which matches no colour range
+        padded = np.zeros((size, size, 3), dtype=np.uint8)
+        padded[:region.shape[0], :region.shape[1]] = region
+        region = padded
+    return region
+
+
+def cell_colors(frame, left=GRID_LEFT, top=GRID_TOP, cell_size=CELL_SIZE):
+    """
+    Measures the mean colour of every cell of the scan grid.
+
+    Args:
+        frame (numpy.ndarray): The camera frame (BGR) as returned by VideoCapture.read().
+        left, top (int, optional): The top-left corner of the grid.
+        cell_size (int, optional): The width and height of one cell.
+
+    Returns:
+        numpy.ndarray: The Lab colour (L from 0 to 100) of the mean colour of the nine cells,
+        row by row, shape (9, 3).
+    """
+    import cv2
+
+    # Area interpolation down to 3x3 pixels averages every cell in one call, and only the
+    # nine means are converted to Lab
+    means = cv2.resize(_crop_grid(frame, left, top, cell_size), (3, 3), interpolation=cv2.INTER_AREA)
+    return cv2.cvtColor(means.astype(np.float32) / 255, cv2.COLOR_BGR2LAB).reshape(9, 3)
+
+
+class StickerClassifier:
+    """
+    Labels the nine cells of the scan grid with the colour that covers most of each.
+
+    Attributes:
+        colors (list): The colour names, in the order of the columns of FaceReading.votes.
+
+    Methods:
+        classify(frame): Reads the nine stickers of a camera frame.
+    """
+    def __init__(self, color_ranges, default_color='White', left=GRID_LEFT, top=GRID_TOP, cell_size=CELL_SIZE):
+        """
+        Builds the lookup tables.
+
+        Args:
+            color_ranges (dict): [unused, lower HSV bound, upper HSV bound] of every colour
+                (the layout of hsvColors in the app); at most 8 colours.
+            default_color (str, optional): The colour of a cell that matches no colour at all.
+            left (int, optional): The x coordinate of the grid's left edge in the frame.
+            top (int, optional): The y coordinate of the grid's top edge in the frame.
+            cell_size (int, optional): The width and height of one cell.
+
+        Raises:
+            ValueError: If there are more than 8 colours.
+        """
+        if len(color_ranges) > 8:
+            raise ValueError("At most 8 colours fit in the bitmasks.")
+        self.colors = list(color_ranges)
+        self.default_color = default_color
+        self.left, self.top, self.cell_size = left, top, cell_size
+        size = 3 * cell_size
+
+        # tables[0, value, channel] has bit k set if value is within colour k's range on that channel
+        values = np.arange(256)
+        self._tables = np.zeros((1, 256, 3), dtype=np.uint8)
+        for k, (_, lower, upper) in enumerate(color_ranges.values()):
+            for channel in range(3):
+                in_range = (values >= lower[channel]) & (values <= upper[channel])
+                self._tables[0, in_range, channel] |= 1 << k
+
+        # Every pixel's cell, times the 256 bitmasks, so one bincount counts all nine cells
+        cells = np.arange(size) // cell_size
+        self._offsets = ((cells[:, None] * 3 + cells[None, :]) * 256).astype(np.uint16)
+        # Which colours every bitmask stands for, scaled so the counts become fractions of a cell
+        self._bitmask_colors = ((np.arange(256)[:, None] >> np.arange(len(self.colors))) & 1) / cell_size ** 2
+
+    def classify(self, frame):
+        """
+        Reads the nine stickers of a camera frame.
+
+        Args:
+            frame (numpy.ndarray): The camera frame as returned by VideoCapture.read().
+
+        Returns:
+            FaceReading: The colour of every cell and the votes behind it. A cell takes the
+            first colour with the most matching pixels, or default_color if none match.
+        """
+        # Imported here like everywhere else in the app, so OpenCV only loads once the camera is used
+        import cv2
+
+        # The same conversion the colour ranges were tuned with
+        hsv = cv2.cvtColor(_crop_grid(frame, self.left, self.top, self.cell_size), cv2.COLOR_RGB2HSV)
+        hue, saturation, value = cv2.split(cv2.LUT(hsv, self._tables))
+        bitmasks = cv2.bitwise_and(cv2.bitwise_and(hue, saturation), value)
+        counts = np.bincount((self._offsets + bitmasks).ravel(), minlength=9 * 256).reshape(9, 256)
+        votes = counts.dot(self._bitmask_colors)
+
+        best = votes.argmax(axis=1)
+        confidences = votes[np.arange(9), best]
+        colors = [self.colors[k] if confidence > 0 else self.default_color for k, confidence in zip(best, confidences)]
+        return FaceReading(colors, confidences, votes)
+
+
+class CentroidClassifier:
+    """
+    Labels every cell of the scan grid with the colour of the nearest learned centroid.
+
+    Attributes:
+        colors (list): The colour names, in the order of the columns of FaceReading.votes.
+        centroids (numpy.ndarray): The mean Lab colour of every colour, shape (len(colors), 3).
+
+    Methods:
+        classify(frame): Reads the nine stickers of a camera frame.
+        classify_cells(colors): Labels cells whose mean colours are already known.
+        save(path): Writes the centroids as a JSON profile.
+        load(path): Reads a profile written by save().
+    """
+    def __init__(self, centroids, left=GRID_LEFT, top=GRID_TOP, cell_size=CELL_SIZE):
+        """
+        Initializes the classifier.
+
+        Args:
+            centroids (dict): The mean Lab colour of every colour name, e.g. the centre
+                cells returned by cell_colors() keyed by the colour of their face.
+            left, top (int, optional): The top-left corner of the grid in the frame.
+            cell_size (int, optional): The width and height of one cell.
+        """
+        self.colors = list(centroids)
+        self.centroids = np.array([centroids[color] for color in self.colors], dtype=np.float32).reshape(-1, 3)
+        self.left, self.top, self.cell_size = left, top, cell_size
+
+    def classify(self, frame):
+        """
+        Reads the nine stickers of a camera frame.
+
+        Args:
+            frame (numpy.ndarray): The camera frame (BGR) as returned by VideoCapture.read().
+
+        Returns:
+            FaceReading: The colour of every cell and the votes behind it (see classify_cells()).
+        """
+        return self.classify_cells(cell_colors(frame, self.left, self.top, self.cell_size))
+
+    def classify_cells(self, colors):
+        """
+        Labels cells by their nearest centroid.
+
+        Args:
+            colors (numpy.ndarray): Mean Lab colours as returned by cell_colors(), shape (n, 3).
+
+        Returns:
+            FaceReading: The nearest colour of every cell. The votes weight every colour by
+            the inverse of its squared distance, normalized to sum to 1 per cell.
+        """
+        distances = ((np.asarray(colors, dtype=np.float32)[:, None, :] - self.centroids[None]) ** 2).sum(axis=2)
+        weights = 1 / (distances + 1)
+        votes = weights / weights.sum(axis=1, keepdims=True)
+        best = distances.argmin(axis=1)
+        return FaceReading([self.colors[k] for k in best], votes[np.arange(len(best)), best], votes)
+
+    def save(self, path):
+        """
+        Writes the centroids as a JSON profile, replacing the file atomically.
+
+        Args:
+            path (str): The profile file.
+        """
+        profile = {'version': PROFILE_VERSION, 'space': 'Lab',
+                   'centroids': {color: [float(v) for v in centroid] for color, centroid in zip(self.colors, self.centroids)}}
+        temporary_path = '{}.{}.tmp'.format(path, os.getpid())
+        with open(temporary_path, 'w') as f:
+            json.dump(profile, f, indent=2)
+        os.replace(temporary_path, path)
+
+    @classmethod
+    def load(cls, path, **kwargs):
+        """
+        Reads a profile written by save().
+
+        Args:
+            path (str): The profile file.
+            **kwargs: The grid geometry, passed on to the constructor.
+
+        Returns:
+            CentroidClassifier: The classifier, or None if the file is missing, unreadable or from another version.
+        """
+        try:
+            with open(path) as f:
+                profile = json.load(f)
+            if profile.get('version') != PROFILE_VERSION:
+                return None
+            return cls(profile['centroids'], **kwargs)
+        except (OSError, ValueError, KeyError, TypeError, AttributeError):
+            return None
+
+
+class ReadingAccumulator:
+    """
+    Votes on the colour of every sticker over a sliding window of frames.
+
+    Attributes:
+        colors (list): The colour names, in the order of the columns of FaceReading.votes.
+        reading (FaceReading): The consensus of the window: the colour with the highest mean
+            vote for every sticker, its mean vote as the confidence and the mean votes of all
+            colours; None before the first frame.
+        stable_count (int): Consecutive frames in which every sticker kept its colour with a
+            confidence of at least the threshold.
+
+    Methods:
+        add(reading): Adds the reading of a new frame.
+        is_stable(): Checks whether the face has been stable for long enough to capture.
+        reset(): Forgets all frames.
+    """
+    def __init__(self, colors, window=VOTE_WINDOW, threshold=STABLE_CONFIDENCE, stable_frames=STABLE_FRAMES):
+        """
+        Initializes an empty window.
+
+        Args:
+            colors (list): The colour names of the classifier whose readings are added.
+            window (int, optional): Number of recent frames whose votes are summed.
+            threshold (float, optional): Smallest confidence of a stable sticker.
+            stable_frames (int, optional): Consecutive stable frames before is_stable() is True.
+        """
+        self.colors = list(colors)
+        self.threshold = threshold
+        self.stable_frames = stable_frames
+        self._votes = deque(maxlen=window)
+        self.reading = None
+        self.stable_count = 0
+
+    def add(self, reading):
+        """
+        Adds the reading of a new frame and updates the consensus.
+
+        Args:
+            reading (FaceReading): The classifier's reading of the frame.
+
+        Returns:
+            FaceReading: The consensus of the window (see the reading attribute).
+        """
+        self._votes.append(np.asarray(reading.votes, dtype=np.float64))
+        votes = sum(self._votes) / len(self._votes)
+        best = votes.argmax(axis=1)
+        confidences = votes[np.arange(len(best)), best]
+        # A sticker no colour ever voted for keeps the classifier's own fallback colour
+        colors = [self.colors[k] if confidence > 0 else color
+                  for k, confidence, color in zip(best, confidences, reading.colors)]
+
+        steady = (len(self._votes) == self._votes.maxlen and self.reading is not None
+                  and colors == self.reading.colors and bool((confidences >= self.threshold).all()))
+        self.stable_count = self.stable_count + 1 if steady else 0
+        self.reading = FaceReading(colors, confidences, votes)
+        return self.reading
+
+    def is_stable(self):
+        """
+        Checks whether every sticker has kept a confident colour for stable_frames frames.
+
+        Returns:
+            bool: True once the face can be captured.
+        """
+        return self.stable_count >= self.stable_frames
+
+    def reset(self):
+        """
+        Forgets all frames, e.g. after the face was captured.
+        """
+        self._votes.clear()
+        self.reading = None
+        self.stable_count = 0
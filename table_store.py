@@ -0,0 +1,89 @@
+"""
+Flat binary files for large lookup tables, memory-mapped read-only when loaded.
+
+Every group of tables is written as one raw file per table plus a JSON manifest with
+the element type and length of each table. Loading maps the files read-only, so it
+only costs a few system calls, and every process that maps the same files shares the
+operating system's page cache instead of holding a private copy.
+"""
+import json
+import mmap
+import os
+
+import numpy as np
+
+# memoryview.cast() format of every element type a table can be stored as
+_FORMATS = {'uint8': 'B', 'uint16': 'H', 'uint32': 'I'}
+
+
+def _write_atomically(path, data):
+    """
+    Writes a file under a temporary name and then renames it, so readers never see half a file.
+
+    Args:
+        path (str): The file to write.
+        data (bytes-like): The contents.
+    """
+    temporary_path = '{}.{}.tmp'.format(path, os.getpid())
+    with open(temporary_path, 'wb') as f:
+        f.write(data)
+    os.replace(temporary_path, path)
+
+
+def save_tables(directory, name, tables, version, metadata=None):
+    """
+    Writes a group of tables as flat binary files plus a manifest.
+
+    The manifest is written last, so an interrupted build is never loaded.
+
+    Args:
+        directory (str): The directory to write to (created if missing).
+        name (str): The name of the group; files are called <name>.<table>.bin and <name>.json.
+        tables (dict): NumPy arrays keyed by table name, stored flattened in C order.
+        version (int): The format version the loader must ask for.
+        metadata (dict, optional): Small JSON-serializable data stored in the manifest.
+    """
+    os.makedirs(directory, exist_ok=True)
+    manifest = {'version': version, 'metadata': metadata, 'tables': {}}
+    for key, array in tables.items():
+        array = np.ascontiguousarray(array)
+        if array.dtype.name not in _FORMATS:
+            raise ValueError("Tables can't be stored as " + array.dtype.name)
+        filename = '{}.{}.bin'.format(name, key)
+        _write_atomically(os.path.join(directory, filename), array.tobytes())
+        manifest['tables'][key] = {'file': filename, 'dtype': array.dtype.name, 'length': int(array.size)}
+    _write_atomically(os.path.join(directory, name + '.json'), json.dumps(manifest).encode('utf-8'))
+
+
+def load_tables(directory, name, version):
+    """
+    Memory-maps a group of tables written by save_tables().
+
+    Args:
+        directory (str): The directory the tables were written to.
+        name (str): The name of the group.
+        version (int): The expected format version.
+
+    Returns:
+        tuple: The tables as flat read-only memoryviews keyed by table name, and the metadata;
+        or None if the files are missing, incomplete or from another version.
+    """
+    try:
+        with open(os.path.join(directory, name + '.json'), 'rb') as f:
+            manifest = json.loads(f.read().decode('utf-8'))
+    except (OSError, ValueError):
+        return None
+    if manifest.get('version') != version:
+        return None
+    tables = {}
+    try:
+        for key, entry in manifest['tables'].items():
+            with open(os.path.join(directory, entry['file']), 'rb') as f:
+                mapped = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+            view = memoryview(mapped).cast(_FORMATS[entry['dtype']])
+            if len(view) != entry['length']:
+                return None
+            tables[key] = view
+    except (OSError, ValueError, KeyError):
+        return None
+    return tables, manifest['metadata']